@@ -1,3 +1,3 @@
-from . import queries, supabase
+from . import queries, supabase, user_stats
 
-__all__ = ["queries", "supabase"]
+__all__ = ["queries", "supabase", "user_stats"]
@@ -0,0 +1,11 @@
+-- Materialized per-user stats (backend/db/user_stats.py).
+-- Writers update a row only while `version` is still the one they read.
+create table if not exists user_stats (
+    user_id text primary key,
+    record jsonb not null,
+    version bigint not null default 0,
+    updated_at timestamptz not null default now()
+);
+
+-- tables created before the version column was added
+alter table user_stats add column if not exists version bigint not null default 0;
@@ -0,0 +1,35 @@
+-- Grouped Wrapped counts for one user's scans in [p_start, p_end)
+-- (backend/db/queries.get_wrapped_aggregates).
+create or replace function wrapped_aggregates(p_user_id uuid, p_start timestamptz, p_end timestamptz)
+returns jsonb language sql stable as $$
+  with s as (
+    select * from scans
+    where user_id = p_user_id and "timestamp" >= p_start and "timestamp" < p_end
+  )
+  select jsonb_build_object(
+    'total_scans', (select count(*) from s),
+    'unique_landmarks', (
+      select count(distinct lower(trim(landmark_name))) from s
+      where landmark_name is not null
+        and lower(trim(landmark_name)) not in ('', 'unknown', 'uncertain')),
+    'cities', coalesce((
+      select jsonb_agg(jsonb_build_object('name', city, 'count', n) order by n desc)
+      from (select city, count(*) n from s where city is not null
+            group by city order by n desc limit 12) c), '[]'::jsonb),
+    'tags', coalesce((
+      select jsonb_agg(jsonb_build_object('name', tag, 'count', n) order by n desc)
+      from (select tag, count(*) n from s, unnest(s.tags) tag
+            group by tag order by n desc limit 12) t), '[]'::jsonb),
+    'months', coalesce((
+      select jsonb_agg(jsonb_build_object('month', m, 'count', n) order by m)
+      from (select to_char(date_trunc('month', "timestamp"), 'YYYY-MM') m, count(*) n
+            from s group by 1) mo), '[]'::jsonb),
+    'landmarks', coalesce((
+      select jsonb_agg(jsonb_build_object('name', landmark_name, 'count', n) order by n desc)
+      from (select landmark_name, count(*) n from s where landmark_name is not null
+            group by landmark_name order by n desc limit 10) l), '[]'::jsonb)
+  );
+$$;
+
+-- make the new function visible to the REST API right away
+notify pgrst, 'reload schema';
@@ -1,44 +1,108 @@
-from typing import Optional, Any
-from datetime import datetime
-from backend.db.supabase import get_supabase
+from typing import Any, Awaitable, Optional, TypeVar
+from collections import deque
+from datetime import datetime, timezone
+from backend.db.supabase import get_async_supabase
+from backend.db import user_stats
+from backend.services.latency import percentile
+from storage3.exceptions import StorageApiError
+import asyncio
+import base64
+import json
+import random
+import time
 import uuid
 
+T = TypeVar("T")
 
-def upload_scan_image(user_id: str, image_bytes: bytes, mime_type: str = "image/jpeg") -> Optional[str]:
+# per-query round trip timings, for /metrics/db
+_query_latency_ms: dict[str, deque] = {}
+_query_errors: dict[str, int] = {}
+
+# optimistic user_stats writes: re-read and retry when another writer won the race
+STATS_WRITE_ATTEMPTS = 5
+
+
+async def _timed(name: str, call: Awaitable[T]) -> T:
+    """Await one database round trip, recording its latency (and failure) under name."""
+    started = time.perf_counter()
+    try:
+        return await call
+    except Exception:
+        _query_errors[name] = _query_errors.get(name, 0) + 1
+        raise
+    finally:
+        _query_latency_ms.setdefault(name, deque(maxlen=500)).append((time.perf_counter() - started) * 1000)
+
+
+def query_stats() -> dict[str, Any]:
+    """Count, errors and p50/p90/max latency per query over its last 500 calls."""
+    stats = {}
+    for name, samples in sorted(_query_latency_ms.items()):
+        values = list(samples)
+        stats[name] = {
+            "count": len(values),
+            "errors": _query_errors.get(name, 0),
+            "p50_ms": percentile(values, 0.5),
+            "p90_ms": percentile(values, 0.9),
+            "max_ms": round(max(values), 1) if values else None,
+        }
+    return stats
+
+
+async def upload_scan_image(
+    user_id: str,
+    image_bytes: bytes,
+    mime_type: str = "image/jpeg",
+    scan_id: Optional[str] = None,
+) -> Optional[str]:
     """Upload image to Supabase Storage and return public URL"""
     try:
-        supabase = get_supabase()
+        supabase = await get_async_supabase()
         
-        # Generate unique filename
+        # Name the file after the scan when known so a retried upload finds
+        # the object it already wrote instead of leaving a duplicate
         extension = mime_type.split("/")[-1]
-        filename = f"{user_id}/{uuid.uuid4()}.{extension}"
+        filename = f"{user_id}/{scan_id or uuid.uuid4()}.{extension}"
         
-        # Upload to storage
-        supabase.storage.from_("scan-images").upload(
-            filename,
-            image_bytes,
-            {"content-type": mime_type}
-        )
+        # Upload to storage; never overwrite an existing object
+        try:
+            await _timed("upload_scan_image", supabase.storage.from_("scan-images").upload(
+                filename,
+                image_bytes,
+                {"content-type": mime_type, "upsert": "false"}
+            ))
+        except StorageApiError as e:
+            # only a retry of this scan's upload can have written this path:
+            # scan jobs upload after save_scan confirmed the scan is this user's
+            if not (scan_id and str(e.status) == "409"):
+                raise
         
         # Get public URL
-        public_url = supabase.storage.from_("scan-images").get_public_url(filename)
+        public_url = await supabase.storage.from_("scan-images").get_public_url(filename)
         return public_url
     except Exception as e:
         print(f"ERROR uploading image: {e}")
         return None
 
 
-def update_scan_image_url(scan_id: str, image_url: str) -> bool:
-    """Update existing scan with image URL"""
+async def update_scan_image_url(scan_id: str, image_url: str, user_id: str) -> bool:
+    """Update the user's existing scan with image URL"""
     try:
-        supabase = get_supabase()
-        result = supabase.table("scans").update({"image_url": image_url}).eq("id", scan_id).execute()
+        supabase = await get_async_supabase()
+        result = await _timed(
+            "update_scan_image_url",
+            supabase.table("scans")
+            .update({"image_url": image_url})
+            .eq("id", scan_id)
+            .eq("user_id", user_id)
+            .execute(),
+        )
         return bool(result.data)
     except Exception as e:
         print(f"ERROR updating scan image URL: {e}")
         return False
 
-def save_scan(
+async def save_scan(
     user_id: str,
     landmark_name: str,
     description: str,
@@ -48,10 +112,16 @@ def save_scan(
     timestamp: datetime,
     image_url: Optional[str] = None,
     city: Optional[str] = None,
+    scan_id: Optional[str] = None,
 ) -> Optional[dict[str, Any]]:
-    """Save a landmark scan to the database"""
+    """Save a landmark scan to the database.
+
+    With a pre-allocated scan_id the write is an insert that does nothing if the
+    id exists, so retrying it is safe. The existing row is returned when it is
+    this user's scan; a scan id owned by another user is refused (None).
+    """
     try:
-        supabase = get_supabase()
+        supabase = await get_async_supabase()
 
         data = {
             "user_id": user_id,
@@ -61,31 +131,311 @@ def save_scan(
             "lng": lng,
             "tags": tags,
             "timestamp": timestamp.isoformat(),
-            "image_url": image_url,
             "city": city, 
         }
+        if image_url is not None:
+            data["image_url"] = image_url
 
-        result = supabase.table("scans").insert(data).execute()
+        if scan_id:
+            data["id"] = scan_id
+            # on conflict do nothing: a client-chosen id must never overwrite a row
+            result = await _timed(
+                "save_scan", supabase.table("scans").upsert(data, ignore_duplicates=True).execute()
+            )
+            if not result.data:
+                existing = await _fetch_scan(scan_id)
+                if existing is None:
+                    # nothing inserted and no row with this id: the write itself failed
+                    raise RuntimeError(f"insert of scan {scan_id} returned no row")
+                if existing.get("user_id") != user_id:
+                    print(f"ERROR saving scan: scan id {scan_id} belongs to another user")
+                    return None
+                # saved by an earlier attempt, stats included
+                return existing
+        else:
+            result = await _timed("save_scan", supabase.table("scans").insert(data).execute())
         if result.data and isinstance(result.data, list) and len(result.data) > 0:
             item = result.data[0]
             if isinstance(item, dict):
+                await _record_scan_in_stats(user_id, item.get("id") or scan_id, landmark_name, timestamp)
                 return item
     except Exception as e:
         print(f"ERROR saving scan: {e}")
     return None
 
 
-def get_scans_for_user(user_id: str, limit: int = 50) -> list[dict[str, Any]]:
-    """Fetch newest scans for a user (for Wrapped/Journey)."""
+async def _fetch_scan(scan_id: str) -> Optional[dict[str, Any]]:
+    supabase = await get_async_supabase()
+    result = await _timed(
+        "fetch_scan",
+        supabase.table("scans").select("*").eq("id", scan_id).maybe_single().execute(),
+    )
+    if result and isinstance(result.data, dict):
+        return result.data
+    return None
+
+
+async def save_scans(scans: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Save many scans with one bulk insert (each dict has save_scan's arguments,
+    including a pre-allocated scan_id) and fold the new ones into each user's
+    stats. As in save_scan, an existing id is never overwritten: it counts as
+    saved when it is the same user's scan (a retry) and is refused otherwise.
+    Returns the rows saved, new or existing. Unlike save_scan, database errors
+    are raised so the caller can fall back to saving them one by one.
+    """
+    if not scans:
+        return []
+    supabase = await get_async_supabase()
+    data = [
+        {
+            "id": scan["scan_id"],
+            "user_id": scan["user_id"],
+            "landmark_name": scan["landmark_name"],
+            "description": scan["description"],
+            "lat": scan["lat"],
+            "lng": scan["lng"],
+            "tags": scan["tags"],
+            "timestamp": scan["timestamp"].isoformat(),
+            "image_url": scan.get("image_url"),
+            "city": scan.get("city"),
+        }
+        for scan in scans
+    ]
+    # on conflict do nothing: only the rows actually inserted come back
+    result = await _timed("save_scans", supabase.table("scans").upsert(data, ignore_duplicates=True).execute())
+    inserted = [x for x in result.data if isinstance(x, dict)] if isinstance(result.data, list) else []
+    inserted_ids = {x.get("id") for x in inserted}
+
+    # stats first: a retry of a row inserted here counts as already saved
+    by_user: dict[str, list[tuple[str, str, datetime]]] = {}
+    for scan in scans:
+        if scan["scan_id"] in inserted_ids:
+            by_user.setdefault(scan["user_id"], []).append((scan["scan_id"], scan["landmark_name"], scan["timestamp"]))
+    for user_id, user_scans in by_user.items():
+        await _record_scans_in_stats(user_id, user_scans)
+
+    existing = [scan for scan in scans if scan["scan_id"] not in inserted_ids]
+    saved = list(inserted)
+    if existing:
+        owners = await _timed(
+            "save_scans_owners",
+            supabase.table("scans").select("id, user_id").in_("id", [s["scan_id"] for s in existing]).execute(),
+        )
+        owner_of = {r["id"]: r["user_id"] for r in owners.data or [] if isinstance(r, dict)}
+        missing = [scan["scan_id"] for scan in existing if scan["scan_id"] not in owner_of]
+        if missing:
+            # neither inserted nor already there: the write failed; the caller retries one by one
+            raise RuntimeError(f"bulk insert returned no row for scans {', '.join(missing)}")
+        for scan in existing:
+            if owner_of[scan["scan_id"]] == scan["user_id"]:
+                # saved by an earlier attempt, stats included
+                saved.append({"id": scan["scan_id"], "user_id": scan["user_id"]})
+            else:
+                print(f"ERROR saving scan: scan id {scan['scan_id']} belongs to another user")
+
+    return saved
+
+
+async def _load_stats_record(user_id: str) -> Optional[tuple[dict[str, Any], int]]:
+    """(record, version) of the user's stats row, or None if there is none."""
+    supabase = await get_async_supabase()
+    result = await _timed(
+        "load_stats_record",
+        supabase.table("user_stats")
+        .select("record, version")
+        .eq("user_id", user_id)
+        .maybe_single()
+        .execute(),
+    )
+    if result and isinstance(result.data, dict) and isinstance(result.data.get("record"), dict):
+        return result.data["record"], int(result.data.get("version") or 0)
+    return None
+
+
+async def _store_stats_record(user_id: str, record: dict[str, Any], version: Optional[int]) -> bool:
+    """
+    Write the record only if the row is still at `version` (None = no row yet).
+    False means another writer got there first and the caller must re-read.
+    """
+    supabase = await get_async_supabase()
+    now = datetime.now(timezone.utc).isoformat()
+    if version is None:
+        query = supabase.table("user_stats").upsert(
+            {"user_id": user_id, "record": record, "version": 1, "updated_at": now},
+            ignore_duplicates=True,
+        )
+    else:
+        query = (
+            supabase.table("user_stats")
+            .update({"record": record, "version": version + 1, "updated_at": now})
+            .eq("user_id", user_id)
+            .eq("version", version)
+        )
+    result = await _timed("store_stats_record", query.execute())
+    return bool(result.data)
+
+
+async def _update_stats_record(
+    user_id: str,
+    scans: list[tuple[Optional[str], str, datetime]],
+    rebuild: bool = False,
+) -> dict[str, Any]:
+    """Fold (scan id, landmark name, timestamp) scans into the stats record, retrying on conflicts."""
+    for attempt in range(STATS_WRITE_ATTEMPTS):
+        if attempt:
+            # jitter so writers that collided don't collide again
+            await asyncio.sleep(random.uniform(0, 0.05 * attempt))
+        loaded = await _load_stats_record(user_id)
+        version = loaded[1] if loaded else None
+        if rebuild or loaded is None or not user_stats.is_current(loaded[0]):
+            # first scan, stats never built or an old layout: the rebuild includes the new rows
+            record = user_stats.build_record(await _scan_rows(user_id, "id, landmark_name, timestamp"))
+        else:
+            record = loaded[0]
+        for scan_id, landmark_name, timestamp in scans:
+            user_stats.apply_scan(record, scan_id, landmark_name, timestamp)
+        if await _store_stats_record(user_id, record, version):
+            return record
+    raise RuntimeError(f"user stats for {user_id} kept changing, gave up after {STATS_WRITE_ATTEMPTS} attempts")
+
+
+async def _record_scan_in_stats(user_id: str, scan_id: str, landmark_name: str, timestamp: datetime) -> None:
+    """Fold a newly saved scan into the user's materialized stats."""
+    await _record_scans_in_stats(user_id, [(scan_id, landmark_name, timestamp)])
+
+
+async def _record_scans_in_stats(user_id: str, scans: list[tuple[str, str, datetime]]) -> None:
+    """Fold newly saved scans into the user's materialized stats with one read and one write."""
     try:
-        supabase = get_supabase()
-        res = (
+        await _update_stats_record(user_id, scans)
+    except Exception as e:
+        # rebuild_user_stats reconciles any drift later
+        print(f"ERROR updating user stats: {e}")
+
+
+async def _scan_rows(
+    user_id: str,
+    columns: str,
+    page_size: int = 1000,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> list[dict[str, Any]]:
+    """Every scan row of a user (optionally with a timestamp in [since, until)), oldest first."""
+    supabase = await get_async_supabase()
+    collected: list[dict[str, Any]] = []
+    start = 0
+    while True:
+        query = supabase.table("scans").select(columns).eq("user_id", user_id)
+        if since is not None:
+            query = query.gte("timestamp", since.isoformat())
+        if until is not None:
+            query = query.lt("timestamp", until.isoformat())
+        res = await _timed(
+            "scan_rows_page",
+            query
+            .order("timestamp")
+            .range(start, start + page_size - 1)
+            .execute(),
+        )
+        rows = res.data if isinstance(res.data, list) else []
+        collected.extend(r for r in rows if isinstance(r, dict))
+        if len(rows) < page_size:
+            return collected
+        start += page_size
+
+
+async def rebuild_user_stats(user_id: str) -> dict[str, Any]:
+    """Recompute a user's stats record from the raw scans table and store it."""
+    return await _update_stats_record(user_id, [], rebuild=True)
+
+
+async def get_user_ids_with_scans(page_size: int = 1000) -> list[str]:
+    """Every user id that has at least one scan (for stats backfill)."""
+    supabase = await get_async_supabase()
+    user_ids: set[str] = set()
+    start = 0
+    while True:
+        res = await _timed(
+            "user_ids_with_scans_page",
             supabase.table("scans")
-            .select("id,user_id,landmark_name,description,lat,lng,tags,timestamp,image_url")
+            .select("user_id")
+            .order("id")
+            .range(start, start + page_size - 1)
+            .execute(),
+        )
+        rows = res.data if isinstance(res.data, list) else []
+        user_ids.update(r["user_id"] for r in rows if isinstance(r, dict) and r.get("user_id"))
+        if len(rows) < page_size:
+            return sorted(user_ids)
+        start += page_size
+
+
+SCAN_COLUMNS = ("id", "user_id", "landmark_name", "description", "lat", "lng", "tags", "timestamp", "image_url", "city")
+DEFAULT_SCAN_COLUMNS = ("id", "user_id", "landmark_name", "description", "lat", "lng", "tags", "timestamp", "image_url")
+
+
+def encode_scan_cursor(row: dict[str, Any]) -> str:
+    """Opaque keyset cursor pointing just after this row in (timestamp, id) desc order."""
+    raw = json.dumps([row.get("timestamp"), row.get("id")], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_scan_cursor(cursor: str) -> tuple[str, str]:
+    """(timestamp, scan id) in canonical form; both end up in a PostgREST filter string."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, scan_id = json.loads(raw)
+        # re-serialize what was parsed, never the client's text
+        return datetime.fromisoformat(ts.replace("Z", "+00:00")).isoformat(), str(uuid.UUID(scan_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+async def get_scans_for_user(
+    user_id: str,
+    limit: int = 50,
+    fields: Optional[list[str]] = None,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+) -> list[dict[str, Any]]:
+    """Fetch newest scans for a user (for Wrapped/Journey).
+
+    fields   columns to return (id and timestamp are always included for paging)
+    cursor   keyset cursor from encode_scan_cursor; returns rows after it
+    since    only scans with a timestamp after this (delta sync)
+
+    Raises ValueError for unknown fields or a malformed cursor.
+    """
+    if fields:
+        unknown = [f for f in fields if f not in SCAN_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        columns = ["id", "timestamp"] + [f for f in fields if f not in ("id", "timestamp")]
+    else:
+        columns = list(DEFAULT_SCAN_COLUMNS)
+    after = decode_scan_cursor(cursor) if cursor else None
+
+    try:
+        supabase = await get_async_supabase()
+        query = (
+            supabase.table("scans")
+            .select(",".join(columns))
             .eq("user_id", user_id)
+        )
+        if since is not None:
+            query = query.gt("timestamp", since.isoformat())
+        if after is not None:
+            ts, scan_id = after
+            # keyset: strictly older, or same timestamp with a smaller id
+            query = query.or_(f'timestamp.lt."{ts}",and(timestamp.eq."{ts}",id.lt.{scan_id})')
+        res = await _timed(
+            "get_scans_for_user",
+            query
             .order("timestamp", desc=True)
+            .order("id", desc=True)
             .limit(limit)
-            .execute()
+            .execute(),
         )
 
         if res.data and isinstance(res.data, list):
@@ -95,94 +445,40 @@ def get_scans_for_user(user_id: str, limit: int = 50) -> list[dict[str, Any]]:
     return []
 
 
-def get_user_stats(user_id: str) -> dict[str, Any]:
-    """Get user statistics from scans table"""
+async def get_recent_scans_in_range(
+    user_id: str, start: datetime, end: datetime, limit: int = 50
+) -> list[dict[str, Any]]:
+    """Newest scans in [start, end), only the columns the Wrapped screen shows."""
     try:
-        supabase = get_supabase()
-        
-        # Get total places visited (distinct landmarks)
-        all_scans = (
+        supabase = await get_async_supabase()
+        res = await _timed(
+            "get_recent_scans_in_range",
             supabase.table("scans")
-            .select("landmark_name, timestamp")
+            .select("id,landmark_name,timestamp,image_url,tags")
             .eq("user_id", user_id)
-            .execute()
+            .gte("timestamp", start.isoformat())
+            .lt("timestamp", end.isoformat())
+            .order("timestamp", desc=True)
+            .limit(limit)
+            .execute(),
         )
-        
-        scans_data = all_scans.data if all_scans.data else []
-        
-        # Ensure we have a list of dicts
-        if not isinstance(scans_data, list):
-            scans_data = []
-        
-        # Count unique landmarks
-        unique_landmarks = set()
-        for scan in scans_data:
-            if isinstance(scan, dict) and scan.get("landmark_name"):
-                unique_landmarks.add(scan["landmark_name"])
-        places_visited = len(unique_landmarks)
-        
-        # Count scans this week
-        from datetime import datetime, timedelta, timezone
-        week_ago = datetime.now(timezone.utc) - timedelta(days=7)
-        scans_this_week = 0
-        
-        for scan in scans_data:
-            if isinstance(scan, dict) and scan.get("timestamp"):
-                try:
-                    timestamp_str = str(scan["timestamp"])
-                    scan_time = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
-                    if scan_time > week_ago:
-                        scans_this_week += 1
-                except (ValueError, KeyError):
-                    continue
-        
-        # Calculate streak: once every 3 days counts as 1 streak point
-        streak_days = 0
-        if scans_data:
-            # Extract all scan dates
-            scan_dates = set()
-            for scan in scans_data:
-                if isinstance(scan, dict) and scan.get("timestamp"):
-                    try:
-                        timestamp_str = str(scan["timestamp"])
-                        scan_time = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
-                        scan_dates.add(scan_time.date())
-                    except (ValueError, KeyError):
-                        continue
-            
-            if scan_dates:
-                # Start from today and go backwards in 3-day periods
-                today = datetime.now(timezone.utc).date()
-                current_date = today
-                
-                # Check each 3-day period going backwards
-                while True:
-                    period_start = current_date - timedelta(days=2)
-                    period_end = current_date
-                    
-                    # Check if there's at least one scan in this 3-day period
-                    has_scan_in_period = any(
-                        period_start <= scan_date <= period_end 
-                        for scan_date in scan_dates
-                    )
-                    
-                    if has_scan_in_period:
-                        streak_days += 1
-                        # Move to next 3-day period backwards
-                        current_date = period_start - timedelta(days=1)
-                    else:
-                        # Streak is broken
-                        break
-                    
-                    # Stop if we've gone too far back (e.g., 1 year)
-                    if (today - current_date).days > 365:
-                        break
-        
-        return {
-            "places_visited": places_visited,
-            "scans_this_week": scans_this_week,
-            "streak_days": streak_days,
-        }
+        if res.data and isinstance(res.data, list):
+            return [x for x in res.data if isinstance(x, dict)]
+    except Exception as e:
+        print(f"ERROR getting recent scans: {e}")
+    return []
+
+
+async def get_user_stats(user_id: str) -> dict[str, Any]:
+    """Get user statistics from the materialized user_stats record"""
+    try:
+        loaded = await _load_stats_record(user_id)
+        if loaded is None or not user_stats.is_current(loaded[0]):
+            # not built yet for this user (or an old layout): backfill once from the scans table
+            record = await rebuild_user_stats(user_id)
+        else:
+            record = loaded[0]
+        return user_stats.compute_stats(record)
     except Exception as e:
         print(f"ERROR getting user stats: {e}")
         return {
@@ -192,59 +488,138 @@ def get_user_stats(user_id: str) -> dict[str, Any]:
         }
 
 
-def get_profile(user_id: str) -> Optional[dict[str, Any]]:
+PROFILE_COLUMNS = "id, username, email, age_group, interest, onboarding_done"
+
+
+def _map_profile(profile: dict[str, Any]) -> dict[str, Any]:
+    # Map database columns to expected format
+    interest_str = profile.get("interest")
+    interests_list = []
+    if interest_str and isinstance(interest_str, str):
+        interests_list = [i.strip() for i in interest_str.split(",") if i.strip()]
+
+    return {
+        "user_id": profile.get("id"),
+        "age_bracket": profile.get("age_group"),
+        "interests": interests_list,
+        "username": profile.get("username"),
+        "email": profile.get("email"),
+    }
+
+
+async def fetch_profile(user_id: str) -> Optional[dict[str, Any]]:
+    """
+    Profile row for a user, or None if the user has no profile.
+    Unlike get_profile, database errors are raised, so callers can tell
+    "no profile" apart from "lookup failed" (the profile cache relies on it).
+    """
+    supabase = await get_async_supabase()
+    result = await _timed(
+        "fetch_profile",
+        supabase.table("profiles")
+        .select(PROFILE_COLUMNS)
+        .eq("id", user_id)
+        .maybe_single()
+        .execute(),
+    )
+    if result and result.data and isinstance(result.data, dict):
+        return _map_profile(result.data)
+    return None
+
+
+async def get_profile(user_id: str) -> Optional[dict[str, Any]]:
     """Get user profile from the database"""
-    try:    
-        supabase = get_supabase()
-        result = (
-            supabase.table("profiles")
-            .select("id, username, email, age_group, interest, onboarding_done")
-            .eq("id", user_id)
-            .maybe_single()
-            .execute()
-        )
-        
-        if result and result.data and isinstance(result.data, dict):
-            profile = result.data
-            
-            # Map database columns to expected format
-            interest_str = profile.get("interest")
-            interests_list = []
-            if interest_str and isinstance(interest_str, str):
-                interests_list = [i.strip() for i in interest_str.split(",") if i.strip()]
-            
-            mapped_profile = {
-                "user_id": profile.get("id"),
-                "age_bracket": profile.get("age_group"),
-                "interests": interests_list,
-                "username": profile.get("username"),
-                "email": profile.get("email"),
-            }
-            return mapped_profile
-        else:
-            print(f"[get_profile] No valid profile data found. Result exists: {result is not None}, Has data: {result.data if result else 'N/A'}")
+    try:
+        profile = await fetch_profile(user_id)
+        if profile is None:
+            print(f"[get_profile] No profile found for {user_id}")
+        return profile
     except Exception as e:
         print(f"ERROR getting profile: {e}")
     return None
 
-def get_top_city_for_user(user_id: str) -> Optional[str]:
-    try:
-        supabase = get_supabase()
-        res = (
-            supabase.table("scans")
-            .select("city")
-            .eq("user_id", user_id)
-            .not_.is_("city", "null")
-            .execute()
-        )
 
-        rows = res.data if isinstance(res.data, list) else []
-        cities = [r["city"] for r in rows if r.get("city")]
-        if not cities:
-            return None
+async def update_profile(user_id: str, fields: dict[str, Any]) -> Optional[dict[str, Any]]:
+    """
+    Upsert profile fields given in the API format (age_bracket, interests,
+    username, email, onboarding_done) and return the stored profile.
+    """
+    row: dict[str, Any] = {"id": user_id}
+    if "age_bracket" in fields:
+        row["age_group"] = fields["age_bracket"]
+    if "interests" in fields:
+        interests = fields["interests"] or []
+        row["interest"] = ", ".join(interests) if interests else None
+    for key in ("username", "email", "onboarding_done"):
+        if key in fields:
+            row[key] = fields[key]
+
+    supabase = await get_async_supabase()
+    result = await _timed("update_profile", supabase.table("profiles").upsert(row).execute())
+    if result.data:
+        return _map_profile(result.data[0])
+    return await fetch_profile(user_id)
+
 
-        from collections import Counter
-        return Counter(cities).most_common(1)[0][0]
+async def get_wrapped_aggregates(user_id: str, start: datetime, end: datetime) -> Optional[dict[str, Any]]:
+    """
+    Grouped counts for a user's scans in [start, end), computed in Postgres by
+    the wrapped_aggregates function (migrations/0002_wrapped_aggregates.sql) so
+    only the counts cross the wire. If the function is missing or fails, the
+    same counts are computed here from the raw rows.
+    """
+    try:
+        supabase = await get_async_supabase()
+        res = await _timed("get_wrapped_aggregates", supabase.rpc(
+            "wrapped_aggregates",
+            {"p_user_id": user_id, "p_start": start.isoformat(), "p_end": end.isoformat()},
+        ).execute())
+        if isinstance(res.data, dict):
+            return res.data
     except Exception as e:
-        print(f"ERROR get_top_city_for_user: {e}")
-        return None
+        print(f"ERROR get_wrapped_aggregates, aggregating client-side: {e}")
+
+    try:
+        rows = await _scan_rows(user_id, "landmark_name, city, tags, timestamp", since=start, until=end)
+        return wrapped_aggregates_from_rows(rows)
+    except Exception as e:
+        print(f"ERROR get_wrapped_aggregates fallback: {e}")
+    return None
+
+
+def _top_counts(counts: dict[str, int], limit: int) -> list[dict[str, Any]]:
+    ordered = sorted(counts.items(), key=lambda kv: -kv[1])[:limit]
+    return [{"name": name, "count": n} for name, n in ordered]
+
+
+def wrapped_aggregates_from_rows(rows: list[dict[str, Any]]) -> dict[str, Any]:
+    """Same result as the wrapped_aggregates SQL function, from scan rows."""
+    landmarks: dict[str, int] = {}
+    unique: set[str] = set()
+    cities: dict[str, int] = {}
+    tags: dict[str, int] = {}
+    months: dict[str, int] = {}
+    for row in rows:
+        name = row.get("landmark_name")
+        if name is not None:
+            landmarks[name] = landmarks.get(name, 0) + 1
+            key = name.strip(" ").lower()
+            if key not in ("", "unknown", "uncertain"):
+                unique.add(key)
+        city = row.get("city")
+        if city is not None:
+            cities[city] = cities.get(city, 0) + 1
+        for tag in row.get("tags") or []:
+            tags[tag] = tags.get(tag, 0) + 1
+        ts = user_stats.parse_timestamp(row.get("timestamp"))
+        if ts is not None:
+            month = ts.astimezone(timezone.utc).strftime("%Y-%m")
+            months[month] = months.get(month, 0) + 1
+    return {
+        "total_scans": len(rows),
+        "unique_landmarks": len(unique),
+        "cities": _top_counts(cities, 12),
+        "tags": _top_counts(tags, 12),
+        "months": [{"month": m, "count": n} for m, n in sorted(months.items())],
+        "landmarks": _top_counts(landmarks, 10),
+    }
@@ -0,0 +1,35 @@
+"""
+Rebuild materialized user stats from the raw scans table.
+
+    python -m backend.db.rebuild_stats              # every user with scans
+    python -m backend.db.rebuild_stats <user_id>... # specific users
+"""
+import argparse
+import asyncio
+
+from dotenv import load_dotenv
+
+from backend.db import queries, user_stats
+
+
+async def rebuild(user_ids: list[str]) -> None:
+    user_ids = user_ids or await queries.get_user_ids_with_scans()
+    for user_id in user_ids:
+        try:
+            record = await queries.rebuild_user_stats(user_id)
+            print(f"{user_id}: {user_stats.compute_stats(record)}")
+        except Exception as e:
+            print(f"ERROR rebuilding stats for {user_id}: {e}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("user_ids", nargs="*", help="users to rebuild (default: all users with scans)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    asyncio.run(rebuild(args.user_ids))
+
+
+if __name__ == "__main__":
+    main()
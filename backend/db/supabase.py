@@ -1,14 +1,51 @@
-from supabase import create_client, Client
+from supabase import create_client, acreate_client, AsyncClient, AsyncClientOptions, Client
+import asyncio
 import os
 
+from backend.services.http_clients import get_client
+
 _supabase_client: Client | None = None
+_async_supabase_client: AsyncClient | None = None
+_async_lock: asyncio.Lock | None = None
+
+
+def _credentials() -> tuple[str, str]:
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SECRET_KEY")
+    if not url or not key:
+        raise ValueError("SUPABASE_URL and SUPABASE_SECRET_KEY must be set in environment variables")
+    return url, key
+
 
 def get_supabase() -> Client:
     global _supabase_client
     if _supabase_client is None:
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_SECRET_KEY")
-        if not url or not key:
-            raise ValueError("SUPABASE_URL and SUPABASE_SECRET_KEY must be set in environment variables")
-        _supabase_client = create_client(url, key)
-    return _supabase_client
\ No newline at end of file
+        _supabase_client = create_client(*_credentials())
+    return _supabase_client
+
+
+async def get_async_supabase() -> AsyncClient:
+    """
+    Shared async client. PostgREST and Storage calls go through the pooled
+    "supabase_db" httpx client, so concurrent queries reuse keep-alive
+    (HTTP/2) connections instead of each holding a thread.
+    """
+    global _async_supabase_client, _async_lock
+    client = _async_supabase_client
+    if client is not None and not client.options.httpx_client.is_closed:
+        return client
+    if _async_lock is None:
+        _async_lock = asyncio.Lock()
+    async with _async_lock:
+        client = _async_supabase_client
+        if client is None or client.options.httpx_client.is_closed:
+            url, key = _credentials()
+            client = await acreate_client(url, key, AsyncClientOptions(httpx_client=get_client("supabase_db")))
+            _async_supabase_client = client
+    return client
+
+
+async def close_async_supabase() -> None:
+    # the pooled httpx client itself is closed by http_clients.shutdown
+    global _async_supabase_client
+    _async_supabase_client = None
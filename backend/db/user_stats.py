@@ -0,0 +1,132 @@
+"""
+Materialized per-user stats, kept up to date by save_scan so the profile
+screen doesn't have to scan a user's whole history.
+
+Stored one row per user in the `user_stats` table (user_id, record jsonb,
+version, updated_at), created by migrations/0001_user_stats.sql.
+
+Writers update a row only if `version` is still the one they read, and retry
+otherwise, so concurrent scans of one user never overwrite each other.
+
+The record holds:
+    places       {landmark name: 1} for each distinct landmark (places_visited = its size)
+    recent       {scan id: hour number} for scans in the last 8 days (scans_this_week);
+                 keyed by scan id so folding the same scan in twice counts it once
+    days_anchor  ordinal of the newest active day
+    days_bitmap  hex bitmap of active days, bit i = days_anchor - i (streaks)
+"""
+from datetime import datetime, timezone
+from typing import Any, Iterable, Optional
+
+# keep a bit more than the streak loop can look back (365 days)
+BITMAP_DAYS = 400
+RECENT_KEEP_HOURS = 8 * 24
+WEEK_HOURS = 7 * 24
+STREAK_WINDOW_DAYS = 3
+
+
+def empty_record() -> dict[str, Any]:
+    return {"places": {}, "recent": {}, "days_anchor": None, "days_bitmap": "0"}
+
+
+def is_current(record: dict[str, Any]) -> bool:
+    """False for records in an older layout (places list, hour counts); rebuild those."""
+    return isinstance(record.get("places"), dict) and isinstance(record.get("recent"), dict)
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        ts = value
+    else:
+        try:
+            ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts
+
+
+def _hour_number(ts: datetime) -> int:
+    return int(ts.timestamp() // 3600)
+
+
+def apply_scan(record: dict[str, Any], scan_id: Optional[str], landmark_name: Optional[str], timestamp: Any) -> dict[str, Any]:
+    """Fold one scan into the record (in place) and return it. Applying a scan twice is a no-op."""
+    if landmark_name:
+        record["places"][landmark_name] = 1
+
+    ts = parse_timestamp(timestamp)
+    if ts is None:
+        return record
+
+    # recent scans by id; drop ones too old to matter for "this week"
+    now_hour = _hour_number(datetime.now(timezone.utc))
+    recent = {k: h for k, h in record["recent"].items() if h > now_hour - RECENT_KEEP_HOURS}
+    h = _hour_number(ts)
+    if scan_id and h > now_hour - RECENT_KEEP_HOURS:
+        recent[str(scan_id)] = h
+    record["recent"] = recent
+
+    # active-day bitmap anchored at the newest day
+    day = ts.astimezone(timezone.utc).date().toordinal()
+    bitmap = int(record["days_bitmap"], 16)
+    anchor = record["days_anchor"]
+    if anchor is None:
+        anchor = day
+    elif day > anchor:
+        bitmap <<= day - anchor
+        anchor = day
+    offset = anchor - day
+    if offset < BITMAP_DAYS:
+        bitmap |= 1 << offset
+    bitmap &= (1 << BITMAP_DAYS) - 1
+    record["days_anchor"] = anchor
+    record["days_bitmap"] = format(bitmap, "x")
+    return record
+
+
+def build_record(scans: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """Recompute a record from raw scan rows (id, landmark_name, timestamp)."""
+    record = empty_record()
+    for scan in scans:
+        if isinstance(scan, dict):
+            apply_scan(record, scan.get("id"), scan.get("landmark_name"), scan.get("timestamp"))
+    return record
+
+
+def _has_day_in(bitmap: int, anchor: int, first_day: int, last_day: int) -> bool:
+    # bit positions for [first_day, last_day], clipped to what the bitmap covers
+    lo = max(0, anchor - last_day)
+    hi = anchor - first_day
+    if hi < lo:
+        return False
+    mask = ((1 << (hi - lo + 1)) - 1) << lo
+    return bool(bitmap & mask)
+
+
+def compute_stats(record: dict[str, Any]) -> dict[str, int]:
+    now = datetime.now(timezone.utc)
+
+    now_hour = _hour_number(now)
+    scans_this_week = sum(1 for h in record["recent"].values() if h > now_hour - WEEK_HOURS)
+
+    # streak: once every 3 days counts as 1 streak point, going back from today
+    streak_days = 0
+    anchor = record["days_anchor"]
+    if anchor is not None:
+        bitmap = int(record["days_bitmap"], 16)
+        today = now.date().toordinal()
+        current = today
+        while _has_day_in(bitmap, anchor, current - (STREAK_WINDOW_DAYS - 1), current):
+            streak_days += 1
+            current -= STREAK_WINDOW_DAYS
+            # Stop if we've gone too far back (e.g., 1 year)
+            if today - current > 365:
+                break
+
+    return {
+        "places_visited": len(record["places"]),
+        "scans_this_week": scans_this_week,
+        "streak_days": streak_days,
+    }
@@ -1,23 +1,66 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+
+# load .env before importing modules that read settings at import time
+load_dotenv()
+
 from backend.routes import identify, wrapped, scans
 import uvicorn
 from backend.routes.auth import router as auth_router
 from backend.routes.chat import router as chat_router
 from backend.routes.profile import router as profile_router
+from backend.routes.metrics import router as metrics_router
+from backend.services import auth_tokens, batch_identify, cache, chat_prefetch, chat_sessions, http_clients, image_embedding, image_pipeline, place_index, scan_jobs, tiered_cache, uploads
+from backend.services.uploads import UploadLimitMiddleware
+from backend.services.gemini import close_gemini
+from backend.db.supabase import close_async_supabase
 
-load_dotenv()
 
-app = FastAPI(title="Landmark Lens API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # shared outbound HTTP pools live for the whole process
+    await http_clients.startup()
+    await auth_tokens.startup()
+    cache.start_sweeper()
+    await tiered_cache.startup()
+    await scan_jobs.startup()
+    yield
+    await batch_identify.shutdown()
+    await scan_jobs.shutdown()
+    await chat_prefetch.shutdown()
+    await chat_sessions.shutdown()
+    await tiered_cache.shutdown()
+    await cache.stop_sweeper()
+    await auth_tokens.shutdown()
+    await close_async_supabase()
+    await http_clients.shutdown()
+    await close_gemini()
+    image_pipeline.shutdown()
+    place_index.close()
+    image_embedding.close()
 
+
+app = FastAPI(title="Landmark Lens API", version="1.0.0", lifespan=lifespan)
+
+# refuse oversized photo uploads before the multipart parser spools them
+app.add_middleware(
+    UploadLimitMiddleware,
+    limits={
+        "/identify": uploads.MAX_IMAGE_BYTES + uploads.FORM_OVERHEAD_BYTES,
+        "/identify/batch": batch_identify.BATCH_IDENTIFY_MAX_ITEMS * uploads.MAX_IMAGE_BYTES + uploads.FORM_OVERHEAD_BYTES,
+    },
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # let browser clients read the scan history paging/caching headers
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # Include routers
@@ -27,6 +70,7 @@ app.include_router(identify.router)
 app.include_router(wrapped.router)
 app.include_router(profile_router)
 app.include_router(scans.router)
+app.include_router(metrics_router)
 
 @app.get("/")
 async def root():
@@ -1,13 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends, Header
 from pydantic import BaseModel
 from typing import Optional
+import os
+from backend.services import auth_tokens
+from backend.services.http_clients import get_client
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-# mock store
-USERS = {}   # email -> {"email":..., "password":..., "username":...}
-TOKENS = {}  # token -> email
-
 class SignupIn(BaseModel):
     username: str
     email: str
@@ -24,37 +23,58 @@ class UserOut(BaseModel):
     email: str
     username: str
 
-def get_current_user(authorization: Optional[str] = Header(default=None)) -> dict:
+async def get_current_user(authorization: Optional[str] = Header(default=None)) -> dict:
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing token")
     token = authorization.split(" ", 1)[1]
-    email = TOKENS.get(token)
-    if not email or email not in USERS:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    return USERS[email]
+    try:
+        # verified locally against cached signing keys, no call to Supabase
+        claims = await auth_tokens.verify(token)
+    except auth_tokens.AuthError as e:
+        raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
+    email = claims.get("email") or ""
+    metadata = claims.get("user_metadata") or {}
+    return {
+        "id": claims["sub"],
+        "email": email,
+        "username": metadata.get("username") or email.split("@", 1)[0],
+    }
+
+async def _supabase_auth(path: str, body: dict) -> tuple[int, dict]:
+    url = (os.getenv("SUPABASE_URL") or "").rstrip("/")
+    key = os.getenv("SUPABASE_PUBLISHABLE_KEY")
+    if not url or not key:
+        raise HTTPException(status_code=500, detail="SUPABASE_URL and SUPABASE_PUBLISHABLE_KEY must be set")
+    resp = await get_client("supabase_auth").post(f"{url}/auth/v1/{path}", json=body, headers={"apikey": key})
+    try:
+        data = resp.json()
+    except ValueError:
+        data = {}
+    return resp.status_code, data
 
 @router.post("/signup", response_model=TokenOut)
-def signup(payload: SignupIn):
-    if payload.email in USERS:
-        raise HTTPException(status_code=400, detail="Email already exists")
-    USERS[payload.email] = {
-        "email": payload.email,
-        "password": payload.password,
-        "username": payload.username,
-    }
-    token = f"mocktoken-{payload.email}"
-    TOKENS[token] = payload.email
-    return {"access_token": token}
+async def signup(payload: SignupIn):
+    status, data = await _supabase_auth(
+        "signup",
+        {"email": payload.email, "password": payload.password, "data": {"username": payload.username}},
+    )
+    if status >= 400:
+        detail = data.get("msg") or data.get("error_description") or "Signup failed"
+        raise HTTPException(status_code=400, detail=detail)
+    if not data.get("access_token"):
+        raise HTTPException(status_code=400, detail="Confirm your email address, then log in")
+    return {"access_token": data["access_token"]}
 
 @router.post("/login", response_model=TokenOut)
-def login(payload: LoginIn):
-    user = USERS.get(payload.email)
-    if not user or user["password"] != payload.password:
+async def login(payload: LoginIn):
+    status, data = await _supabase_auth(
+        "token?grant_type=password",
+        {"email": payload.email, "password": payload.password},
+    )
+    if status >= 400 or not data.get("access_token"):
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = f"mocktoken-{payload.email}"
-    TOKENS[token] = payload.email
-    return {"access_token": token}
+    return {"access_token": data["access_token"]}
 
 @router.get("/me", response_model=UserOut)
-def me(user=Depends(get_current_user)):
+async def me(user=Depends(get_current_user)):
     return {"email": user["email"], "username": user["username"]}
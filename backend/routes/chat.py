@@ -1,43 +1,103 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Optional
-from backend.services.chat_service import chat_about_landmark
+from typing import List, Optional
+import json
+from backend.schemas.chat import ChatMessage, ChatSession
+from backend.services import chat_sessions
+from backend.services.chat_service import chat_in_session, stream_chat_in_session
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-class ChatMessage(BaseModel):
-    role: str  # "user" or "assistant"
-    content: str
-
 class ChatRequest(BaseModel):
-    landmark_name: str
-    landmark_info: str
-    conversation_history: List[ChatMessage] = []
     user_message: str
+    # with a session_id the server already holds the landmark and history;
+    # without one, a new session is started from the fields below
+    session_id: Optional[str] = None
+    landmark_name: Optional[str] = None
+    landmark_info: Optional[str] = None
+    conversation_history: List[ChatMessage] = []
     user_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     response: str
     suggested_questions: List[str] = []
+    session_id: Optional[str] = None
+
+class ChatSessionRequest(BaseModel):
+    landmark_name: str
+    landmark_info: str
+
+class ChatSessionResponse(BaseModel):
+    session_id: str
+
+
+async def _resolve_session(request: ChatRequest) -> ChatSession:
+    if request.session_id:
+        session = await chat_sessions.get_session(request.session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Chat session not found or expired")
+        return session
+
+    if not request.landmark_name or request.landmark_info is None:
+        raise HTTPException(status_code=400, detail="landmark_name and landmark_info are required without a session_id")
+
+    history = list(request.conversation_history)
+    # clients may already include the pending message at the end of the history
+    if history and history[-1].role == "user" and history[-1].content == request.user_message:
+        history.pop()
+    return await chat_sessions.create_session(request.landmark_name, request.landmark_info, history)
+
+
+@router.post("/sessions", response_model=ChatSessionResponse)
+async def create_chat_session(request: ChatSessionRequest):
+    """
+    Start a chat session about a landmark. Later turns send only the
+    session_id and the new message.
+    """
+    session = await chat_sessions.create_session(request.landmark_name, request.landmark_info)
+    return ChatSessionResponse(session_id=session.session_id)
+
 
 @router.post("/", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """
     Chat endpoint for asking questions about a landmark.
     """
+    session = await _resolve_session(request)
     try:
-        # Convert ChatMessage objects to dicts
-        history = [{"role": msg.role, "content": msg.content} for msg in request.conversation_history]
-        
         # Get AI response with suggested questions
-        ai_response, suggested_questions = chat_about_landmark(
-            landmark_name=request.landmark_name,
-            landmark_info=request.landmark_info,
-            conversation_history=history,
-            user_message=request.user_message
+        ai_response, suggested_questions = await chat_in_session(session, request.user_message)
+
+        return ChatResponse(
+            response=ai_response,
+            suggested_questions=suggested_questions,
+            session_id=session.session_id,
         )
-        
-        return ChatResponse(response=ai_response, suggested_questions=suggested_questions)
-    
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
+
+
+@router.post("/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming chat endpoint (Server-Sent Events).
+
+    Emits a `session` event with the session id, `token` events as Gemini
+    generates the answer, one `suggested_questions` event with the parsed
+    follow-ups, and a final `done` event with time-to-first-token, total
+    time in milliseconds and the prompt token count.
+    """
+    session = await _resolve_session(request)
+
+    async def event_stream():
+        yield f"event: session\ndata: {json.dumps({'session_id': session.session_id})}\n\n"
+        async for event, data in stream_chat_in_session(session, request.user_message):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,53 +1,59 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from backend.schemas.identify import IdentifyResponse, AgeBracket
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, HTTPException, Form
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from backend.schemas.identify import BatchIdentifyItem, IdentifyResponse, AgeBracket
+from backend.services.batch_identify import BATCH_IDENTIFY_MAX_ITEMS, identify_batch
+from backend.services.chat_service import prefetch_suggested_questions
 from backend.services.identify_service import identify_landmark
-from backend.db import queries
-from typing import Optional
-from backend.services.geocode_service import reverse_geocode
+from backend.services.image_pipeline import normalize_image
+from backend.services.uploads import UploadError, detach, read_upload
+from typing import BinaryIO, List, Optional
+import json
+import uuid
 
 router = APIRouter(prefix="/identify", tags=["Identify"])
 
+async def _read_image(image: UploadFile, label: str = "") -> tuple[BinaryIO, str, int, str]:
+    """Checked upload as (file, sniffed MIME type, size, sha256); raises a 400 / 413 for bad files."""
+    try:
+        return await read_upload(image)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=f"{label}{e}")
+
+
+def _normalize_scan_id(scan_id: Optional[str]) -> Optional[str]:
+    if not scan_id:
+        return None
+    try:
+        return str(uuid.UUID(scan_id))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="scan_id must be a UUID.")
+
 
 @router.post("/", response_model=IdentifyResponse)
 async def identify_route(
+    background_tasks: BackgroundTasks,
     image: UploadFile = File(...),
     user_id: Optional[str] = Form(default=None),
     age_bracket: Optional[AgeBracket] = Form(default=None),
     interests: Optional[str] = Form(default=None),
     lat: Optional[float] = Form(default=None),
     lng: Optional[float] = Form(default=None),
+    scan_id: Optional[str] = Form(default=None),
 ):
-    # image file validation - check both content_type and filename
-    allowed_types = ["image/jpeg", "image/jpg", "image/png", "application/octet-stream"]
-    filename_lower = image.filename.lower() if image.filename else ""
-    allowed_extensions = [".jpg", ".jpeg", ".png"]
-
-    has_valid_extension = any(filename_lower.endswith(ext) for ext in allowed_extensions)
-    has_valid_content_type = image.content_type in allowed_types
-
-    if not (has_valid_content_type and has_valid_extension):
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid image format. Filename: {image.filename}, Content-Type: {image.content_type}",
-        )
+    # size, format (from magic bytes) and hash are checked as the upload is read
+    image_file, _, _, image_digest = await _read_image(image)
 
-    # Determine actual MIME type from extension
-    if filename_lower.endswith(".png"):
-        actual_mime_type = "image/png"
-    else:  # .jpg or .jpeg
-        actual_mime_type = "image/jpeg"
-
-    image_bytes = await image.read()
-    if len(image_bytes) == 0:
-        raise HTTPException(status_code=400, detail="Empty image.")
-    max_mb = 8
-    if len(image_bytes) > max_mb * 1024 * 1024:
-        raise HTTPException(status_code=400, detail=f"Files too large. {max_mb} MB limit.")
+    # client may pre-allocate the scan id so it can reference the scan offline
+    scan_id = _normalize_scan_id(scan_id)
 
     # parse interests list
     interests_list = interests.split(",") if interests else []
 
     try:
+        # downscaled, orientation-fixed JPEG without metadata feeds both Gemini and storage
+        image_bytes, actual_mime_type, _ = await normalize_image(image_file)
+
         res: IdentifyResponse = await identify_landmark(
             image_bytes=image_bytes,
             mime_type=actual_mime_type,
@@ -56,24 +62,62 @@ async def identify_route(
             interests=interests_list,
             lat=lat,
             lng=lng,
+            scan_id=scan_id,
+            digest=image_digest,
         )
 
-        # Upload image to storage if scan was saved
-        if res.scan_id and user_id:
-            try:
-                image_url = queries.upload_scan_image(
-                    user_id=user_id,
-                    image_bytes=image_bytes,
-                    mime_type=actual_mime_type,
-                )
-                if image_url:
-                    queries.update_scan_image_url(res.scan_id, image_url)
-            except Exception as img_err:
-                print(f"Warning: Failed to upload image: {img_err}")
-                # Don't fail the whole request if image upload fails
-
+        # scan row and image upload are written by the background scan job pipeline
+        if not res.needs_confirmation:
+            # no-op unless CHAT_PREFETCH=1; starts once the response is sent
+            background_tasks.add_task(
+                prefetch_suggested_questions, res.landmark_name, res.description, res.suggested_questions
+            )
         return res
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Identify failed: {str(e)}")
+
+
+@router.post("/batch")
+async def identify_batch_route(
+    images: List[UploadFile] = File(...),
+    items: Optional[str] = Form(default=None, description="JSON list of {lat, lng, timestamp, scan_id}, one per image"),
+    user_id: Optional[str] = Form(default=None),
+    age_bracket: Optional[AgeBracket] = Form(default=None),
+    interests: Optional[str] = Form(default=None),
+):
+    """
+    Identify photos taken offline in one request (Server-Sent Events).
+
+    Emits one `result` event per photo as soon as it is identified, with its
+    `index` in the upload and either `result` (an IdentifyResponse) or
+    `error`; identical photos carry `duplicate_of` pointing at the first one.
+    A final `done` event has the batch totals, sent after the scans are saved.
+    """
+    if len(images) > BATCH_IDENTIFY_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_IDENTIFY_MAX_ITEMS} images per batch.")
+    try:
+        item_list = TypeAdapter(List[BatchIdentifyItem]).validate_json(items) if items else []
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid items: {e}")
+    if items and len(item_list) != len(images):
+        raise HTTPException(status_code=400, detail="items must have one entry per image.")
+    item_list = item_list or [BatchIdentifyItem() for _ in images]
+    for item in item_list:
+        item.scan_id = _normalize_scan_id(item.scan_id)
+
+    checked = [await _read_image(image, label=f"images[{i}]: ") for i, image in enumerate(images)]
+    # the batch keeps running after the response, so it takes over the spooled files
+    uploads = [(detach(image), digest) for image, (_, _, _, digest) in zip(images, checked)]
+    interests_list = interests.split(",") if interests else []
+
+    async def event_stream():
+        async for event, data in identify_batch(uploads, item_list, user_id, age_bracket, interests_list):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
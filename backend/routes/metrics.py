@@ -0,0 +1,109 @@
+import asyncio
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from backend.db import queries
+from backend.services import (
+    auth_tokens, batch_identify, cache, chat_prefetch, chat_sessions, http_clients, identify_service,
+    image_embedding, image_pipeline, place_index, profile_cache, scan_jobs, singleflight, tiered_cache,
+    tile_cache,
+)
+
+# operator token for /metrics/*; without it the endpoints are disabled
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+async def require_metrics_token(authorization: Optional[str] = Header(default=None)) -> None:
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = authorization.split(" ", 1)[1] if authorization and authorization.startswith("Bearer ") else ""
+    if not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"], dependencies=[Depends(require_metrics_token)])
+
+
+@router.get("/http")
+async def http_pool_metrics():
+    """Connection pool usage for each outbound API client."""
+    return http_clients.pool_stats()
+
+
+@router.get("/cache")
+async def cache_metrics():
+    """L1 counters and memory use per namespace, plus shared L2 hit/error counters."""
+    return {"l1": cache.stats(), "l2": tiered_cache.stats()}
+
+
+@router.get("/singleflight")
+async def singleflight_metrics():
+    """How many identify/places/events calls were coalesced onto an in-flight one."""
+    return singleflight.stats()
+
+
+@router.get("/images")
+async def image_metrics():
+    """Bytes in/out and time per preprocessing stage for uploaded photos."""
+    return image_pipeline.stats()
+
+
+@router.get("/scan-jobs")
+async def scan_job_metrics():
+    """Background scan pipeline: jobs pending on disk, completed, retried and failed."""
+    return scan_jobs.stats()
+
+
+@router.get("/places")
+async def place_index_metrics():
+    """Size of the local Places index and how many tiles are still fresh."""
+    return await asyncio.to_thread(place_index.stats)
+
+
+@router.get("/tiles")
+async def tile_metrics():
+    """Tile hit rates (index / cache / api) per namespace and geohash precision."""
+    return tile_cache.stats()
+
+
+@router.get("/chat")
+async def chat_metrics():
+    """Chat sessions (compactions, prompt size / latency) and speculative answer use vs tokens spent."""
+    return {"sessions": chat_sessions.stats(), "prefetch": chat_prefetch.stats()}
+
+
+@router.get("/identify")
+async def identify_metrics():
+    """Flash-first cascade and shared-record layers: hit/escalation counts, tokens and p50/p90 latency per tier."""
+    return identify_service.stats()
+
+
+@router.get("/identify-batch")
+async def batch_identify_metrics():
+    """Batch identify: photos, in-batch duplicates, per-photo errors, scans bulk-saved and insert fallbacks."""
+    return batch_identify.stats()
+
+
+@router.get("/embeddings")
+async def embedding_index_metrics():
+    """Size of the local landmark embedding index, plus search / match / insert counts."""
+    return await asyncio.to_thread(image_embedding.stats)
+
+
+@router.get("/auth")
+async def auth_metrics():
+    """Local token verification: claim-cache hits, signature checks, rejections and JWKS refreshes."""
+    return auth_tokens.stats()
+
+
+@router.get("/profiles")
+async def profile_cache_metrics():
+    """Profile cache hits (incl. cached "no profile"), misses, lookup errors and invalidations."""
+    return profile_cache.stats()
+
+
+@router.get("/db")
+async def db_metrics():
+    """Per-query round trips: count, errors and p50/p90/max latency (pool usage is under /metrics/http)."""
+    return queries.query_stats()
@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException
-from backend.schemas.profile import ProfileResponse, UserProfile, UserStats
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
+from backend.schemas.profile import ProfileResponse, ProfileUpdate, UserProfile, UserStats
 from backend.db import queries
+from backend.routes.auth import get_current_user
+from backend.services import profile_cache
 
 router = APIRouter(prefix="/profile", tags=["Profile"])
 
@@ -8,15 +11,15 @@ router = APIRouter(prefix="/profile", tags=["Profile"])
 async def get_user_profile(user_id: str):
     """Get user profile and statistics"""
     try:
-        # Get profile data
-        profile_data = queries.get_profile(user_id)
+        # Profile and stats are independent reads; fetch them concurrently
+        profile_data, stats_data = await asyncio.gather(
+            profile_cache.get_profile(user_id),
+            queries.get_user_stats(user_id),
+        )
         
         if not profile_data:
             raise HTTPException(status_code=404, detail="Profile not found")
         
-        # Get user stats
-        stats_data = queries.get_user_stats(user_id)
-        
         return ProfileResponse(
             profile=UserProfile(
                 user_id=profile_data["user_id"],
@@ -35,3 +38,34 @@ async def get_user_profile(user_id: str):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching profile: {str(e)}")
+
+
+def _require_self(user_id: str, user: dict) -> None:
+    if user["id"] != user_id:
+        raise HTTPException(status_code=403, detail="Can only change your own profile")
+
+
+@router.put("/{user_id}", response_model=UserProfile)
+async def update_user_profile(user_id: str, payload: ProfileUpdate, user=Depends(get_current_user)):
+    """Update profile fields; the cached profile is replaced in the same call."""
+    _require_self(user_id, user)
+    try:
+        profile_data = await profile_cache.update_profile(user_id, payload.model_dump(exclude_unset=True))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating profile: {str(e)}")
+    if not profile_data:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return UserProfile(
+        user_id=profile_data["user_id"],
+        username=profile_data.get("username"),
+        email=profile_data.get("email"),
+        age_bracket=profile_data.get("age_bracket"),
+        interests=profile_data.get("interests", []),
+    )
+
+
+@router.post("/{user_id}/invalidate", status_code=204)
+async def invalidate_user_profile(user_id: str, user=Depends(get_current_user)):
+    """Drop the cached profile after it was changed outside this API (e.g. by the app via Supabase)."""
+    _require_self(user_id, user)
+    await profile_cache.invalidate(user_id)
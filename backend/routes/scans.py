@@ -1,9 +1,46 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from datetime import datetime
+from typing import Optional
+import hashlib
+import json
 from backend.db import queries
 
 router = APIRouter(prefix="/scans", tags=["Scans"])
 
 
 @router.get("/{user_id}")
-def get_scans(user_id: str, limit: int = Query(200, ge=1, le=500)):
-    return queries.get_scans_for_user(user_id=user_id, limit=limit)
+async def get_scans(
+    user_id: str,
+    request: Request,
+    limit: int = Query(200, ge=1, le=500),
+    fields: Optional[str] = Query(default=None, description="Comma-separated columns to return"),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor from the previous page"),
+    since: Optional[datetime] = Query(default=None, description="Only scans newer than this timestamp"),
+):
+    """
+    Scan history, newest first.
+
+    The body stays a plain list. When more rows exist, the cursor for the next
+    page is returned in the X-Next-Cursor header. Responses carry an ETag, and a
+    matching If-None-Match gets a 304 with no body.
+    """
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        rows = await queries.get_scans_for_user(
+            user_id=user_id, limit=limit, fields=field_list, cursor=cursor, since=since
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {}
+    if len(rows) == limit:
+        headers["X-Next-Cursor"] = queries.encode_scan_cursor(rows[-1])
+
+    body = json.dumps(rows, separators=(",", ":"), default=str).encode()
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    headers["ETag"] = etag
+    headers["Cache-Control"] = "private, no-cache"
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,39 +1,19 @@
-from fastapi import APIRouter, HTTPException
-from backend.db import queries
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from backend.schemas.wrapped import WrappedResponse
+from backend.services.wrapped_service import build_wrapped
 
 router = APIRouter(prefix="/wrapped", tags=["Wrapped"])
 
-@router.get("/{user_id}")
-async def get_wrapped(user_id: str, limit: int = 50):
+@router.get("/{user_id}", response_model=WrappedResponse)
+async def get_wrapped(
+    user_id: str,
+    limit: int = Query(50, ge=0, le=100),
+    year: Optional[int] = Query(default=None, ge=2000, le=2100),
+):
     try:
-        scans = queries.get_scans_for_user(user_id, limit=limit)
-
-        recent_scans = [
-            {
-                "id": s.get("id"),
-                "landmark_name": s.get("landmark_name"),
-                "timestamp": s.get("timestamp"),
-                "image_url": s.get("image_url"),
-                "category": ", ".join(s.get("tags", [])) if isinstance(s.get("tags"), list) else (s.get("tags") or ""),
-            }
-            for s in scans
-        ]
-
-        # tạm fake cities bằng tag đầu tiên (vì table chưa có city)
-        buckets = {}
-        for s in scans:
-            tags = s.get("tags")
-            key = tags[0] if isinstance(tags, list) and tags else "Landmarks"
-            buckets[str(key)] = buckets.get(str(key), 0) + 1
-
-        top = sorted(buckets.items(), key=lambda x: x[1], reverse=True)[:6]
-        palette = ["#7ADBCF", "#F05B55", "#1F8A70", "#B8F3EA", "#F4B7B2", "#A7F3D0"]
-
-        cities = [
-            {"name": name, "color_hex": palette[i % len(palette)], "count": cnt}
-            for i, (name, cnt) in enumerate(top)
-        ]
-
-        return {"cities": cities, "recent_scans": recent_scans}
+        snapshot = await build_wrapped(user_id, year)
+        # snapshot is shared through the cache, so slice a copy
+        return snapshot.model_copy(update={"recent_scans": snapshot.recent_scans[:limit]})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
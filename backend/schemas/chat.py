@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import List
+
+
+class ChatMessage(BaseModel):
+    role: str  # "user" or "assistant"
+    content: str
+
+
+class ChatSession(BaseModel):
+    session_id: str
+    landmark_name: str
+    landmark_info: str
+    summary: str = ""  # running summary of turns that were compacted away
+    turns: List[ChatMessage] = []  # recent turns, oldest first
+    compacted_turns: int = 0
+    created_at: float
+    updated_at: float
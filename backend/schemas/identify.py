@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List, Literal
+from datetime import datetime
 
 AgeBracket = Literal["kid", "teen", "adult", "senior"]
 
@@ -36,6 +37,39 @@ class EventSuggestion(BaseModel):
     distance_meters: Optional[int] = None
     category: Optional[str] = None
     url: Optional[str] = None
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+
+class LandmarkRecognition(BaseModel):
+    # low-detail first look: just enough to find a shared LandmarkRecord
+    landmark_name: str
+    location: str = "Unknown"
+    confidence_score: Optional[float] = None
+
+class LandmarkRecord(BaseModel):
+    # profile-independent layer of an identify result, shared across users
+    landmark_name: str
+    location: str
+    landmark_lat: Optional[float] = None
+    landmark_lng: Optional[float] = None
+    tags: List[str] = Field(default_factory=list)
+    description: str
+    discovery_facts: List[str] = Field(default_factory=list)
+    confidence_score: Optional[float] = None
+
+class LandmarkPersonalization(BaseModel):
+    # per age bracket + interests layer on top of a LandmarkRecord
+    description: str
+    match_facts: List[str] = Field(default_factory=list)
+    suggested_questions: List[str] = Field(default_factory=list)
+
+class BatchIdentifyItem(BaseModel):
+    # per-photo metadata for /identify/batch, in the same order as the images
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    # when the photo was taken; defaults to the time of the sync
+    timestamp: Optional[datetime] = None
+    scan_id: Optional[str] = None
 
 class IdentifyRequest(BaseModel):
     user_id: Optional[str] = None
@@ -61,4 +95,9 @@ class IdentifyResponse(BaseModel):
     confidence_score: Optional[float] = None
     needs_confirmation: Optional[bool] = False
     candidates: Optional[List[str]] = None
-    scan_id: Optional[str] = None
\ No newline at end of file
+    scan_id: Optional[str] = None
+
+    # set when one or more enrichment sources (landmarks, food, events, city)
+    # missed their deadline and the matching section was left empty
+    partial: bool = False
+    partial_sections: List[str] = Field(default_factory=list)
\ No newline at end of file
@@ -8,6 +8,14 @@ class UserProfile(BaseModel):
     age_bracket: Optional[str] = None
     interests: List[str] = []
 
+class ProfileUpdate(BaseModel):
+    # only the fields that are set are written
+    username: Optional[str] = None
+    email: Optional[str] = None
+    age_bracket: Optional[str] = None
+    interests: Optional[List[str]] = None
+    onboarding_done: Optional[bool] = None
+
 class UserStats(BaseModel):
     places_visited: int
     scans_this_week: int
@@ -1,14 +1,38 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional
 
-class WrappedScanItem(BaseModel):
-    landmark_name: str
-    tags: List[str] = Field(default_factory=list)
+
+class WrappedCity(BaseModel):
+    name: str
+    color_hex: str
+    count: int
+
+
+class WrappedCount(BaseModel):
+    name: str
+    count: int
+
+
+class WrappedMonth(BaseModel):
+    month: str  # "YYYY-MM"
+    count: int
+
+
+class WrappedRecentScan(BaseModel):
+    id: Optional[str] = None
+    landmark_name: Optional[str] = None
     timestamp: Optional[str] = None
+    image_url: Optional[str] = None
+    category: str = ""
 
 
 class WrappedResponse(BaseModel):
+    year: int
     total_scans: int
     unique_landmarks: int
-    top_city: Optional[str] = None         
-    items: List[WrappedScanItem] = Field(default_factory=list)
+    top_city: Optional[str] = None
+    cities: List[WrappedCity] = Field(default_factory=list)
+    tags: List[WrappedCount] = Field(default_factory=list)
+    months: List[WrappedMonth] = Field(default_factory=list)
+    landmarks: List[WrappedCount] = Field(default_factory=list)
+    recent_scans: List[WrappedRecentScan] = Field(default_factory=list)
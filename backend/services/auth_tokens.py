@@ -0,0 +1,157 @@
+# services/auth_tokens.py
+# Local verification of Supabase-issued access tokens. Signing keys come from
+# the project's JWKS endpoint (asymmetric keys) or SUPABASE_JWT_SECRET (legacy
+# HS256), are cached in process and refreshed in the background. Verified
+# claims sit in a small LRU keyed by token hash until the token expires, so a
+# repeat request costs one dict lookup and no network round trip.
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import jwt
+
+from backend.services import singleflight
+from backend.services.http_clients import get_client
+
+SUPABASE_URL = (os.getenv("SUPABASE_URL") or "").rstrip("/")
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+# clock skew tolerated on exp / iat
+JWT_LEEWAY_S = 30
+
+JWKS_REFRESH_S = int(os.getenv("JWKS_REFRESH_S", str(10 * 60)))
+# a token with an unknown kid triggers a refresh at most this often
+JWKS_MIN_REFRESH_INTERVAL_S = 30
+CLAIMS_CACHE_SIZE = int(os.getenv("AUTH_CLAIMS_CACHE_SIZE", "4096"))
+
+
+class AuthError(Exception):
+    """Token is missing, malformed, expired or not signed by our project."""
+
+
+_keys: dict[Optional[str], jwt.PyJWK] = {}
+_keys_fetched_at = 0.0
+_refresh_task: Optional[asyncio.Task] = None
+# sha256(token) -> (expires_at, claims)
+_claims: "OrderedDict[str, tuple[float, dict[str, Any]]]" = OrderedDict()
+_stats = {"cache_hits": 0, "verified": 0, "rejected": 0, "jwks_refreshes": 0, "jwks_errors": 0}
+
+
+def _issuer() -> Optional[str]:
+    return f"{SUPABASE_URL}/auth/v1" if SUPABASE_URL else None
+
+
+async def refresh_keys() -> None:
+    """Fetch the project's JWKS and swap it in."""
+    global _keys, _keys_fetched_at
+    _keys_fetched_at = time.time()
+    try:
+        resp = await get_client("supabase_auth").get(f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json")
+        resp.raise_for_status()
+        keys = {}
+        for jwk in resp.json().get("keys", []):
+            try:
+                keys[jwk.get("kid")] = jwt.PyJWK.from_dict(jwk)
+            except jwt.PyJWTError as e:
+                print(f"Warning: skipping unusable JWKS key {jwk.get('kid')}: {e}")
+        _keys = keys
+        _stats["jwks_refreshes"] += 1
+    except Exception as e:
+        _stats["jwks_errors"] += 1
+        print(f"Warning: JWKS refresh failed, keeping {len(_keys)} cached keys: {e}")
+
+
+async def _refresh_loop() -> None:
+    while True:
+        await asyncio.sleep(JWKS_REFRESH_S)
+        await refresh_keys()
+
+
+async def startup() -> None:
+    global _refresh_task
+    if not SUPABASE_URL:
+        return
+    await refresh_keys()
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(_refresh_loop())
+
+
+async def shutdown() -> None:
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
+
+
+def _signing_key(header: dict[str, Any]) -> Optional[tuple[Any, list[str]]]:
+    alg = header.get("alg")
+    if alg == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            raise AuthError("HS256 tokens need SUPABASE_JWT_SECRET")
+        return SUPABASE_JWT_SECRET, ["HS256"]
+    jwk = _keys.get(header.get("kid"))
+    if jwk is None:
+        return None
+    return jwk.key, [jwk.algorithm_name]
+
+
+async def verify(token: str) -> dict[str, Any]:
+    """Claims of a valid access token; raises AuthError otherwise."""
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    now = time.time()
+    cached = _claims.get(digest)
+    if cached is not None:
+        if cached[0] > now:
+            _claims.move_to_end(digest)
+            _stats["cache_hits"] += 1
+            return cached[1]
+        _claims.pop(digest, None)
+
+    try:
+        header = jwt.get_unverified_header(token)
+        signing = _signing_key(header)
+        if signing is None and SUPABASE_URL and now - _keys_fetched_at >= JWKS_MIN_REFRESH_INTERVAL_S:
+            # keys may have rotated since the last refresh
+            await singleflight.do("jwks:refresh", refresh_keys)
+            signing = _signing_key(header)
+        if signing is None:
+            raise AuthError("Token signed with an unknown key")
+
+        key, algorithms = signing
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=algorithms,
+            audience=JWT_AUDIENCE,
+            issuer=_issuer(),
+            leeway=JWT_LEEWAY_S,
+            options={"require": ["exp", "sub"]},
+        )
+    except jwt.PyJWTError as e:
+        _stats["rejected"] += 1
+        raise AuthError(str(e))
+    except AuthError:
+        _stats["rejected"] += 1
+        raise
+
+    _stats["verified"] += 1
+    _claims[digest] = (float(claims["exp"]), claims)
+    while len(_claims) > CLAIMS_CACHE_SIZE:
+        _claims.popitem(last=False)
+    return claims
+
+
+def stats() -> dict[str, Any]:
+    return {
+        **_stats,
+        "cached_claims": len(_claims),
+        "jwks_keys": len(_keys),
+        "jwks_age_s": round(time.time() - _keys_fetched_at, 1) if _keys_fetched_at else None,
+    }
@@ -0,0 +1,222 @@
+# services/batch_identify.py
+# Bulk identify for photos taken offline and synced later. Photos are
+# identified through identify_landmark (same caches, singleflight and
+# enrichment) with at most BATCH_IDENTIFY_CONCURRENCY in flight, identical
+# images in a batch are identified once, and each result is emitted as soon
+# as it's ready. The scans are then saved with one bulk insert; only the image
+# uploads go through the background scan job pipeline.
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Optional
+
+from backend.db import queries
+from backend.schemas.identify import AgeBracket, BatchIdentifyItem, IdentifyResponse
+from backend.services import scan_jobs
+from backend.services.geocode_service import reverse_geocode
+from backend.services.identify_service import identify_landmark
+from backend.services.image_pipeline import normalize_image
+from backend.services.wrapped_service import invalidate_wrapped
+
+BATCH_IDENTIFY_MAX_ITEMS = int(os.getenv("BATCH_IDENTIFY_MAX_ITEMS", "20"))
+# photos of one batch identified at the same time
+BATCH_IDENTIFY_CONCURRENCY = int(os.getenv("BATCH_IDENTIFY_CONCURRENCY", "4"))
+
+_tasks: set = set()
+_stats = {
+    "batches": 0,
+    "items": 0,
+    "duplicates": 0,
+    "errors": 0,
+    "saved": 0,
+    "bulk_insert_fallbacks": 0,
+}
+
+
+async def identify_batch(
+    images: list[tuple[BinaryIO, str]],
+    items: list[BatchIdentifyItem],
+    user_id: Optional[str],
+    age_bracket: Optional[AgeBracket],
+    interests: list[str],
+) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+    """
+    Yield ("result", ...) per photo as it completes, then one ("done", ...)
+    with the batch totals. images are (upload file, SHA-256) pairs; the files
+    are closed when the batch is done. The work runs in its own task, so the
+    scans are still saved if the client disconnects mid-stream.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(_run(images, items, user_id, age_bracket, interests, queue.put_nowait))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    while True:
+        event, data = await queue.get()
+        yield event, data
+        if event == "done":
+            return
+
+
+async def _run(images, items, user_id, age_bracket, interests, emit) -> None:
+    started = time.perf_counter()
+    _stats["batches"] += 1
+    _stats["items"] += len(images)
+    counts = {"identified": 0, "duplicates": 0, "errors": 0, "saved": 0}
+    try:
+        # identical photos (same bytes) in the batch are identified once
+        digests = [digest for _, digest in images]
+        copies: dict[str, list[int]] = {}
+        for i, digest in enumerate(digests):
+            copies.setdefault(digest, []).append(i)
+        semaphore = asyncio.Semaphore(BATCH_IDENTIFY_CONCURRENCY)
+
+        async def identify_one(i: int) -> tuple[int, IdentifyResponse, bytes, str]:
+            async with semaphore:
+                image_bytes, mime_type, _ = await normalize_image(images[i][0])
+                res = await identify_landmark(
+                    image_bytes=image_bytes,
+                    mime_type=mime_type,
+                    user_id=user_id,
+                    age_bracket=age_bracket,
+                    interests=interests,
+                    lat=items[i].lat,
+                    lng=items[i].lng,
+                    scan_id=items[i].scan_id,
+                    timestamp=_timestamp(items[i]),
+                    enqueue_scan=False,
+                    digest=digests[i],
+                )
+            return i, res, image_bytes, mime_type
+
+        pending = [asyncio.create_task(_indexed(group[0], identify_one(group[0]))) for group in copies.values()]
+        to_save = []
+        for next_done in asyncio.as_completed(pending):
+            i, outcome = await next_done
+            duplicates = copies[digests[i]][1:]
+            if isinstance(outcome, Exception):
+                counts["errors"] += 1 + len(duplicates)
+                for j in [i, *duplicates]:
+                    emit(("result", {"index": j, "error": str(outcome)}))
+                continue
+
+            _, res, image_bytes, mime_type = outcome
+            counts["identified"] += 1
+            counts["duplicates"] += len(duplicates)
+            result = res.model_dump(mode="json")
+            emit(("result", {"index": i, "result": result}))
+            for j in duplicates:
+                emit(("result", {"index": j, "duplicate_of": i, "result": result}))
+            if res.scan_id:
+                to_save.append(_scan_row(res, items[i], user_id, image_bytes, mime_type))
+
+        counts["saved"] = await _save(to_save)
+    except Exception as e:
+        print(f"ERROR batch identify failed: {e}")
+        emit(("error", {"detail": str(e)}))
+    finally:
+        for file, _ in images:
+            file.close()
+        _stats["duplicates"] += counts["duplicates"]
+        _stats["errors"] += counts["errors"]
+        _stats["saved"] += counts["saved"]
+        emit(("done", {
+            "items": len(images),
+            **counts,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        }))
+
+
+async def _indexed(i: int, call: Awaitable[Any]) -> tuple[int, Any]:
+    try:
+        return i, await call
+    except Exception as e:
+        return i, e
+
+
+def _timestamp(item: BatchIdentifyItem) -> datetime:
+    if item.timestamp is None:
+        return datetime.now(timezone.utc)
+    if item.timestamp.tzinfo is None:
+        return item.timestamp.replace(tzinfo=timezone.utc)
+    return item.timestamp
+
+
+def _scan_row(res: IdentifyResponse, item: BatchIdentifyItem, user_id: str, image_bytes: bytes, mime_type: str) -> dict[str, Any]:
+    # same location rule as identify_landmark: landmark location first, then the phone's
+    return {
+        "scan_id": res.scan_id,
+        "user_id": user_id,
+        "landmark_name": res.landmark_name,
+        "description": res.description,
+        "lat": res.landmark_lat if res.landmark_lat is not None else item.lat,
+        "lng": res.landmark_lng if res.landmark_lng is not None else item.lng,
+        "tags": res.tags,
+        "timestamp": _timestamp(item),
+        "image_bytes": image_bytes,
+        "mime_type": mime_type,
+    }
+
+
+async def _city(lat: float, lng: float) -> Optional[str]:
+    try:
+        return await reverse_geocode(lat, lng)
+    except Exception as e:
+        # a scan without a city is still worth saving
+        print(f"Warning: reverse geocode failed for batch scan at {lat},{lng}: {e}")
+        return None
+
+
+async def _save(rows: list[dict[str, Any]]) -> int:
+    """Bulk insert the batch's scans, then queue the image uploads. Returns scans saved."""
+    if not rows:
+        return 0
+    # photos from one outing share a handful of spots; look each one up once
+    spots = list({(round(r["lat"], 3), round(r["lng"], 3)) for r in rows})
+    cities = dict(zip(spots, await asyncio.gather(*(_city(lat, lng) for lat, lng in spots))))
+    for row in rows:
+        row["city"] = cities[(round(row["lat"], 3), round(row["lng"], 3))]
+
+    try:
+        saved_ids = {r.get("id") for r in await queries.save_scans(rows)}
+        # a scan id that belongs to another user was refused; don't upload its image
+        rows = [r for r in rows if r["scan_id"] in saved_ids]
+        inserted = True
+    except Exception as e:
+        # the scan job pipeline inserts them one by one, with retries
+        _stats["bulk_insert_fallbacks"] += 1
+        print(f"ERROR bulk scan insert failed, queueing {len(rows)} single inserts: {e}")
+        inserted = False
+
+    for row in rows:
+        await asyncio.to_thread(
+            scan_jobs.enqueue_scan,
+            scan_id=row["scan_id"],
+            user_id=row["user_id"],
+            landmark_name=row["landmark_name"],
+            description=row["description"],
+            lat=row["lat"],
+            lng=row["lng"],
+            tags=row["tags"],
+            timestamp=row["timestamp"],
+            image_bytes=row["image_bytes"],
+            mime_type=row["mime_type"],
+            city=row["city"],
+            inserted=inserted,
+        )
+    if inserted:
+        for user_id, year in {(r["user_id"], r["timestamp"].year) for r in rows}:
+            await invalidate_wrapped(user_id, datetime(year, 1, 1, tzinfo=timezone.utc))
+        return len(rows)
+    return 0
+
+
+async def shutdown() -> None:
+    tasks = list(_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def stats() -> dict[str, Any]:
+    return {**_stats, "in_flight": len(_tasks), "concurrency": BATCH_IDENTIFY_CONCURRENCY}
@@ -1,32 +1,189 @@
 # services/cache.py
+# In-process cache with per-namespace LRU eviction and byte budgets.
+# The namespace is the key prefix before the first ":" (identify:, places:, landmark:,
+# chat:, ...; see NAMESPACE_BUDGETS).
+import asyncio
+import builtins
+import os
+import sys
+import threading
 import time
+from collections import OrderedDict
 from typing import Any, Optional
 
-_CACHE: dict[str, tuple[float, Any]] = {}
+from pydantic import BaseModel
+
+# approximate byte budget per namespace; anything not listed uses "default"
+NAMESPACE_BUDGETS: dict[str, int] = {
+    "identify": int(os.getenv("CACHE_IDENTIFY_BYTES", str(32 * 1024 * 1024))),
+    "places": int(os.getenv("CACHE_PLACES_BYTES", str(16 * 1024 * 1024))),
+    "events": int(os.getenv("CACHE_EVENTS_BYTES", str(8 * 1024 * 1024))),
+    "wrapped": int(os.getenv("CACHE_WRAPPED_BYTES", str(8 * 1024 * 1024))),
+    # shared landmark records and their per-profile personalizations (7 d / 1 d TTL)
+    "landmark": int(os.getenv("CACHE_LANDMARK_BYTES", str(16 * 1024 * 1024))),
+    "persona": int(os.getenv("CACHE_PERSONA_BYTES", str(16 * 1024 * 1024))),
+    "profile": int(os.getenv("CACHE_PROFILE_BYTES", str(4 * 1024 * 1024))),
+    # chat sessions: without Redis this is their only copy, so they don't compete with "default"
+    "chat": int(os.getenv("CACHE_CHAT_BYTES", str(32 * 1024 * 1024))),
+    # Gemini context-cache pointers (tiny) and speculative prefetch answers, which
+    # must not push out anything a real request put there
+    "chatctx": int(os.getenv("CACHE_CHATCTX_BYTES", str(1 * 1024 * 1024))),
+    "chatpre": int(os.getenv("CACHE_CHATPRE_BYTES", str(8 * 1024 * 1024))),
+    "default": int(os.getenv("CACHE_DEFAULT_BYTES", str(8 * 1024 * 1024))),
+}
+
+SWEEP_INTERVAL_S = float(os.getenv("CACHE_SWEEP_INTERVAL_S", "60"))
+
+
+def _approx_size(value: Any) -> int:
+    # rough in-memory size; good enough to keep namespaces inside their budget
+    if isinstance(value, BaseModel):
+        return sys.getsizeof(value) + len(value.model_dump_json())
+    # module-level set() below shadows the builtin
+    if isinstance(value, (list, tuple, builtins.set, frozenset)):
+        return sys.getsizeof(value) + sum(_approx_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class _Namespace:
+    def __init__(self, budget_bytes: int) -> None:
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        # key -> (expires_at, size, value), least recently used first
+        self.entries: "OrderedDict[str, tuple[float, int, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def remove(self, key: str) -> None:
+        item = self.entries.pop(key, None)
+        if item:
+            self.used_bytes -= item[1]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "used_bytes": self.used_bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+_NAMESPACES: dict[str, _Namespace] = {}
+_LOCK = threading.Lock()
+_sweeper: Optional[asyncio.Task] = None
+
+
+def _namespace_name(key: str) -> str:
+    prefix = key.split(":", 1)[0]
+    return prefix if prefix in NAMESPACE_BUDGETS else "default"
+
+
+def _namespace(key: str) -> _Namespace:
+    name = _namespace_name(key)
+    ns = _NAMESPACES.get(name)
+    if ns is None:
+        ns = _Namespace(NAMESPACE_BUDGETS[name])
+        _NAMESPACES[name] = ns
+    return ns
+
 
 def get(key: str) -> Optional[Any]:
-    item = _CACHE.get(key)
-    if not item:
-        return None
+    with _LOCK:
+        ns = _namespace(key)
+        item = ns.entries.get(key)
+        if not item:
+            ns.misses += 1
+            return None
 
-    expires_at, value = item
+        expires_at, _, value = item
 
-    # expired
-    if time.time() > expires_at:
-        _CACHE.pop(key, None)
-        return None
+        # expired
+        if time.time() > expires_at:
+            ns.remove(key)
+            ns.expirations += 1
+            ns.misses += 1
+            return None
 
-    return value
+        ns.entries.move_to_end(key)
+        ns.hits += 1
+        return value
 
 # default 1 hour TTL
 def set(key: str, value: Any, ttl_seconds: int = 3600) -> None:
+    size = _approx_size(key) + _approx_size(value)
     expires_at = time.time() + ttl_seconds
-    _CACHE[key] = (expires_at, value)
+    with _LOCK:
+        ns = _namespace(key)
+        ns.remove(key)
+        if size > ns.budget_bytes:
+            # a single value bigger than the whole namespace is never cached
+            return
+
+        ns.entries[key] = (expires_at, size, value)
+        ns.used_bytes += size
+
+        # evict least recently used until back under budget
+        while ns.used_bytes > ns.budget_bytes:
+            old_key = next(iter(ns.entries))
+            ns.remove(old_key)
+            ns.evictions += 1
 
 
 def delete(key: str) -> None:
-    _CACHE.pop(key, None)
+    with _LOCK:
+        _namespace(key).remove(key)
 
 
 def clear() -> None:
-    _CACHE.clear()
+    with _LOCK:
+        _NAMESPACES.clear()
+
+
+def sweep_expired() -> int:
+    """Drop every expired entry in all namespaces. Returns the number removed."""
+    now = time.time()
+    removed = 0
+    with _LOCK:
+        for ns in _NAMESPACES.values():
+            expired = [k for k, (expires_at, _, _) in ns.entries.items() if now > expires_at]
+            for k in expired:
+                ns.remove(k)
+            ns.expirations += len(expired)
+            removed += len(expired)
+    return removed
+
+
+async def _sweep_loop(interval_s: float) -> None:
+    while True:
+        await asyncio.sleep(interval_s)
+        sweep_expired()
+
+
+def start_sweeper(interval_s: float = SWEEP_INTERVAL_S) -> None:
+    global _sweeper
+    if _sweeper is None or _sweeper.done():
+        _sweeper = asyncio.create_task(_sweep_loop(interval_s))
+
+
+async def stop_sweeper() -> None:
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.cancel()
+        try:
+            await _sweeper
+        except asyncio.CancelledError:
+            pass
+        _sweeper = None
+
+
+def stats() -> dict[str, Any]:
+    """Per-namespace hit/miss/eviction counters and memory use."""
+    with _LOCK:
+        return {name: ns.stats() for name, ns in _NAMESPACES.items()}
@@ -0,0 +1,133 @@
+# services/chat_prefetch.py
+# Speculative answers to suggested questions (opt-in via CHAT_PREFETCH=1).
+# After identify or a chat turn returns its suggested questions, each one is
+# answered in the background and cached, so tapping a suggestion is served
+# without a Gemini round trip. Prefetch only starts while the shared Gemini
+# semaphore has more free slots than CHAT_PREFETCH_HEADROOM, so it never queues
+# ahead of user requests and always leaves room for a burst of them.
+import asyncio
+import hashlib
+import os
+import re
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from backend.schemas.chat import ChatSession
+from backend.services import singleflight
+from backend.services.gemini import has_capacity
+from backend.services.tiered_cache import get as cache_get, set as cache_set
+
+CHAT_PREFETCH_ENABLED = os.getenv("CHAT_PREFETCH", "0") == "1"
+CHAT_PREFETCH_TTL_S = int(os.getenv("CHAT_PREFETCH_TTL_S", str(60 * 60)))
+# background answers in flight per worker, on top of the Gemini semaphore
+CHAT_PREFETCH_CONCURRENCY = int(os.getenv("CHAT_PREFETCH_CONCURRENCY", "2"))
+# Gemini slots a prefetch leaves free for user requests
+CHAT_PREFETCH_HEADROOM = int(os.getenv("CHAT_PREFETCH_HEADROOM", "2"))
+
+# answer(session, question) -> (raw answer text, Gemini tokens spent)
+AnswerFn = Callable[[ChatSession, str], Awaitable[Tuple[str, int]]]
+
+_semaphore: Optional[asyncio.Semaphore] = None
+_tasks: set = set()
+_stats = {
+    "scheduled": 0,
+    "generated": 0,
+    "skipped_busy": 0,
+    "errors": 0,
+    "used": 0,
+    "tokens_spent": 0,
+    "tokens_used": 0,
+}
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(CHAT_PREFETCH_CONCURRENCY)
+    return _semaphore
+
+
+def _normalize_question(question: str) -> str:
+    return re.sub(r"\s+", " ", question.strip().lower())
+
+
+def prefetch_key(session: ChatSession, question: str) -> str:
+    """
+    First turns depend only on the landmark, so they share one key across
+    users; later turns depend on the session's history and are keyed by
+    session and turn number.
+    """
+    q = hashlib.sha256(_normalize_question(question).encode()).hexdigest()[:32]
+    if not session.turns and not session.summary:
+        landmark = hashlib.sha256(f"{session.landmark_name}\n{session.landmark_info}".encode()).hexdigest()[:32]
+        return f"chatpre:l:{landmark}:{q}"
+    turn_no = session.compacted_turns + len(session.turns)
+    return f"chatpre:s:{session.session_id}:{turn_no}:{q}"
+
+
+async def take(session: ChatSession, question: str) -> Optional[str]:
+    """Prefetched raw answer for this question in this session state, if any."""
+    if not CHAT_PREFETCH_ENABLED:
+        return None
+    entry = await cache_get(prefetch_key(session, question))
+    if not entry:
+        return None
+    _stats["used"] += 1
+    _stats["tokens_used"] += entry.get("tokens", 0)
+    return entry["answer"]
+
+
+def schedule(session: ChatSession, questions: List[str], answer: AnswerFn) -> None:
+    """Answer each suggested question in the background for this session state."""
+    if not CHAT_PREFETCH_ENABLED:
+        return
+    snapshot = session.model_copy(deep=True)
+    for question in questions:
+        task = asyncio.create_task(_prefetch(snapshot, question, answer))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+        _stats["scheduled"] += 1
+
+
+async def _prefetch(session: ChatSession, question: str, answer: AnswerFn) -> None:
+    key = prefetch_key(session, question)
+
+    async def run() -> None:
+        if await cache_get(key) is not None:
+            return
+        async with _get_semaphore():
+            # low priority: give way unless user requests would still find free slots
+            if not has_capacity(free_slots=CHAT_PREFETCH_HEADROOM + 1):
+                _stats["skipped_busy"] += 1
+                return
+            text, tokens = await answer(session, question)
+        _stats["generated"] += 1
+        _stats["tokens_spent"] += tokens
+        if text:
+            await cache_set(key, {"answer": text, "tokens": tokens}, ttl_seconds=CHAT_PREFETCH_TTL_S)
+
+    try:
+        # concurrent identifies of the same landmark prefetch each question once
+        await singleflight.do(key, run)
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"Warning: chat prefetch failed for {key}: {e}")
+
+
+async def shutdown() -> None:
+    tasks = list(_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def stats() -> dict[str, Any]:
+    generated = _stats["generated"]
+    used = _stats["used"]
+    return {
+        "enabled": CHAT_PREFETCH_ENABLED,
+        "headroom": CHAT_PREFETCH_HEADROOM,
+        **_stats,
+        "in_flight": len(_tasks),
+        "use_rate": round(used / generated, 3) if generated else None,
+        "tokens_per_use": round(_stats["tokens_spent"] / used, 1) if used else None,
+    }
@@ -1,31 +1,26 @@
-from google import genai
-from typing import List, Dict, Tuple
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
+import hashlib
 import os
-import json
+import time
+from google.genai import types
+from backend.schemas.chat import ChatSession
+from backend.services import chat_prefetch, chat_sessions, singleflight
+from backend.services.gemini import create_cached_content, generate_content_stream
+from backend.services.tiered_cache import get as cache_get, set as cache_set, delete as cache_delete
 
-def chat_about_landmark(
-    landmark_name: str,
-    landmark_info: str,
-    conversation_history: List[Dict[str, str]],
-    user_message: str
-) -> Tuple[str, List[str]]:
-    """
-    Chat with Gemini about a specific landmark.
-    
-    Args:
-        landmark_name: Name of the landmark
-        landmark_info: Description and context about the landmark
-        conversation_history: Previous messages in the conversation
-        user_message: Current user question
-        
-    Returns:
-        Tuple of (AI response as a string, List of suggested follow-up questions)
-    """
-    
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-    
-    # Build context prompt
-    system_context = f"""You are a knowledgeable tour guide assistant helping users learn about landmarks.
+CHAT_MODEL = "gemini-3-flash-preview"
+SUGGESTIONS_MARKER = "SUGGESTED_QUESTIONS:"
+
+# Gemini refuses context caches below a minimum size; smaller preambles go inline
+CHAT_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CHAT_CONTEXT_CACHE_MIN_TOKENS", "1024"))
+CHAT_CONTEXT_CACHE_TTL_S = 60 * 60
+# after a failed cache create, don't retry for this preamble until this expires
+CHAT_CONTEXT_CACHE_RETRY_S = 60 * 10
+
+
+def _system_preamble(landmark_name: str, landmark_info: str) -> str:
+    # fixed per landmark, so it can be cached and shared by every session about it
+    return f"""You are a knowledgeable tour guide assistant helping users learn about landmarks.
 
 Current Landmark: {landmark_name}
 Landmark Information: {landmark_info}
@@ -43,54 +38,272 @@ Guidelines:
 - After your bullet points, suggest 3 relevant follow-up questions users might be interested in
 - Format suggested questions as: "SUGGESTED_QUESTIONS: [question1] | [question2] | [question3]"
 """
-    
-    # Build full conversation prompt
-    conversation = [system_context]
-    
-    # Add conversation history
-    for msg in conversation_history:
-        role = msg.get("role", "user")
-        content = msg.get("content", "")
-        if role == "user":
-            conversation.append(f"User: {content}")
-        else:
-            conversation.append(f"Assistant: {content}")
-    
-    # Add current question
-    conversation.append(f"User: {user_message}")
-    conversation.append("Assistant:")
-    
-    # Generate response
-    full_prompt = "\n\n".join(conversation)
-    
+
+
+def _context_cache_key(preamble: str) -> str:
+    digest = hashlib.sha256(f"{CHAT_MODEL}\n{preamble}".encode()).hexdigest()
+    return f"chatctx:{digest}"
+
+
+async def _context_cache_name(preamble: str) -> Optional[str]:
+    """Name of a Gemini context cache holding the preamble, or None to send it inline."""
+    if chat_sessions.estimate_tokens(preamble) < CHAT_CONTEXT_CACHE_MIN_TOKENS:
+        return None
+
+    key = _context_cache_key(preamble)
+    name = await cache_get(key)
+    if name is not None:
+        return name or None  # "" = creation failed recently
+
+    async def create() -> str:
+        try:
+            cached = await create_cached_content(
+                model=CHAT_MODEL,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=preamble,
+                    ttl=f"{CHAT_CONTEXT_CACHE_TTL_S}s",
+                ),
+            )
+            # expire our pointer a little before Gemini drops the cache
+            await cache_set(key, cached.name, ttl_seconds=CHAT_CONTEXT_CACHE_TTL_S - 60)
+            return cached.name
+        except Exception as e:
+            print(f"Warning: chat context cache create failed: {e}")
+            await cache_set(key, "", ttl_seconds=CHAT_CONTEXT_CACHE_RETRY_S)
+            return ""
+
+    return (await singleflight.do(key, create)) or None
+
+
+def _turn_contents(session: ChatSession, user_message: str) -> List[types.Content]:
+    contents: List[types.Content] = []
+    if session.summary:
+        contents.append(types.Content(
+            role="user",
+            parts=[types.Part.from_text(text=f"Summary of our conversation so far:\n{session.summary}")],
+        ))
+        contents.append(types.Content(role="model", parts=[types.Part.from_text(text="Got it.")]))
+    for turn in session.turns:
+        role = "user" if turn.role == "user" else "model"
+        contents.append(types.Content(role=role, parts=[types.Part.from_text(text=turn.content)]))
+    contents.append(types.Content(role="user", parts=[types.Part.from_text(text=user_message)]))
+    return contents
+
+
+async def _generate_stream(session: ChatSession, user_message: str) -> AsyncIterator[types.GenerateContentResponse]:
+    preamble = _system_preamble(session.landmark_name, session.landmark_info)
+    contents = _turn_contents(session, user_message)
+
+    cache_name = await _context_cache_name(preamble)
+    if cache_name:
+        started = False
+        try:
+            async for chunk in generate_content_stream(
+                model=CHAT_MODEL,
+                contents=contents,
+                config=types.GenerateContentConfig(cached_content=cache_name),
+            ):
+                started = True
+                yield chunk
+            return
+        except Exception as e:
+            if started:
+                raise
+            # the cache may have expired early or been deleted; fall back to inline
+            print(f"Warning: chat context cache {cache_name} unusable, sending preamble inline: {e}")
+            await cache_delete(_context_cache_key(preamble))
+
+    async for chunk in generate_content_stream(
+        model=CHAT_MODEL,
+        contents=contents,
+        config=types.GenerateContentConfig(system_instruction=preamble),
+    ):
+        yield chunk
+
+
+def _default_questions(landmark_name: str) -> List[str]:
+    return [
+        f"What is the historical significance of {landmark_name}?",
+        f"Tell me an interesting fact about {landmark_name}",
+        f"When was {landmark_name} built?"
+    ]
+
+
+def _parse_questions(questions_text: str) -> List[str]:
+    # Parse questions separated by |
+    return [q.strip() for q in questions_text.split("|") if q.strip()]
+
+
+class _SuggestionSplitter:
+    """
+    Splits streamed text into the visible answer and the SUGGESTED_QUESTIONS trailer.
+
+    Text that could still turn out to be the start of the marker is held back,
+    so the trailer is never forwarded to the client as answer tokens.
+    """
+
+    def __init__(self) -> None:
+        self._pending = ""
+        self._trailer: str | None = None
+
+    def feed(self, chunk: str) -> str:
+        if self._trailer is not None:
+            self._trailer += chunk
+            return ""
+
+        self._pending += chunk
+        idx = self._pending.find(SUGGESTIONS_MARKER)
+        if idx >= 0:
+            visible = self._pending[:idx]
+            self._trailer = self._pending[idx + len(SUGGESTIONS_MARKER):]
+            self._pending = ""
+            return visible
+
+        # keep the longest suffix that is a prefix of the marker
+        keep = 0
+        for n in range(min(len(SUGGESTIONS_MARKER) - 1, len(self._pending)), 0, -1):
+            if SUGGESTIONS_MARKER.startswith(self._pending[-n:]):
+                keep = n
+                break
+        visible = self._pending[:len(self._pending) - keep]
+        self._pending = self._pending[len(self._pending) - keep:]
+        return visible
+
+    def finish(self) -> Tuple[str, str | None]:
+        """Return (remaining visible text, trailer text or None if no marker was seen)."""
+        visible, self._pending = self._pending, ""
+        return visible, self._trailer
+
+
+async def _replay(raw_answer: str) -> AsyncIterator[types.GenerateContentResponse]:
+    # a prefetched answer, shaped like a one-chunk Gemini stream
+    yield types.GenerateContentResponse(candidates=[
+        types.Candidate(content=types.Content(role="model", parts=[types.Part.from_text(text=raw_answer)]))
+    ])
+
+
+async def _answer_for_prefetch(session: ChatSession, question: str) -> Tuple[str, int]:
+    parts: List[str] = []
+    tokens = 0
+    async for chunk in _generate_stream(session, question):
+        if chunk.usage_metadata is not None:
+            tokens = chunk.usage_metadata.total_token_count or 0
+        if chunk.text:
+            parts.append(chunk.text)
+    return "".join(parts).strip(), tokens
+
+
+async def prefetch_suggested_questions(landmark_name: str, landmark_info: str, questions: List[str]) -> None:
+    """Answer identify's suggested questions ahead of time for the first chat turn."""
+    now = time.time()
+    session = ChatSession(
+        session_id="",
+        landmark_name=landmark_name,
+        landmark_info=landmark_info,
+        created_at=now,
+        updated_at=now,
+    )
+    chat_prefetch.schedule(session, questions, _answer_for_prefetch)
+
+
+async def chat_in_session(session: ChatSession, user_message: str) -> Tuple[str, List[str]]:
+    """
+    Answer one message in a chat session and record the turn.
+
+    Returns:
+        Tuple of (AI response as a string, List of suggested follow-up questions)
+    """
+    text_parts: List[str] = []
+    questions: List[str] = []
+    error: str | None = None
+    async for event, data in stream_chat_in_session(session, user_message):
+        if event == "token":
+            text_parts.append(data["text"])
+        elif event == "suggested_questions":
+            questions = data["questions"]
+        elif event == "error":
+            error = data["message"]
+    if error is not None:
+        return error, []
+    return "".join(text_parts).strip(), questions
+
+
+async def stream_chat_in_session(
+    session: ChatSession,
+    user_message: str
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Streaming answer for one message in a chat session; the turn is recorded
+    once the answer is complete.
+
+    Yields (event, data) pairs:
+        ("token", {"text": ...})                 answer text as Gemini emits it
+        ("suggested_questions", {"questions": [...]})  parsed trailer, once at the end
+        ("error", {"message": ...})              if the stream fails part way
+        ("done", {"ttft_ms": ..., "total_ms": ..., "prompt_tokens": ..., "cached_tokens": ..., "prefetched": ...})
+                                                 timing and prompt size, always last
+    """
+    landmark_name = session.landmark_name
+    splitter = _SuggestionSplitter()
+    started = time.perf_counter()
+    ttft_ms: float | None = None
+    got_text = False
+    raw_parts: List[str] = []
+    usage = None
+    prefetched = False
+
     try:
-        response = client.models.generate_content(
-            model="gemini-3-flash-preview",
-            contents=full_prompt
-        )
-        if response.text:
-            text = response.text.strip()
-            
-            # Extract suggested questions if present
-            suggested_questions = []
-            if "SUGGESTED_QUESTIONS:" in text:
-                parts = text.split("SUGGESTED_QUESTIONS:")
-                main_response = parts[0].strip()
-                questions_text = parts[1].strip()
-                # Parse questions separated by |
-                suggested_questions = [q.strip() for q in questions_text.split("|") if q.strip()]
-            else:
-                main_response = text
-                # Generate default suggestions if AI didn't provide them
-                suggested_questions = [
-                    f"What is the historical significance of {landmark_name}?",
-                    f"Tell me an interesting fact about {landmark_name}",
-                    f"When was {landmark_name} built?"
-                ]
-            
-            return main_response, suggested_questions[:3]  # Limit to 3 questions
+        raw_answer = await chat_prefetch.take(session, user_message)
+        if raw_answer is not None:
+            prefetched = True
+            source = _replay(raw_answer)
         else:
-            return f"I received an empty response. Please try asking your question about {landmark_name} again.", []
+            source = _generate_stream(session, user_message)
+
+        async for chunk in source:
+            if chunk.usage_metadata is not None:
+                usage = chunk.usage_metadata
+            if not chunk.text:
+                continue
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - started) * 1000
+            raw_parts.append(chunk.text)
+            visible = splitter.feed(chunk.text)
+            if visible:
+                got_text = True
+                yield "token", {"text": visible}
+
+        rest, trailer = splitter.finish()
+        if rest:
+            got_text = True
+            yield "token", {"text": rest}
+
+        if trailer is not None:
+            questions = _parse_questions(trailer.strip())
+        elif got_text:
+            questions = _default_questions(landmark_name)
+        else:
+            questions = []
+            yield "token", {"text": f"I received an empty response. Please try asking your question about {landmark_name} again."}
+        yield "suggested_questions", {"questions": questions[:3]}
+
+        if got_text:
+            # keep the trailer in history so later answers follow the same format
+            saved = await chat_sessions.record_turn(session, user_message, "".join(raw_parts).strip())
+            chat_prefetch.schedule(saved, questions[:3], _answer_for_prefetch)
     except Exception as e:
-        print(f"Error in chat_service: {e}")
-        return f"I'm having trouble answering that question about {landmark_name}. Could you rephrase or ask something else?", []
+        print(f"Error in chat_service stream: {e}")
+        yield "error", {"message": f"I'm having trouble answering that question about {landmark_name}. Could you rephrase or ask something else?"}
+
+    total_ms = (time.perf_counter() - started) * 1000
+    prompt_tokens = usage.prompt_token_count if usage is not None else None
+    cached_tokens = usage.cached_content_token_count if usage is not None else None
+    if not prefetched:
+        chat_sessions.record_usage(prompt_tokens, cached_tokens, total_ms)
+    yield "done", {
+        "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+        "total_ms": round(total_ms, 1),
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "prefetched": prefetched,
+    }
@@ -0,0 +1,215 @@
+# services/chat_sessions.py
+# Server-side chat sessions. A session holds the landmark context, a running
+# summary of older turns and the most recent turns verbatim, so clients only
+# send the new message. Once the recent turns go over CHAT_HISTORY_TOKEN_BUDGET
+# the oldest ones are folded into the summary in the background, which keeps
+# the prompt for each turn roughly the same size however long the chat runs.
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Optional
+
+from google.genai import types
+
+from backend.schemas.chat import ChatMessage, ChatSession
+from backend.services.gemini import generate_content
+from backend.services.tiered_cache import get as cache_get, set as cache_set
+
+CHAT_SESSION_TTL_S = int(os.getenv("CHAT_SESSION_TTL_S", str(60 * 60 * 2)))
+# recent turns kept verbatim, in estimated tokens
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+# the last question + answer always stay verbatim, even over budget
+CHAT_KEEP_TURNS = 2
+CHAT_SUMMARY_MODEL = "gemini-3-flash-preview"
+CHAT_SUMMARY_MAX_WORDS = 120
+
+_compactions: dict[str, asyncio.Task] = {}
+# session id -> (lock, writers holding or waiting for it)
+_turn_locks: dict[str, tuple[asyncio.Lock, int]] = {}
+_stats = {"created": 0, "turns": 0, "compactions": 0, "compaction_errors": 0}
+# per-turn prompt size and latency over the last 200 turns
+_recent_turns: deque = deque(maxlen=200)
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting
+    return len(text) // 4 + 1
+
+
+def _session_key(session_id: str) -> str:
+    return f"chat:session:{session_id}"
+
+
+def _history_tokens(turns: List[ChatMessage]) -> int:
+    return sum(estimate_tokens(t.content) for t in turns)
+
+
+async def create_session(
+    landmark_name: str,
+    landmark_info: str,
+    history: Optional[List[ChatMessage]] = None,
+) -> ChatSession:
+    now = time.time()
+    session = ChatSession(
+        session_id=uuid.uuid4().hex,
+        landmark_name=landmark_name,
+        landmark_info=landmark_info,
+        turns=list(history or []),
+        created_at=now,
+        updated_at=now,
+    )
+    await cache_set(_session_key(session.session_id), session, ttl_seconds=CHAT_SESSION_TTL_S)
+    _stats["created"] += 1
+    _maybe_compact(session)
+    return session
+
+
+async def get_session(session_id: str) -> Optional[ChatSession]:
+    session = await cache_get(_session_key(session_id))
+    # callers mutate the session; never hand out the cached instance
+    return session.model_copy(deep=True) if session is not None else None
+
+
+async def record_turn(session: ChatSession, user_message: str, answer: str) -> ChatSession:
+    """
+    Append one question + answer to the latest saved state of the session,
+    save it and compact it if it grew over budget. Returns the saved session.
+    """
+    async with _locked(session.session_id):
+        # another turn of this session may have been saved while this answer streamed
+        latest = await get_session(session.session_id) or session
+        latest.turns.append(ChatMessage(role="user", content=user_message))
+        latest.turns.append(ChatMessage(role="assistant", content=answer))
+        latest.updated_at = time.time()
+        await cache_set(_session_key(latest.session_id), latest, ttl_seconds=CHAT_SESSION_TTL_S)
+    _stats["turns"] += 1
+    _maybe_compact(latest)
+    return latest
+
+
+@asynccontextmanager
+async def _locked(session_id: str) -> AsyncIterator[None]:
+    """
+    Serialize read-modify-writes of one session in this worker, so two turns
+    saved at once don't both append to the same old history. Held only around
+    the load and save, never while an answer streams.
+    """
+    lock, holders = _turn_locks.get(session_id, (None, 0))
+    if lock is None:
+        lock = asyncio.Lock()
+    _turn_locks[session_id] = (lock, holders + 1)
+    try:
+        async with lock:
+            yield
+    finally:
+        lock, holders = _turn_locks[session_id]
+        if holders > 1:
+            _turn_locks[session_id] = (lock, holders - 1)
+        else:
+            del _turn_locks[session_id]
+
+
+def record_usage(prompt_tokens: Optional[int], cached_tokens: Optional[int], total_ms: float) -> None:
+    _recent_turns.append((prompt_tokens or 0, cached_tokens or 0, total_ms))
+
+
+def _compaction_cut(turns: List[ChatMessage]) -> int:
+    """Number of oldest turns to fold into the summary (0 = within budget)."""
+    if _history_tokens(turns) <= CHAT_HISTORY_TOKEN_BUDGET:
+        return 0
+    keep = 0
+    tokens = 0
+    for turn in reversed(turns):
+        tokens += estimate_tokens(turn.content)
+        if keep >= CHAT_KEEP_TURNS and tokens > CHAT_HISTORY_TOKEN_BUDGET:
+            break
+        keep += 1
+    return len(turns) - keep
+
+
+def _maybe_compact(session: ChatSession) -> None:
+    if session.session_id in _compactions or _compaction_cut(session.turns) == 0:
+        return
+    task = asyncio.create_task(_compact(session.session_id))
+    _compactions[session.session_id] = task
+    task.add_done_callback(lambda t: _compactions.pop(session.session_id, None))
+
+
+async def _summarize(session: ChatSession, turns: List[ChatMessage]) -> str:
+    lines = []
+    for turn in turns:
+        speaker = "User" if turn.role == "user" else "Guide"
+        lines.append(f"{speaker}: {turn.content}")
+
+    prompt = f"""You keep a running summary of a chat between a traveller and a tour guide about {session.landmark_name}.
+
+Current summary:
+{session.summary or "(none yet)"}
+
+New turns to fold in:
+{chr(10).join(lines)}
+
+Write the updated summary in at most {CHAT_SUMMARY_MAX_WORDS} words: what the user asked about, the key facts the guide gave, and any interests the user showed. Ignore suggested follow-up questions. Plain text only."""
+
+    response = await generate_content(
+        model=CHAT_SUMMARY_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(max_output_tokens=400),
+    )
+    if not response.text:
+        raise ValueError("Gemini returned an empty summary.")
+    return response.text.strip()
+
+
+async def _compact(session_id: str) -> None:
+    try:
+        session = await get_session(session_id)
+        if session is None:
+            return
+        cut = _compaction_cut(session.turns)
+        if cut == 0:
+            return
+        folded = session.turns[:cut]
+        summary = await _summarize(session, folded)
+
+        async with _locked(session_id):
+            # a new turn may have been saved while the summary was generated
+            latest = await get_session(session_id)
+            if latest is None or latest.turns[:cut] != folded:
+                return
+            latest.summary = summary
+            latest.turns = latest.turns[cut:]
+            latest.compacted_turns += cut
+            await cache_set(_session_key(session_id), latest, ttl_seconds=CHAT_SESSION_TTL_S)
+        _stats["compactions"] += 1
+    except Exception as e:
+        _stats["compaction_errors"] += 1
+        print(f"Warning: chat session compaction failed for {session_id}: {e}")
+
+
+async def shutdown() -> None:
+    tasks = list(_compactions.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def stats() -> dict[str, Any]:
+    recent = list(_recent_turns)
+    prompt = [p for p, _, _ in recent]
+    cached = [c for _, c, _ in recent]
+    latency = [ms for _, _, ms in recent]
+    return {
+        **_stats,
+        "compactions_running": len(_compactions),
+        "sessions_locked": len(_turn_locks),
+        "history_token_budget": CHAT_HISTORY_TOKEN_BUDGET,
+        "recent_turns": len(recent),
+        "avg_prompt_tokens": round(sum(prompt) / len(prompt), 1) if prompt else None,
+        "max_prompt_tokens": max(prompt) if prompt else None,
+        "avg_cached_tokens": round(sum(cached) / len(cached), 1) if cached else None,
+        "avg_total_ms": round(sum(latency) / len(latency), 1) if latency else None,
+    }
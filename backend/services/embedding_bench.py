@@ -0,0 +1,109 @@
+"""
+Benchmark the local image-embedding matcher against Gemini recognition.
+
+    python -m backend.services.embedding_bench <dir>            # local matcher only
+    python -m backend.services.embedding_bench <dir> --gemini   # also run gemini_recognize
+
+<dir> holds one sub-directory per landmark (named after it) with its photos.
+Each photo is matched leave-one-out against every other photo, without the
+GPS filter, so the numbers are a pessimistic bound for the production index.
+"""
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from backend.services import image_embedding
+from backend.services.identify_service import normalize_landmark_name
+from backend.services.latency import percentile
+
+_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+
+def _load(root: Path) -> list[tuple[str, bytes]]:
+    photos = []
+    for folder in sorted(p for p in root.iterdir() if p.is_dir()):
+        key = normalize_landmark_name(folder.name)
+        for path in sorted(folder.iterdir()):
+            if path.suffix.lower() in _EXTENSIONS:
+                photos.append((key, path.read_bytes()))
+    return photos
+
+
+def bench_local(photos: list[tuple[str, bytes]]) -> None:
+    vectors = []
+    embed_ms = []
+    for key, data in photos:
+        started = time.perf_counter()
+        vec = image_embedding.embed(data)
+        embed_ms.append((time.perf_counter() - started) * 1000)
+        if vec is not None:
+            vectors.append((key, vec))
+
+    top1 = 0
+    matched = 0
+    matched_correct = 0
+    search_ms = []
+    for i, (key, vec) in enumerate(vectors):
+        others = vectors[:i] + vectors[i + 1:]
+        started = time.perf_counter()
+        ranked = image_embedding.rank(vec, others)
+        search_ms.append((time.perf_counter() - started) * 1000)
+        if ranked and ranked[0][0] == key:
+            top1 += 1
+        if image_embedding.is_confident(ranked):
+            matched += 1
+            matched_correct += ranked[0][0] == key
+
+    n = len(vectors)
+    print(f"local: {n} photos, {len({k for k, _ in vectors})} landmarks")
+    print(f"  embed  p50 {percentile(embed_ms, 0.5)} ms, p90 {percentile(embed_ms, 0.9)} ms")
+    print(f"  search p50 {percentile(search_ms, 0.5)} ms over {n - 1} vectors")
+    print(f"  top-1 accuracy {top1 / n:.3f}")
+    print(
+        f"  at threshold {image_embedding.EMBED_MATCH_THRESHOLD} / margin {image_embedding.EMBED_MATCH_MARGIN}: "
+        f"coverage {matched / n:.3f}, precision {matched_correct / matched if matched else 0:.3f}"
+    )
+
+
+async def bench_gemini(photos: list[tuple[str, bytes]]) -> None:
+    from backend.services.gemini import close_gemini, gemini_recognize
+
+    latency_ms = []
+    correct = 0
+    for key, data in photos:
+        mime_type = "image/png" if data[:4] == b"\x89PNG" else "image/jpeg"
+        started = time.perf_counter()
+        try:
+            recognition, _ = await gemini_recognize(image_bytes=data, mime_type=mime_type)
+            correct += normalize_landmark_name(recognition.landmark_name) == key
+        except Exception as e:
+            print(f"ERROR recognizing a {key} photo: {e}")
+        latency_ms.append((time.perf_counter() - started) * 1000)
+    await close_gemini()
+
+    print(f"gemini_recognize: {len(photos)} photos")
+    print(f"  latency p50 {percentile(latency_ms, 0.5)} ms, p90 {percentile(latency_ms, 0.9)} ms")
+    print(f"  accuracy {correct / len(photos):.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dir", type=Path, help="one sub-directory of photos per landmark")
+    parser.add_argument("--gemini", action="store_true", help="also time and score gemini_recognize")
+    args = parser.parse_args()
+
+    load_dotenv()
+    photos = _load(args.dir)
+    if not photos:
+        print(f"no photos found under {args.dir}")
+        return
+    bench_local(photos)
+    if args.gemini:
+        asyncio.run(bench_gemini(photos))
+
+
+if __name__ == "__main__":
+    main()
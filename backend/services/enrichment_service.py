@@ -0,0 +1,65 @@
+import asyncio
+import os
+from typing import Any, Awaitable
+
+from backend.services.places_service import get_nearby_landmarks, get_nearby_food
+from backend.services.events_service import get_nearby_events
+
+# total wall-clock budget for the whole enrichment phase (seconds)
+ENRICH_TOTAL_BUDGET_S = float(os.getenv("ENRICH_TOTAL_BUDGET_S", "4.0"))
+
+# per-source budgets (seconds); a source that misses its deadline is dropped
+ENRICH_SOURCE_BUDGETS_S: dict[str, float] = {
+    "landmarks": float(os.getenv("ENRICH_LANDMARKS_BUDGET_S", "3.0")),
+    "food": float(os.getenv("ENRICH_FOOD_BUDGET_S", "3.0")),
+    "events": float(os.getenv("ENRICH_EVENTS_BUDGET_S", "2.5")),
+}
+
+# value used for a section when its source timed out or failed
+_EMPTY: dict[str, Any] = {
+    "landmarks": [],
+    "food": [],
+    "events": [],
+}
+
+
+async def enrich_location(lat: float, lng: float) -> tuple[dict[str, Any], list[str]]:
+    """
+    Run Places (landmarks + food) and Ticketmaster lookups at once.
+
+    Each source gets its own deadline and the whole stage is capped by
+    ENRICH_TOTAL_BUDGET_S. Returns (results, missed) where results has one key per
+    source and missed lists the sources that timed out or failed; their section
+    in results is left empty.
+    """
+    sources: dict[str, Awaitable[Any]] = {
+        "landmarks": get_nearby_landmarks(lat=lat, lng=lng),
+        "food": get_nearby_food(lat=lat, lng=lng),
+        "events": get_nearby_events(lat=lat, lng=lng),
+    }
+
+    tasks = {
+        name: asyncio.create_task(asyncio.wait_for(coro, timeout=ENRICH_SOURCE_BUDGETS_S[name]))
+        for name, coro in sources.items()
+    }
+    done, pending = await asyncio.wait(tasks.values(), timeout=ENRICH_TOTAL_BUDGET_S)
+    for task in pending:
+        task.cancel()
+
+    results: dict[str, Any] = {}
+    missed: list[str] = []
+    for name, task in tasks.items():
+        if task not in done:
+            print(f"Warning: enrichment source '{name}' cut by total budget")
+        elif task.exception() is None:
+            results[name] = task.result()
+            continue
+        elif isinstance(task.exception(), asyncio.TimeoutError):
+            print(f"Warning: enrichment source '{name}' missed its deadline")
+        else:
+            print(f"Warning: enrichment source '{name}' failed: {task.exception()}")
+
+        results[name] = _EMPTY[name]
+        missed.append(name)
+
+    return results, missed
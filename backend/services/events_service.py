@@ -1,12 +1,18 @@
+import math
 import os
 
-import httpx
-
 from backend.schemas.identify import EventSuggestion
-from backend.services.cache import get as cache_get, set as cache_set
+from backend.services.http_clients import get_client
+from backend.services import geohash, tile_cache
 
 TICKETMASTER_URL = "https://app.ticketmaster.com/discovery/v2/events.json"
 
+# geohash precision of the Events tiles (5 ~ 4.9 km x 4.9 km at the equator)
+EVENTS_TILE_PRECISION = int(os.getenv("EVENTS_TILE_PRECISION", "5"))
+EVENTS_TILE_TTL_S = 60 * 10
+# a tile serves every caller inside it, so fetch more than one caller shows
+EVENTS_TILE_FETCH_SIZE = 50
+
 
 async def get_nearby_events(
     lat: float,
@@ -18,24 +24,54 @@ async def get_nearby_events(
     if not api_key:
         return []
 
-    cache_key = f"events:{round(lat,4)}:{round(lng,4)}:{radius_km}"
-    cached = cache_get(cache_key)
-    if cached:
-        return cached
+    # one fetch per tile, widened so it covers the radius around any point in the tile
+    tile = geohash.encode(lat, lng, EVENTS_TILE_PRECISION)
+    fetch_radius_km = radius_km + math.ceil(geohash.cell_radius_m(tile) / 1000)
+    tile_events = await tile_cache.get_or_fetch(
+        "events",
+        EVENTS_TILE_PRECISION,
+        tile,
+        str(fetch_radius_km),
+        lambda: _request_tile(api_key, tile, fetch_radius_km),
+        ttl_seconds=EVENTS_TILE_TTL_S,
+    )
 
+    # re-measure from the caller's exact position; order stays by date.
+    # Events without venue coordinates can't be placed within the radius
+    # (the tile fetch is wider than it), so they are dropped.
+    radius_m = radius_km * 1000
+    events: list[EventSuggestion] = []
+    for event in tile_events:
+        if event.lat is None or event.lng is None:
+            continue
+        distance_m = geohash.distance_m(lat, lng, event.lat, event.lng)
+        if distance_m > radius_m:
+            continue
+        events.append(event.model_copy(update={"distance_meters": distance_m}))
+        if len(events) >= max_results:
+            break
+    return events
+
+
+async def _request_tile(
+    api_key: str,
+    tile: str,
+    radius_km: int,
+) -> list[EventSuggestion]:
+    """Fetch one tile from Ticketmaster, searching from the tile center."""
+    lat, lng = geohash.center(tile)
     params = {
         "apikey": api_key,
         "latlong": f"{lat},{lng}",
         "radius": radius_km,
         "unit": "km",
-        "size": max_results,
+        "size": EVENTS_TILE_FETCH_SIZE,
         "sort": "date,asc",
     }
 
-    async with httpx.AsyncClient(timeout=8.0) as client:
-        resp = await client.get(TICKETMASTER_URL, params=params)
-        resp.raise_for_status()
-        data = resp.json()
+    resp = await get_client("events").get(TICKETMASTER_URL, params=params)
+    resp.raise_for_status()
+    data = resp.json()
 
     events_raw = data.get("_embedded", {}).get("events", [])
     events: list[EventSuggestion] = []
@@ -44,9 +80,17 @@ async def get_nearby_events(
     for item in events_raw:
         venue = None
         address = None
+        venue_lat = None
+        venue_lng = None
         venues = item.get("_embedded", {}).get("venues", [])
         if venues:
             venue = venues[0].get("name")
+            location = venues[0].get("location") or {}
+            try:
+                venue_lat = float(location["latitude"])
+                venue_lng = float(location["longitude"])
+            except (KeyError, TypeError, ValueError):
+                pass
             addr1 = (venues[0].get("address") or {}).get("line1")
             city = (venues[0].get("city") or {}).get("name")
             state = (venues[0].get("state") or {}).get("name")
@@ -85,8 +129,9 @@ async def get_nearby_events(
                 distance_meters=distance_m,
                 category=category,
                 url=item.get("url"),
+                lat=venue_lat,
+                lng=venue_lng,
             )
         )
 
-    cache_set(cache_key, events, ttl_seconds=60 * 10)
     return events
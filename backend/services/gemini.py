@@ -1,11 +1,87 @@
+import asyncio
+from typing import AsyncIterator, Optional
 from google import genai
 from google.genai import types
-from backend.schemas.identify import IdentifyRequest, IdentifyResponse
+from backend.schemas.identify import (
+    IdentifyRequest, IdentifyResponse, LandmarkRecognition, LandmarkRecord, LandmarkPersonalization,
+)
 import os
 
+# max Gemini calls in flight per worker; extra callers wait without blocking the loop
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
 
-def gemini_identify(image_bytes: bytes, mime_type: str, req: IdentifyRequest) -> IdentifyResponse:
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+# identify tiers: the fast model answers first, the pro model only when it is unsure
+IDENTIFY_FAST_MODEL = "gemini-3-flash-preview"
+IDENTIFY_PRO_MODEL = "gemini-3-pro-preview"
+
+_gemini_client: genai.Client | None = None
+_gemini_semaphore: asyncio.Semaphore | None = None
+# Gemini calls currently holding a semaphore slot
+_in_flight = 0
+
+
+def get_gemini() -> genai.Client:
+    global _gemini_client
+    if _gemini_client is None:
+        _gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    return _gemini_client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _gemini_semaphore
+    if _gemini_semaphore is None:
+        _gemini_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    return _gemini_semaphore
+
+
+def has_capacity(free_slots: int = 1) -> bool:
+    """True when at least free_slots Gemini calls could start right now without queueing."""
+    return not _get_semaphore().locked() and GEMINI_MAX_CONCURRENCY - _in_flight >= free_slots
+
+
+async def generate_content(**kwargs) -> types.GenerateContentResponse:
+    """Async generate_content on the shared client, bounded by GEMINI_MAX_CONCURRENCY."""
+    global _in_flight
+    async with _get_semaphore():
+        _in_flight += 1
+        try:
+            return await get_gemini().aio.models.generate_content(**kwargs)
+        finally:
+            _in_flight -= 1
+
+
+async def generate_content_stream(**kwargs) -> AsyncIterator[types.GenerateContentResponse]:
+    """Streaming generate_content; the concurrency slot is held until the stream ends."""
+    global _in_flight
+    async with _get_semaphore():
+        _in_flight += 1
+        try:
+            stream = await get_gemini().aio.models.generate_content_stream(**kwargs)
+            async for chunk in stream:
+                yield chunk
+        finally:
+            _in_flight -= 1
+
+
+async def create_cached_content(**kwargs) -> types.CachedContent:
+    """Create a Gemini context cache on the shared client."""
+    return await get_gemini().aio.caches.create(**kwargs)
+
+
+async def close_gemini() -> None:
+    global _gemini_client
+    if _gemini_client is not None:
+        await _gemini_client.aio.aclose()
+        _gemini_client = None
+
+
+async def gemini_identify(
+    image_bytes: bytes,
+    mime_type: str,
+    req: IdentifyRequest,
+    model: str = IDENTIFY_PRO_MODEL,
+) -> tuple[IdentifyResponse, Optional[types.GenerateContentResponseUsageMetadata]]:
+    """Identify the landmark in an image with `model`; returns the parsed answer and token usage."""
     interests = ", ".join(req.interests) if req.interests else "None"
     age_bracket = req.age_bracket
 
@@ -33,6 +109,7 @@ def gemini_identify(image_bytes: bytes, mime_type: str, req: IdentifyRequest) ->
     - match_facts: 1–2 facts explicitly tied to user interests (empty list if no match).
     - discovery_facts: 1–2 general surprising facts (always try to provide).
     - suggested_questions: 3 short follow-up questions the user can tap (age + interests aware).
+    - landmark_name: the landmark's common English name only (e.g. "Eiffel Tower"), no city or country.
     - location: city/country if known, otherwise a best guess or "Unknown".
     - landmark_lat / landmark_lng: approximate coordinates of the landmark if known, otherwise null.
 
@@ -40,8 +117,8 @@ def gemini_identify(image_bytes: bytes, mime_type: str, req: IdentifyRequest) ->
     """.strip()
     image_part = types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
 
-    response = client.models.generate_content(
-        model="gemini-3-pro-preview",
+    response = await generate_content(
+        model=model,
         contents=[image_part, prompt],
         config=types.GenerateContentConfig(
             thinking_config=types.ThinkingConfig(
@@ -56,4 +133,91 @@ def gemini_identify(image_bytes: bytes, mime_type: str, req: IdentifyRequest) ->
     text = response.text
     if not text:
         raise ValueError("Gemini response is empty.")
-    return IdentifyResponse.model_validate_json(text)
+    return IdentifyResponse.model_validate_json(text), response.usage_metadata
+
+
+async def gemini_recognize(
+    image_bytes: bytes,
+    mime_type: str,
+    model: str = IDENTIFY_FAST_MODEL,
+) -> tuple[LandmarkRecognition, Optional[types.GenerateContentResponseUsageMetadata]]:
+    """Low-detail look at the image that only names the landmark."""
+    prompt = """
+    Identify the landmark/building/place in the image.
+
+    - landmark_name: the landmark's common English name only (e.g. "Eiffel Tower"), no city or country.
+      Use "Unknown" if you cannot tell.
+    - location: city/country if known, otherwise "Unknown".
+    - confidence_score: 0 to 1, how sure you are of landmark_name. Use <= 0.6 if unsure.
+
+    Return ONLY JSON. No markdown. No extra keys.
+    """.strip()
+    image_part = types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
+
+    response = await generate_content(
+        model=model,
+        contents=[image_part, prompt],
+        config=types.GenerateContentConfig(
+            thinking_config=types.ThinkingConfig(
+                thinking_level=types.ThinkingLevel.LOW
+            ),
+            max_output_tokens=300,
+            response_mime_type="application/json",
+            response_json_schema=LandmarkRecognition.model_json_schema(),
+            media_resolution=types.MediaResolution.MEDIA_RESOLUTION_LOW,
+        ),
+    )
+    text = response.text
+    if not text:
+        raise ValueError("Gemini response is empty.")
+    return LandmarkRecognition.model_validate_json(text), response.usage_metadata
+
+
+async def gemini_personalize(
+    record: LandmarkRecord,
+    req: IdentifyRequest,
+    model: str = IDENTIFY_FAST_MODEL,
+) -> tuple[LandmarkPersonalization, Optional[types.GenerateContentResponseUsageMetadata]]:
+    """Text-only call that tailors a shared landmark record to one user profile."""
+    interests = ", ".join(req.interests) if req.interests else "None"
+    facts = "\n".join(f"- {f}" for f in record.discovery_facts) or "- None"
+
+    prompt = f"""
+    You are a travel guide.
+
+    USER PROFILE:
+    - age_bracket: {req.age_bracket}
+    - interests: {interests}
+
+    LANDMARK:
+    - name: {record.landmark_name}
+    - location: {record.location}
+    - tags: {", ".join(record.tags)}
+    - about: {record.description}
+    - known facts:
+    {facts}
+
+    TASK: write the personalized parts of the landmark card as JSON matching the schema.
+    - description: 1 short paragraph about the landmark, adjusted to age_bracket reading level.
+    - match_facts: 1–2 facts explicitly tied to user interests (empty list if no match).
+    - suggested_questions: 3 short follow-up questions the user can tap (age + interests aware).
+
+    Return ONLY JSON. No markdown. No extra keys.
+    """.strip()
+
+    response = await generate_content(
+        model=model,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            thinking_config=types.ThinkingConfig(
+                thinking_level=types.ThinkingLevel.LOW
+            ),
+            max_output_tokens=1000,
+            response_mime_type="application/json",
+            response_json_schema=LandmarkPersonalization.model_json_schema(),
+        ),
+    )
+    text = response.text
+    if not text:
+        raise ValueError("Gemini response is empty.")
+    return LandmarkPersonalization.model_validate_json(text), response.usage_metadata
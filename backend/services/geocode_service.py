@@ -1,5 +1,5 @@
 from typing import Optional
-import httpx
+from backend.services.http_clients import get_client
 
 def _pick_city(address: dict) -> Optional[str]:
     return (
@@ -19,13 +19,12 @@ async def reverse_geocode(lat: float, lng: float) -> Optional[str]:
         "zoom": 12,
         "addressdetails": 1,
     }
-    headers = {"User-Agent": "LandmarkIdentify/1.0"}
 
-    async with httpx.AsyncClient(timeout=10, headers=headers) as client:
-        r = await client.get(url, params=params)
-        if r.status_code != 200:
-            return None
-        data = r.json()
+    # User-Agent required by Nominatim is set on the shared client
+    r = await get_client("geocode").get(url, params=params)
+    if r.status_code != 200:
+        return None
+    data = r.json()
 
     address = data.get("address", {}) or {}
     return _pick_city(address)
@@ -0,0 +1,109 @@
+# services/geohash.py
+# Minimal geohash helpers for tiling nearby-search results, plus the
+# great-circle distance every location filter uses.
+import math
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+
+def encode(lat: float, lng: float, precision: int) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars: list[str] = []
+    bits = 0
+    n_bits = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_lo = mid
+            else:
+                bits <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        n_bits += 1
+        if n_bits == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            n_bits = 0
+    return "".join(chars)
+
+
+def bbox(tile: str) -> tuple[float, float, float, float]:
+    """(lat_min, lat_max, lng_min, lng_max) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for c in tile:
+        value = _DECODE[c]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if bit:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lat_hi, lng_lo, lng_hi
+
+
+def center(tile: str) -> tuple[float, float]:
+    lat_lo, lat_hi, lng_lo, lng_hi = bbox(tile)
+    return (lat_lo + lat_hi) / 2, (lng_lo + lng_hi) / 2
+
+
+def neighbors(tile: str) -> list[str]:
+    """The 8 cells around a tile (fewer at the poles)."""
+    lat_lo, lat_hi, lng_lo, lng_hi = bbox(tile)
+    c_lat, c_lng = (lat_lo + lat_hi) / 2, (lng_lo + lng_hi) / 2
+    d_lat, d_lng = lat_hi - lat_lo, lng_hi - lng_lo
+    result: list[str] = []
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            if dx == 0 and dy == 0:
+                continue
+            lat = c_lat + dy * d_lat
+            if not -90.0 <= lat <= 90.0:
+                continue
+            lng = (c_lng + dx * d_lng + 180.0) % 360.0 - 180.0
+            cell = encode(lat, lng, len(tile))
+            if cell != tile and cell not in result:
+                result.append(cell)
+    return result
+
+
+def distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> int:
+    """Haversine distance in meters between two lat/lng points."""
+    r = 6371000.0
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2.0) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2.0) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return int(r * c)
+
+
+def cell_radius_m(cell: str) -> int:
+    """Distance in meters from a cell's center to its farthest corner."""
+    lat_lo, lat_hi, _, lng_hi = bbox(cell)
+    c_lat, c_lng = center(cell)
+    return max(distance_m(c_lat, c_lng, corner_lat, lng_hi) for corner_lat in (lat_lo, lat_hi)) + 1
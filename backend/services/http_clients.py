@@ -0,0 +1,129 @@
+# services/http_clients.py
+# App-wide registry of pooled httpx clients, one per upstream API.
+# Created in the FastAPI lifespan (backend/main.py) and shared by the
+# Places, Ticketmaster, Nominatim, Supabase Auth and Supabase database clients
+# so connections are reused.
+import os
+from typing import Any, Optional
+
+import httpx
+
+# per-upstream settings: timeouts, pool limits and whether to negotiate HTTP/2
+UPSTREAMS: dict[str, dict[str, Any]] = {
+    "places": {
+        "timeout": httpx.Timeout(8.0, connect=3.0),
+        "limits": httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0),
+        "http2": True,
+        "headers": {},
+    },
+    "events": {
+        "timeout": httpx.Timeout(8.0, connect=3.0),
+        "limits": httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=60.0),
+        "http2": True,
+        "headers": {},
+    },
+    "geocode": {
+        # Nominatim's usage policy allows very few parallel requests per client
+        "timeout": httpx.Timeout(10.0, connect=3.0),
+        "limits": httpx.Limits(max_connections=2, max_keepalive_connections=2, keepalive_expiry=30.0),
+        "http2": True,
+        "headers": {"User-Agent": "LandmarkIdentify/1.0"},
+    },
+    "supabase_auth": {
+        # login/signup proxying and JWKS refreshes; token checks themselves are local
+        "timeout": httpx.Timeout(8.0, connect=3.0),
+        "limits": httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=60.0),
+        "http2": True,
+        "headers": {},
+    },
+    "supabase_db": {
+        # PostgREST + Storage for backend/db/queries.py; the pool bounds concurrent queries
+        "timeout": httpx.Timeout(float(os.getenv("DB_TIMEOUT_S", "10")), connect=3.0),
+        "limits": httpx.Limits(
+            max_connections=int(os.getenv("DB_POOL_SIZE", "20")),
+            max_keepalive_connections=int(os.getenv("DB_POOL_SIZE", "20")),
+            keepalive_expiry=60.0,
+        ),
+        "http2": True,
+        "headers": {},
+    },
+}
+
+_CLIENTS: dict[str, httpx.AsyncClient] = {}
+
+
+def _build_client(name: str) -> httpx.AsyncClient:
+    cfg = UPSTREAMS[name]
+    try:
+        return httpx.AsyncClient(
+            timeout=cfg["timeout"],
+            limits=cfg["limits"],
+            http2=cfg["http2"],
+            headers=cfg["headers"],
+        )
+    except ImportError:
+        # h2 not installed, fall back to HTTP/1.1 keep-alive
+        return httpx.AsyncClient(timeout=cfg["timeout"], limits=cfg["limits"], headers=cfg["headers"])
+
+
+async def startup() -> None:
+    for name in UPSTREAMS:
+        if name not in _CLIENTS:
+            _CLIENTS[name] = _build_client(name)
+
+
+async def shutdown() -> None:
+    clients = list(_CLIENTS.values())
+    _CLIENTS.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """Return the shared client for an upstream, creating it lazily outside the app lifespan."""
+    client = _CLIENTS.get(name)
+    if client is None or client.is_closed:
+        client = _build_client(name)
+        _CLIENTS[name] = client
+    return client
+
+
+def _pool_stats(client: httpx.AsyncClient) -> Optional[dict[str, int]]:
+    # httpx doesn't expose pool counters publicly, so read them off the httpcore
+    # pool; private attributes can change in any release, so never let that fail the caller
+    try:
+        pool = getattr(client, "_transport", None)
+        pool = getattr(pool, "_pool", None)
+        if pool is None:
+            return None
+
+        connections = list(getattr(pool, "connections", []))
+        requests = list(getattr(pool, "_requests", []))
+        idle = sum(1 for c in connections if c.is_idle())
+        closed = sum(1 for c in connections if c.is_closed())
+        return {
+            "connections": len(connections),
+            "in_use": len(connections) - idle - closed,
+            "idle": idle,
+            "waiting": sum(1 for r in requests if r.is_queued()),
+        }
+    except Exception as e:
+        print(f"Warning: could not read connection pool stats: {e}")
+        return None
+
+
+def pool_stats() -> dict[str, Any]:
+    """Per-upstream connection pool stats: connections in use, idle and requests waiting."""
+    stats: dict[str, Any] = {}
+    for name in UPSTREAMS:
+        client = _CLIENTS.get(name)
+        if client is None or client.is_closed:
+            stats[name] = None
+            continue
+        limits: httpx.Limits = UPSTREAMS[name]["limits"]
+        stats[name] = {
+            "max_connections": limits.max_connections,
+            "max_keepalive_connections": limits.max_keepalive_connections,
+            "pool": _pool_stats(client),
+        }
+    return stats
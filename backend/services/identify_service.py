@@ -1,17 +1,79 @@
-from typing import Optional
+from typing import Any, Awaitable, Optional
+import asyncio
+import os
+import random
 import re
+import time
+import unicodedata
+from collections import deque
 from datetime import datetime, timezone
 
-from backend.schemas.identify import IdentifyResponse, IdentifyRequest, AgeBracket, NearbySuggestions
-from backend.services.cache import get as cache_get, set as cache_set
-from backend.services.gemini import gemini_identify
-from backend.services.places_service import get_nearby_landmarks, get_nearby_food
-from backend.services.events_service import get_nearby_events
-from backend.services.geocode_service import reverse_geocode
-from backend.db import queries
+from backend.schemas.identify import (
+    IdentifyResponse, IdentifyRequest, AgeBracket, NearbySuggestions, Personalization, FunFacts,
+    LandmarkRecord, LandmarkPersonalization,
+)
+from backend.services.tiered_cache import get as cache_get, set as cache_set
+from backend.services.gemini import (
+    gemini_identify, gemini_recognize, gemini_personalize, IDENTIFY_FAST_MODEL, IDENTIFY_PRO_MODEL,
+)
+from backend.services.enrichment_service import enrich_location
+from backend.services.image_fingerprint import content_hash, dhash, perceptual_index
+from backend.services.latency import percentile
+from backend.services import geohash, image_embedding, profile_cache, singleflight, scan_jobs
 
 CONFIRM_THRESHOLD = 0.65
 
+# how long a caller waits on an identical identify already in flight
+IDENTIFY_FLIGHT_TIMEOUT_S = 60.0
+
+# tiered identify: fast model first, pro model only when the fast answer is unsure
+IDENTIFY_CASCADE = os.getenv("IDENTIFY_CASCADE", "1") == "1"
+
+# two-layer results: a low-detail recognition looks up a shared per-landmark
+# record, and only the personalization is generated per age/interest bucket
+IDENTIFY_LAYERED = os.getenv("IDENTIFY_LAYERED", "1") == "1"
+LANDMARK_RECORD_TTL_S = 60 * 60 * 24 * 7
+LANDMARK_PERSONALIZATION_TTL_S = 60 * 60 * 24
+# shared records are scoped to the photo's geohash cell (~40 km), so same-named
+# landmarks in different cities don't share one
+LANDMARK_RECORD_PRECISION = 4
+# a record whose landmark is farther than this from the photo is not served
+LANDMARK_RECORD_MAX_DISTANCE_M = int(os.getenv("LANDMARK_RECORD_MAX_DISTANCE_M", "50000"))
+# share of local embedding matches still sent to Gemini to measure their accuracy
+EMBED_SHADOW_RATE = float(os.getenv("EMBED_SHADOW_RATE", "0.05"))
+
+_cascade_stats: dict[str, Any] = {
+    "calls": 0,
+    "fast_only": 0,
+    "escalated": 0,
+    "pro_only": 0,
+    "escalation_reasons": {},
+    "tokens": {"recognize": 0, "personalize": 0, "fast": 0, "pro": 0},
+}
+_layer_stats = {
+    "recognitions": 0,
+    "recognition_unsure": 0,
+    "record_hits": 0,
+    "record_misses": 0,
+    "record_too_far": 0,
+    "personalization_hits": 0,
+    "personalization_generated": 0,
+    "personalization_errors": 0,
+    "full_identifies": 0,
+    "embedding_hits": 0,
+    "embedding_shadow_checks": 0,
+    "embedding_shadow_agree": 0,
+}
+# Gemini stage latency over the last 500 identifies, per tier and end to end
+_tier_latency_ms: dict[str, deque] = {
+    "embed": deque(maxlen=500),
+    "recognize": deque(maxlen=500),
+    "personalize": deque(maxlen=500),
+    "fast": deque(maxlen=500),
+    "pro": deque(maxlen=500),
+    "total": deque(maxlen=500),
+}
+
 
 def normalize_interests(interests: list[str], max_n: int = 8) -> list[str]:
     cleaned = []
@@ -29,6 +91,16 @@ def normalize_interests(interests: list[str], max_n: int = 8) -> list[str]:
     return cleaned
 
 
+def normalize_landmark_name(name: str) -> str:
+    # "The Eiffel Tower" / "eiffel  tower" / "Eiffel-Tower" share one record
+    t = unicodedata.normalize("NFKD", name)
+    t = "".join(c for c in t if not unicodedata.combining(c)).lower()
+    t = re.sub(r"[^a-z0-9]+", " ", t).strip()
+    if t.startswith("the "):
+        t = t[4:]
+    return t
+
+
 def looks_uncertain(text: str) -> bool:
     uncertain_patterns = [
         r"\bmaybe\b",
@@ -100,6 +172,321 @@ def finalize_confidence(res: IdentifyResponse, final_interests: list[str]) -> Id
     return res
 
 
+def _escalation_reason(res: IdentifyResponse, final_interests: list[str]) -> Optional[str]:
+    """Why the fast model's answer should go to the pro model, or None to keep it."""
+    name = (res.landmark_name or "").strip().lower()
+    if not name or name in {"unknown", "uncertain"}:
+        return "unknown_landmark"
+    if res.confidence_score is not None and res.confidence_score < CONFIRM_THRESHOLD:
+        return "low_confidence"
+    if looks_uncertain(res.description):
+        return "uncertain_text"
+    # same confirmation logic the final answer goes through, on a throwaway copy
+    if finalize_confidence(res.model_copy(deep=True), final_interests).needs_confirmation:
+        return "needs_confirmation"
+    return None
+
+
+async def _timed(tier: str, call: Awaitable[tuple[Any, Any]]) -> Any:
+    """Await a Gemini helper returning (result, usage), recording latency and tokens for `tier`."""
+    started = time.perf_counter()
+    try:
+        res, usage = await call
+    finally:
+        _tier_latency_ms[tier].append((time.perf_counter() - started) * 1000)
+    if usage is not None:
+        _cascade_stats["tokens"][tier] += usage.total_token_count or 0
+    return res
+
+
+async def _timed_identify(tier: str, model: str, image_bytes: bytes, mime_type: str, req: IdentifyRequest) -> IdentifyResponse:
+    return await _timed(tier, gemini_identify(image_bytes=image_bytes, mime_type=mime_type, req=req, model=model))
+
+
+async def _identify_with_cascade(
+    image_bytes: bytes,
+    mime_type: str,
+    req: IdentifyRequest,
+    final_interests: list[str],
+) -> IdentifyResponse:
+    _cascade_stats["calls"] += 1
+    if not IDENTIFY_CASCADE:
+        _cascade_stats["pro_only"] += 1
+        return await _timed_identify("pro", IDENTIFY_PRO_MODEL, image_bytes, mime_type, req)
+
+    try:
+        res = await _timed_identify("fast", IDENTIFY_FAST_MODEL, image_bytes, mime_type, req)
+        reason = _escalation_reason(res, final_interests)
+    except Exception as e:
+        print(f"Warning: fast identify failed, escalating: {e}")
+        reason = "fast_error"
+
+    if reason is None:
+        _cascade_stats["fast_only"] += 1
+        return res
+
+    _cascade_stats["escalated"] += 1
+    reasons = _cascade_stats["escalation_reasons"]
+    reasons[reason] = reasons.get(reason, 0) + 1
+    return await _timed_identify("pro", IDENTIFY_PRO_MODEL, image_bytes, mime_type, req)
+
+
+def _record_scope(lat: Optional[float], lng: Optional[float], location: str) -> str:
+    """Coarse place a shared record belongs to: the photo's geohash cell, else the named location."""
+    if lat is not None and lng is not None:
+        return geohash.encode(lat, lng, LANDMARK_RECORD_PRECISION)
+    return "loc:" + normalize_landmark_name(location or "")
+
+
+def _record_key(name_key: str, scope: str) -> str:
+    return f"landmark:{scope}:{name_key}"
+
+
+def _personalization_key(name_key: str, scope: str, profile_key: str) -> str:
+    return f"persona:{scope}:{name_key}:{profile_key}"
+
+
+def _compose(record: LandmarkRecord, persona: LandmarkPersonalization, req: IdentifyRequest) -> IdentifyResponse:
+    return IdentifyResponse(
+        landmark_name=record.landmark_name,
+        location=record.location,
+        landmark_lat=record.landmark_lat,
+        landmark_lng=record.landmark_lng,
+        tags=list(record.tags),
+        description=persona.description,
+        personalization=Personalization(age_bracket=req.age_bracket),
+        fun_facts=FunFacts(match_facts=list(persona.match_facts), discovery_facts=list(record.discovery_facts)),
+        suggested_questions=list(persona.suggested_questions),
+        confidence_score=record.confidence_score,
+    )
+
+
+async def _store_layers(res: IdentifyResponse, profile_key: str, lat: Optional[float], lng: Optional[float]) -> None:
+    """Split a confident full identify into the shared record and this profile's personalization."""
+    name_key = normalize_landmark_name(res.landmark_name)
+    if not name_key:
+        return
+    scope = _record_scope(lat, lng, res.location)
+    record = LandmarkRecord(
+        landmark_name=res.landmark_name,
+        location=res.location,
+        landmark_lat=res.landmark_lat,
+        landmark_lng=res.landmark_lng,
+        tags=res.tags,
+        description=res.description,
+        discovery_facts=res.fun_facts.discovery_facts,
+        confidence_score=res.confidence_score,
+    )
+    persona = LandmarkPersonalization(
+        description=res.description,
+        match_facts=res.fun_facts.match_facts,
+        suggested_questions=res.suggested_questions,
+    )
+    await cache_set(_record_key(name_key, scope), record, ttl_seconds=LANDMARK_RECORD_TTL_S)
+    await cache_set(_personalization_key(name_key, scope, profile_key), persona, ttl_seconds=LANDMARK_PERSONALIZATION_TTL_S)
+
+
+async def _from_shared_record(
+    image_bytes: bytes,
+    mime_type: str,
+    req: IdentifyRequest,
+    profile_key: str,
+    lat: Optional[float],
+    lng: Optional[float],
+) -> Optional[IdentifyResponse]:
+    """Recognize at low detail and build the answer from cached layers; None = do a full identify."""
+    _layer_stats["recognitions"] += 1
+    try:
+        recognition = await _timed("recognize", gemini_recognize(image_bytes=image_bytes, mime_type=mime_type))
+    except Exception as e:
+        print(f"Warning: landmark recognition failed: {e}")
+        return None
+
+    name_key = normalize_landmark_name(recognition.landmark_name)
+    confident = recognition.confidence_score is not None and recognition.confidence_score >= CONFIRM_THRESHOLD
+    if not name_key or name_key in {"unknown", "uncertain"} or not confident:
+        _layer_stats["recognition_unsure"] += 1
+        return None
+
+    scope = _record_scope(lat, lng, recognition.location)
+    return await _from_record(name_key, scope, req, profile_key, lat, lng)
+
+
+async def _from_record(
+    name_key: str,
+    scope: str,
+    req: IdentifyRequest,
+    profile_key: str,
+    lat: Optional[float],
+    lng: Optional[float],
+) -> Optional[IdentifyResponse]:
+    """Shared record + this profile's personalization for a known landmark; None if no record."""
+    record = await cache_get(_record_key(name_key, scope))
+    if record is None:
+        _layer_stats["record_misses"] += 1
+        return None
+    if (
+        lat is not None and lng is not None
+        and record.landmark_lat is not None and record.landmark_lng is not None
+        and geohash.distance_m(lat, lng, record.landmark_lat, record.landmark_lng) > LANDMARK_RECORD_MAX_DISTANCE_M
+    ):
+        # a same-named landmark somewhere else; identify this photo in full
+        _layer_stats["record_too_far"] += 1
+        return None
+    _layer_stats["record_hits"] += 1
+
+    persona_key = _personalization_key(name_key, scope, profile_key)
+    persona = await cache_get(persona_key)
+    if persona is not None:
+        _layer_stats["personalization_hits"] += 1
+    else:
+        try:
+            # same landmark + profile bucket in flight shares one text-only call
+            persona = await singleflight.do(
+                persona_key,
+                lambda: _timed("personalize", gemini_personalize(record=record, req=req)),
+            )
+        except Exception as e:
+            _layer_stats["personalization_errors"] += 1
+            print(f"Warning: personalization failed for {name_key}: {e}")
+            return None
+        _layer_stats["personalization_generated"] += 1
+        await cache_set(persona_key, persona, ttl_seconds=LANDMARK_PERSONALIZATION_TTL_S)
+
+    return _compose(record, persona, req)
+
+
+async def _local_match(image_bytes: bytes, lat: float, lng: float) -> tuple[Optional[Any], Optional[str]]:
+    """(embedding, landmark key of a confident nearby match) from the local index."""
+    started = time.perf_counter()
+    try:
+        vec = await asyncio.to_thread(image_embedding.embed, image_bytes)
+        if vec is None:
+            return None, None
+        match = await asyncio.to_thread(image_embedding.search, vec, lat, lng)
+        return vec, match[0] if match else None
+    except Exception as e:
+        print(f"Warning: local embedding lookup failed: {e}")
+        return None, None
+    finally:
+        _tier_latency_ms["embed"].append((time.perf_counter() - started) * 1000)
+
+
+async def _recognition_stage(
+    image_bytes: bytes,
+    mime_type: str,
+    req: IdentifyRequest,
+    final_interests: list[str],
+    profile_key: str,
+    lat: Optional[float],
+    lng: Optional[float],
+) -> IdentifyResponse:
+    """Local embedding match, then low-detail recognition + shared record, then full identify."""
+    started = time.perf_counter()
+    try:
+        vec, local_key, shadow_key = None, None, None
+        if IDENTIFY_LAYERED and image_embedding.EMBED_INDEX_ENABLED and lat is not None and lng is not None:
+            vec, local_key = await _local_match(image_bytes, lat, lng)
+            if local_key is not None:
+                if random.random() < EMBED_SHADOW_RATE:
+                    # check this match against Gemini instead of serving it
+                    shadow_key = local_key
+                else:
+                    scope = _record_scope(lat, lng, "")
+                    res = await _from_record(local_key, scope, req, profile_key, lat, lng)
+                    if res is not None:
+                        _layer_stats["embedding_hits"] += 1
+                        return res
+
+        res = None
+        if IDENTIFY_LAYERED:
+            res = await _from_shared_record(image_bytes, mime_type, req, profile_key, lat, lng)
+        confident = res is not None
+        if res is None:
+            _layer_stats["full_identifies"] += 1
+            res = await _identify_with_cascade(image_bytes, mime_type, req, final_interests)
+            # only confident answers become shared records; a wrong name would mislead every later scan
+            confident = _escalation_reason(res, final_interests) is None
+            if IDENTIFY_LAYERED and confident:
+                await _store_layers(res, profile_key, lat, lng)
+
+        name_key = normalize_landmark_name(res.landmark_name)
+        if shadow_key is not None:
+            _layer_stats["embedding_shadow_checks"] += 1
+            if shadow_key == name_key:
+                _layer_stats["embedding_shadow_agree"] += 1
+        if vec is not None and confident and name_key:
+            await asyncio.to_thread(image_embedding.add, vec, lat, lng, name_key)
+        return res
+    finally:
+        _tier_latency_ms["total"].append((time.perf_counter() - started) * 1000)
+
+
+def stats() -> dict[str, Any]:
+    decided = _cascade_stats["fast_only"] + _cascade_stats["escalated"]
+    checks = _layer_stats["embedding_shadow_checks"]
+    latency = {}
+    for tier, samples in _tier_latency_ms.items():
+        values = list(samples)
+        latency[tier] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 0.5),
+            "p90_ms": percentile(values, 0.9),
+        }
+    return {
+        "cascade_enabled": IDENTIFY_CASCADE,
+        "layered_enabled": IDENTIFY_LAYERED,
+        **_cascade_stats,
+        "layers": dict(_layer_stats),
+        "embedding_shadow_accuracy": round(_layer_stats["embedding_shadow_agree"] / checks, 3) if checks else None,
+        "escalation_rate": round(_cascade_stats["escalated"] / decided, 3) if decided else None,
+        "latency": latency,
+    }
+
+
+async def _identify_uncached(
+    image_bytes: bytes,
+    mime_type: str,
+    user_id: Optional[str],
+    final_age: AgeBracket,
+    final_interests: list[str],
+    lat: Optional[float],
+    lng: Optional[float],
+    cache_key: str,
+    profile_key: str,
+    phash: Optional[int],
+) -> IdentifyResponse:
+    """Gemini + enrichment for a cache miss; caches and returns the shared result."""
+    # call Gemini API
+    req = IdentifyRequest(user_id=user_id, age_bracket=final_age, interests=final_interests)
+    res = await _recognition_stage(image_bytes, mime_type, req, final_interests, profile_key, lat, lng)
+
+    res.nearby = NearbySuggestions()
+    res.events = []
+
+    # use the landmark location when Gemini gives one, otherwise the phone location
+    nearby_lat = res.landmark_lat if res.landmark_lat is not None else lat
+    nearby_lng = res.landmark_lng if res.landmark_lng is not None else lng
+    if nearby_lat is not None and nearby_lng is not None:
+        enriched, missed = await enrich_location(nearby_lat, nearby_lng)
+        res.nearby.landmarks = enriched["landmarks"]
+        res.nearby.food = enriched["food"]
+        res.events = enriched["events"]
+        res.partial_sections = missed
+        res.partial = bool(missed)
+
+    # post-process safety + confidence/confirmation logic
+    res = safe_lists(res)
+    res = finalize_confidence(res, final_interests)
+
+    # cache result for 1hr, partial results only briefly so a retry can fill the gaps
+    await cache_set(cache_key, res, ttl_seconds=60 if res.partial else 60 * 60)
+    if phash is not None and lat is not None and lng is not None and not res.needs_confirmation:
+        perceptual_index.add(phash, lat, lng, profile_key, cache_key)
+
+    return res
+
+
 async def identify_landmark(
     image_bytes: bytes,
     user_id: Optional[str],
@@ -108,15 +495,26 @@ async def identify_landmark(
     lat: Optional[float],
     lng: Optional[float],
     mime_type: str = "image/jpeg",
+    scan_id: Optional[str] = None,
+    timestamp: Optional[datetime] = None,
+    enqueue_scan: bool = True,
+    digest: Optional[str] = None,
 ) -> IdentifyResponse:
-    timestamp = datetime.now(timezone.utc)
+    """
+    Identify one photo. With enqueue_scan=False the scan id is still allocated
+    but saving the scan is left to the caller (the batch endpoint bulk-inserts).
+    digest is the SHA-256 of the upload when the caller already computed it
+    while reading; the same upload always normalizes to the same image, so it
+    keys the result cache without hashing image_bytes again.
+    """
+    timestamp = timestamp or datetime.now(timezone.utc)
 
     # resolve final profile - user input takes priority, profile is fallback
     final_age: AgeBracket = age_bracket or "adult"
     final_interests = normalize_interests(interests or [])
 
     if user_id:
-        profile = queries.get_profile(user_id)
+        profile = await profile_cache.get_profile(user_id)
         if profile:
             # only use profile values if user didn't provide them
             if not age_bracket:
@@ -124,65 +522,57 @@ async def identify_landmark(
             if not interests:
                 final_interests = normalize_interests(profile.get("interests", []))
 
-    # make cache key
-    sample = image_bytes[:64]
+    # make cache key: exact match on the full image content
+    profile_key = f"{final_age}:{','.join(final_interests)}"
+    if digest is None:
+        digest = await asyncio.to_thread(content_hash, image_bytes)
     lat_lng_key = f"{round(lat,4)},{round(lng,4)}" if lat is not None and lng is not None else "none"
-    cache_key = f"identify:{final_age}:{','.join(final_interests)}:{len(image_bytes)}:{sample.hex()}:{lat_lng_key}"
-
-    cached = cache_get(cache_key)
-    if cached:
-        return cached
-
-    # call Gemini API
-    req = IdentifyRequest(user_id=user_id, age_bracket=final_age, interests=final_interests)
-    res = gemini_identify(image_bytes=image_bytes, mime_type=mime_type, req=req)
-
-    res.nearby = NearbySuggestions()
-    res.events = []
-
-    nearby_lat = res.landmark_lat if res.landmark_lat is not None else lat
-    nearby_lng = res.landmark_lng if res.landmark_lng is not None else lng
-    if nearby_lat is not None and nearby_lng is not None:
-        res.nearby.landmarks = await get_nearby_landmarks(lat=nearby_lat, lng=nearby_lng)
-        res.nearby.food = await get_nearby_food(lat=nearby_lat, lng=nearby_lng)
-        res.events = await get_nearby_events(lat=nearby_lat, lng=nearby_lng)
-
-    # post-process safety + confidence/confirmation logic
-    res = safe_lists(res)
-    res = finalize_confidence(res, final_interests)
-
-    # cache result for 1hr
-    cache_set(cache_key, res, ttl_seconds=60 * 60)
-
-    # save scan to DB and return scan_id for image upload
-    scan_id = None
-    if user_id:
-        save_lat = res.landmark_lat if res.landmark_lat is not None else lat
-        save_lng = res.landmark_lng if res.landmark_lng is not None else lng
-        if save_lat is not None and save_lng is not None:
-            # Get city from landmark location, not phone location
-            city: Optional[str] = None
-            try:
-                city = await reverse_geocode(save_lat, save_lng)
-            except Exception as geo_err:
-                print(f"Warning: reverse geocode failed for landmark: {geo_err}")
-            
-            scan_record = queries.save_scan(
-                user_id=user_id,
-                landmark_name=res.landmark_name,
-                description=res.description,
-                lat=save_lat,
-                lng=save_lng,
-                tags=res.tags,
-                timestamp=timestamp,
-                image_url=None,
-                city=city,
-            )
-            if scan_record:
-                scan_id = scan_record.get("id")
-
-    # Store scan_id in response for later image upload
-    if scan_id:
-        res.scan_id = scan_id
+    cache_key = f"identify:{profile_key}:{digest}:{lat_lng_key}"
+
+    res = await cache_get(cache_key)
+
+    # near-duplicate shot of the same scene from the same spot reuses a recent result
+    phash: Optional[int] = None
+    if res is None and lat is not None and lng is not None:
+        phash = await asyncio.to_thread(dhash, image_bytes)
+        if phash is not None:
+            similar_key = perceptual_index.find(phash, lat, lng, profile_key)
+            if similar_key:
+                res = await cache_get(similar_key)
+
+    if res is None:
+        # identical requests in flight share one Gemini call + enrichment
+        res = await singleflight.do(
+            cache_key,
+            lambda: _identify_uncached(
+                image_bytes, mime_type, user_id, final_age, final_interests,
+                lat, lng, cache_key, profile_key, phash,
+            ),
+            timeout=IDENTIFY_FLIGHT_TIMEOUT_S,
+        )
+    # the object is shared with other waiters and the cache, never mutate it
+    res = res.model_copy(deep=True)
+
+    # scan insert, city lookup and image upload happen in the background;
+    # the scan id is allocated here (or by the client) and returned right away
+    save_lat = res.landmark_lat if res.landmark_lat is not None else lat
+    save_lng = res.landmark_lng if res.landmark_lng is not None else lng
+    if user_id and save_lat is not None and save_lng is not None:
+        res.scan_id = scan_id or scan_jobs.new_scan_id()
+        if not enqueue_scan:
+            return res
+        await asyncio.to_thread(
+            scan_jobs.enqueue_scan,
+            scan_id=res.scan_id,
+            user_id=user_id,
+            landmark_name=res.landmark_name,
+            description=res.description,
+            lat=save_lat,
+            lng=save_lng,
+            tags=res.tags,
+            timestamp=timestamp,
+            image_bytes=image_bytes,
+            mime_type=mime_type,
+        )
 
     return res
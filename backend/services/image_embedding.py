@@ -0,0 +1,220 @@
+# services/image_embedding.py
+# Local recognition of landmarks we've already identified with confidence.
+# A compact classical descriptor (colour histogram + coarse layout + a grid of
+# edge-orientation histograms) is computed with Pillow on CPU, and matched
+# against descriptors from past confident scans. The index is partitioned by
+# geohash cell, so a lookup only compares against photos taken nearby — the
+# cell is the coarse quantizer, and each cell holds at most a few hundred vectors.
+import io
+import math
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image
+
+from backend.services import geohash
+
+EMBED_INDEX_ENABLED = os.getenv("EMBED_INDEX", "1") == "1"
+EMBED_INDEX_PATH = Path(os.getenv("EMBED_INDEX_PATH", "data/embedding_index.sqlite3"))
+# cosine similarity a match needs, and how far ahead of the best other landmark it must be
+EMBED_MATCH_THRESHOLD = float(os.getenv("EMBED_MATCH_THRESHOLD", "0.92"))
+EMBED_MATCH_MARGIN = float(os.getenv("EMBED_MATCH_MARGIN", "0.03"))
+# max distance between the new photo's GPS fix and the indexed one
+EMBED_MAX_DISTANCE_M = int(os.getenv("EMBED_MAX_DISTANCE_M", "1500"))
+# geohash cell size used to partition the index (5 ~ 4.9 km)
+EMBED_TILE_PRECISION = 5
+# newest vectors kept per landmark per cell
+EMBED_MAX_PER_LANDMARK = 50
+# cells kept in memory; older ones are reloaded from SQLite on demand
+EMBED_CACHED_TILES = 512
+
+_GRID = 32
+_CELLS = 4
+_ORIENTATIONS = 8
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+# tile -> [(landmark key, lat, lng, vector)]
+_tiles: "OrderedDict[str, list[tuple[str, float, float, array]]]" = OrderedDict()
+_stats = {"searches": 0, "matches": 0, "inserts": 0}
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        EMBED_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(EMBED_INDEX_PATH, check_same_thread=False)
+        conn.execute("pragma journal_mode=wal")
+        conn.executescript(
+            """
+            create table if not exists embeddings (
+                id integer primary key autoincrement,
+                tile text not null,
+                landmark_key text not null,
+                lat real not null,
+                lng real not null,
+                vector blob not null,
+                created_at real not null
+            );
+            create index if not exists embeddings_tile on embeddings (tile, landmark_key);
+            """
+        )
+        _conn = conn
+    return _conn
+
+
+def _normalize(values: list[float]) -> list[float]:
+    norm = math.sqrt(sum(v * v for v in values))
+    return [v / norm for v in values] if norm else values
+
+
+def _rebin(hist: list[int], bins: int) -> list[float]:
+    step = len(hist) // bins
+    return [float(sum(hist[i * step:(i + 1) * step])) for i in range(bins)]
+
+
+def embed(image_bytes: bytes) -> Optional[array]:
+    """L2-normalized descriptor of the image, or None if it can't be decoded. CPU-bound."""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img.draft("RGB", (_GRID * 4, _GRID * 4))
+            rgb = img.convert("RGB").resize((_GRID, _GRID), Image.Resampling.BILINEAR)
+    except Exception as e:
+        print(f"Warning: could not compute image embedding: {e}")
+        return None
+
+    # colour: hue / saturation / value histograms
+    hist = rgb.convert("HSV").histogram()
+    colour = _rebin(hist[0:256], 16) + _rebin(hist[256:512], 4) + _rebin(hist[512:768], 4)
+
+    # layout: 8x8 brightness thumbnail, mean-centred
+    gray = rgb.convert("L")
+    thumb = list(gray.resize((8, 8), Image.Resampling.BOX).getdata())
+    mean = sum(thumb) / len(thumb)
+    layout = [p - mean for p in thumb]
+
+    # edges: orientation histogram per cell of a 4x4 grid, weighted by gradient magnitude
+    px = list(gray.getdata())
+    cell = _GRID // _CELLS
+    edges = [0.0] * (_CELLS * _CELLS * _ORIENTATIONS)
+    for y in range(1, _GRID - 1):
+        row = y * _GRID
+        for x in range(1, _GRID - 1):
+            gx = px[row + x + 1] - px[row + x - 1]
+            gy = px[row + _GRID + x] - px[row - _GRID + x]
+            if gx == 0 and gy == 0:
+                continue
+            angle = math.atan2(gy, gx) % math.pi
+            bucket = min(int(angle / math.pi * _ORIENTATIONS), _ORIENTATIONS - 1)
+            edges[((y // cell) * _CELLS + x // cell) * _ORIENTATIONS + bucket] += math.hypot(gx, gy)
+
+    return array("f", _normalize(_normalize(colour) + _normalize(layout) + _normalize(edges)))
+
+
+def similarity(a: array, b: array) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+def _load_tile(tile: str) -> list[tuple[str, float, float, array]]:
+    # caller holds _lock
+    entries = _tiles.get(tile)
+    if entries is not None:
+        _tiles.move_to_end(tile)
+        return entries
+    rows = _connect().execute(
+        "select landmark_key, lat, lng, vector from embeddings where tile = ? order by id",
+        (tile,),
+    ).fetchall()
+    entries = []
+    for key, lat, lng, blob in rows:
+        vec = array("f")
+        vec.frombytes(blob)
+        entries.append((key, lat, lng, vec))
+    _tiles[tile] = entries
+    while len(_tiles) > EMBED_CACHED_TILES:
+        _tiles.popitem(last=False)
+    return entries
+
+
+def add(vec: array, lat: float, lng: float, landmark_key: str) -> None:
+    """Index the descriptor of a confidently identified photo."""
+    tile = geohash.encode(lat, lng, EMBED_TILE_PRECISION)
+    with _lock:
+        conn = _connect()
+        entries = _load_tile(tile)
+        with conn:
+            conn.execute(
+                "insert into embeddings (tile, landmark_key, lat, lng, vector, created_at) values (?, ?, ?, ?, ?, ?)",
+                (tile, landmark_key, lat, lng, vec.tobytes(), time.time()),
+            )
+            # keep only the newest vectors per landmark in this cell
+            conn.execute(
+                "delete from embeddings where tile = ? and landmark_key = ? and id not in ("
+                "select id from embeddings where tile = ? and landmark_key = ? order by id desc limit ?)",
+                (tile, landmark_key, tile, landmark_key, EMBED_MAX_PER_LANDMARK),
+            )
+        entries.append((landmark_key, lat, lng, vec))
+        same = [i for i, e in enumerate(entries) if e[0] == landmark_key]
+        for i in reversed(same[:-EMBED_MAX_PER_LANDMARK]):
+            del entries[i]
+        _stats["inserts"] += 1
+
+
+def rank(vec: array, entries: list[tuple[str, array]]) -> list[tuple[str, float]]:
+    """Best similarity per landmark key, highest first."""
+    best: dict[str, float] = {}
+    for key, other in entries:
+        score = similarity(vec, other)
+        if score > best.get(key, -1.0):
+            best[key] = score
+    return sorted(best.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def is_confident(ranked: list[tuple[str, float]]) -> bool:
+    """Top landmark clears EMBED_MATCH_THRESHOLD and beats the next one by EMBED_MATCH_MARGIN."""
+    if not ranked:
+        return False
+    runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+    return ranked[0][1] >= EMBED_MATCH_THRESHOLD and ranked[0][1] - runner_up >= EMBED_MATCH_MARGIN
+
+
+def search(vec: array, lat: float, lng: float) -> Optional[tuple[str, float]]:
+    """(landmark key, similarity) of a confident match among photos taken nearby, or None."""
+    tile = geohash.encode(lat, lng, EMBED_TILE_PRECISION)
+    with _lock:
+        candidates = [e for t in [tile, *geohash.neighbors(tile)] for e in _load_tile(t)]
+    _stats["searches"] += 1
+
+    nearby = [
+        (key, other) for key, o_lat, o_lng, other in candidates
+        if geohash.distance_m(lat, lng, o_lat, o_lng) <= EMBED_MAX_DISTANCE_M
+    ]
+    ranked = rank(vec, nearby)
+    if not is_confident(ranked):
+        return None
+    _stats["matches"] += 1
+    return ranked[0]
+
+
+def stats() -> dict[str, int]:
+    with _lock:
+        conn = _connect()
+        n_vectors = conn.execute("select count(*) from embeddings").fetchone()[0]
+        n_landmarks = conn.execute("select count(distinct landmark_key) from embeddings").fetchone()[0]
+        cached = len(_tiles)
+    return {"vectors": n_vectors, "landmarks": n_landmarks, "cached_tiles": cached, **_stats}
+
+
+def close() -> None:
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+        _tiles.clear()
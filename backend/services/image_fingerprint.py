@@ -0,0 +1,93 @@
+# services/image_fingerprint.py
+# Image fingerprints for the identify cache: a SHA-256 of the full content for
+# exact matches, and a 64-bit difference hash (dHash) for near-duplicates.
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from PIL import Image
+
+from backend.services import geohash
+
+# max differing bits between two dHashes to count as the same shot
+PHASH_MAX_HAMMING = int(os.getenv("PHASH_MAX_HAMMING", "6"))
+# max distance between the two photos' GPS fixes
+PHASH_MAX_DISTANCE_M = int(os.getenv("PHASH_MAX_DISTANCE_M", "150"))
+# only reuse results this recent, and keep at most this many entries
+PHASH_TTL_S = int(os.getenv("PHASH_TTL_S", str(60 * 60)))
+PHASH_MAX_ENTRIES = int(os.getenv("PHASH_MAX_ENTRIES", "5000"))
+
+_HASH_SIZE = 8
+
+
+def content_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def dhash(image_bytes: bytes) -> Optional[int]:
+    """64-bit difference hash, or None if the image can't be decoded. CPU-bound."""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            # let the JPEG decoder downscale while decoding, much cheaper than a full decode
+            img.draft("L", (_HASH_SIZE * 8, _HASH_SIZE * 8))
+            small = img.convert("L").resize((_HASH_SIZE + 1, _HASH_SIZE), Image.Resampling.LANCZOS)
+            pixels = list(small.getdata())
+    except Exception as e:
+        print(f"Warning: could not compute image dhash: {e}")
+        return None
+
+    bits = 0
+    for row in range(_HASH_SIZE):
+        offset = row * (_HASH_SIZE + 1)
+        for col in range(_HASH_SIZE):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class PerceptualIndex:
+    """
+    Recent (dhash, location, profile) -> identify cache key entries.
+
+    A linear scan over a bounded window is plenty at this size; each compare is
+    one XOR + popcount.
+    """
+
+    def __init__(self, max_entries: int = PHASH_MAX_ENTRIES) -> None:
+        # (inserted_at, dhash, lat, lng, profile_key, cache_key)
+        self._entries: deque[tuple[float, int, float, float, str, str]] = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def add(self, phash: int, lat: float, lng: float, profile_key: str, cache_key: str) -> None:
+        with self._lock:
+            self._entries.append((time.time(), phash, lat, lng, profile_key, cache_key))
+
+    def find(self, phash: int, lat: float, lng: float, profile_key: str) -> Optional[str]:
+        """Cache key of the closest recent near-duplicate shot from the same spot, if any."""
+        cutoff = time.time() - PHASH_TTL_S
+        best: Optional[tuple[int, str]] = None
+        with self._lock:
+            while self._entries and self._entries[0][0] < cutoff:
+                self._entries.popleft()
+            entries = list(self._entries)
+
+        for _, other, o_lat, o_lng, o_profile, cache_key in reversed(entries):
+            if o_profile != profile_key:
+                continue
+            dist = hamming(phash, other)
+            if dist > PHASH_MAX_HAMMING or (best and dist >= best[0]):
+                continue
+            if geohash.distance_m(lat, lng, o_lat, o_lng) > PHASH_MAX_DISTANCE_M:
+                continue
+            best = (dist, cache_key)
+        return best[1] if best else None
+
+
+perceptual_index = PerceptualIndex()
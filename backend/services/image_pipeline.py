@@ -0,0 +1,124 @@
+# services/image_pipeline.py
+# CPU-side preprocessing for uploaded photos before they go to Gemini and storage:
+# decode, downscale, apply EXIF orientation, drop metadata, re-encode as JPEG.
+import asyncio
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Union
+
+from PIL import Image, ImageOps
+
+# longest edge after downscaling; MEDIA_RESOLUTION_MEDIUM doesn't benefit from more
+TARGET_LONG_EDGE = int(os.getenv("IMAGE_TARGET_LONG_EDGE", "1536"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+# Pillow releases the GIL while decoding/resizing/encoding, so threads are enough
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image")
+
+_STAGES = ("decode", "resize", "orient", "encode")
+_stats_lock = threading.Lock()
+_totals: dict[str, Any] = {
+    "images": 0,
+    "failures": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    **{f"{stage}_ms": 0.0 for stage in _STAGES},
+}
+
+
+def _normalize(image: Union[bytes, BinaryIO]) -> tuple[bytes, dict[str, Any]]:
+    timings: dict[str, float] = {}
+
+    if isinstance(image, bytes):
+        bytes_in = len(image)
+        image = io.BytesIO(image)
+    else:
+        # an upload's spooled file: decode straight from it instead of copying it to bytes
+        image.seek(0, io.SEEK_END)
+        bytes_in = image.tell()
+        image.seek(0)
+
+    t = time.perf_counter()
+    img = Image.open(image)
+    # JPEG can decode straight at 1/2, 1/4 or 1/8 scale as long as it stays >= target
+    img.draft("RGB", (TARGET_LONG_EDGE, TARGET_LONG_EDGE))
+    img.load()
+    timings["decode"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    if img.mode in ("RGBA", "LA", "P"):
+        # flatten transparency onto white instead of black
+        rgba = img.convert("RGBA")
+        flat = Image.new("RGB", rgba.size, (255, 255, 255))
+        flat.paste(rgba, mask=rgba.getchannel("A"))
+        # keep exif so the orientation step below still sees it
+        flat.info = img.info
+        img = flat
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    if max(img.size) > TARGET_LONG_EDGE:
+        img.thumbnail((TARGET_LONG_EDGE, TARGET_LONG_EDGE), Image.Resampling.BICUBIC)
+    timings["resize"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    # after the resize so the rotation touches fewer pixels
+    img = ImageOps.exif_transpose(img)
+    timings["orient"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    out = io.BytesIO()
+    # saving without exif= drops EXIF (incl. GPS) and other metadata
+    img.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    timings["encode"] = time.perf_counter() - t
+
+    data = out.getvalue()
+    stats = {
+        "bytes_in": bytes_in,
+        "bytes_out": len(data),
+        "width": img.width,
+        "height": img.height,
+        **{f"{stage}_ms": round(timings[stage] * 1000, 2) for stage in _STAGES},
+    }
+    return data, stats
+
+
+async def normalize_image(image: Union[bytes, BinaryIO]) -> tuple[bytes, str, dict[str, Any]]:
+    """
+    Preprocess an uploaded photo (bytes, or a seekable file such as the
+    upload's spooled buffer) in the image worker pool.
+
+    Returns (jpeg bytes, "image/jpeg", per-stage stats). Raises ValueError if
+    the bytes can't be decoded as an image.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        data, stats = await loop.run_in_executor(_executor, _normalize, image)
+    except Exception as e:
+        with _stats_lock:
+            _totals["failures"] += 1
+        raise ValueError(f"Could not process image: {e}") from e
+
+    with _stats_lock:
+        _totals["images"] += 1
+        _totals["bytes_in"] += stats["bytes_in"]
+        _totals["bytes_out"] += stats["bytes_out"]
+        for stage in _STAGES:
+            _totals[f"{stage}_ms"] += stats[f"{stage}_ms"]
+    return data, "image/jpeg", stats
+
+
+def stats() -> dict[str, Any]:
+    with _stats_lock:
+        totals = dict(_totals)
+    n = totals["images"] or 1
+    totals["avg_ms"] = {stage: round(totals[f"{stage}_ms"] / n, 2) for stage in _STAGES}
+    totals["size_ratio"] = round(totals["bytes_out"] / totals["bytes_in"], 3) if totals["bytes_in"] else None
+    return totals
+
+
+def shutdown() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,11 @@
+# services/latency.py
+# Percentiles for the rolling latency samples behind the /metrics endpoints.
+from typing import Iterable, Optional
+
+
+def percentile(values: Iterable[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile (pct in 0..1) rounded to 0.1, or None without samples."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct))], 1)
@@ -0,0 +1,132 @@
+# services/place_index.py
+# Persistent local index of every PlaceSuggestion fetched from Google Places,
+# bucketed by geohash tile with a freshness timestamp per (place type, tile).
+# Nearby queries are answered from here when the caller's tile is fresh.
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from backend.schemas.identify import PlaceSuggestion
+
+PLACE_INDEX_PATH = Path(os.getenv("PLACE_INDEX_PATH", "data/place_index.sqlite3"))
+# how long a tile's Places results are trusted (ratings drift)
+PLACE_INDEX_TTL_S = int(os.getenv("PLACE_INDEX_TTL_S", str(6 * 60 * 60)))
+# open_now goes stale much faster; older than this it is served as unknown (None)
+PLACE_OPEN_NOW_TTL_S = int(os.getenv("PLACE_OPEN_NOW_TTL_S", str(15 * 60)))
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        PLACE_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(PLACE_INDEX_PATH, check_same_thread=False)
+        conn.execute("pragma journal_mode=wal")
+        conn.executescript(
+            """
+            create table if not exists tiles (
+                place_type text not null,
+                tile text not null,
+                fetched_at real not null,
+                radius_m integer not null,
+                primary key (place_type, tile)
+            );
+            create table if not exists places (
+                place_type text not null,
+                tile text not null,
+                place_key text not null,
+                lat real,
+                lng real,
+                data text not null,
+                primary key (place_type, tile, place_key)
+            );
+            """
+        )
+        _conn = conn
+    return _conn
+
+
+def _place_key(place: PlaceSuggestion) -> str:
+    # same identity rule as places_service._dedupe_places
+    return place.place_id or f"{place.name}:{place.address}"
+
+
+def fresh_tiles(place_type: str, tiles: list[str], min_radius_m: int) -> set[str]:
+    """
+    The subset of tiles fetched for this place type within PLACE_INDEX_TTL_S
+    with a search radius of at least min_radius_m.
+    """
+    if not tiles:
+        return set()
+    cutoff = time.time() - PLACE_INDEX_TTL_S
+    marks = ",".join("?" * len(tiles))
+    with _lock:
+        rows = _connect().execute(
+            f"select tile from tiles where place_type = ? and fetched_at >= ? and radius_m >= ?"
+            f" and tile in ({marks})",
+            (place_type, cutoff, min_radius_m, *tiles),
+        ).fetchall()
+    return {r[0] for r in rows}
+
+
+def store_tile(place_type: str, tile: str, radius_m: int, places: list[PlaceSuggestion]) -> None:
+    """Replace a tile's places with a fresh fetch and mark it fresh."""
+    rows = [
+        (place_type, tile, _place_key(p), p.lat, p.lng, p.model_dump_json(exclude_none=True))
+        for p in places
+    ]
+    with _lock:
+        conn = _connect()
+        with conn:
+            conn.execute("delete from places where place_type = ? and tile = ?", (place_type, tile))
+            conn.executemany("insert or replace into places values (?, ?, ?, ?, ?, ?)", rows)
+            conn.execute(
+                "insert or replace into tiles values (?, ?, ?, ?)",
+                (place_type, tile, time.time(), radius_m),
+            )
+
+
+def places_in_tiles(place_type: str, tiles: list[str]) -> list[PlaceSuggestion]:
+    """Indexed places of these tiles; open_now is dropped from tiles fetched over PLACE_OPEN_NOW_TTL_S ago."""
+    if not tiles:
+        return []
+    marks = ",".join("?" * len(tiles))
+    with _lock:
+        rows = _connect().execute(
+            f"select p.data, t.fetched_at from places p join tiles t"
+            f" on t.place_type = p.place_type and t.tile = p.tile"
+            f" where p.place_type = ? and p.tile in ({marks})",
+            (place_type, *tiles),
+        ).fetchall()
+    open_cutoff = time.time() - PLACE_OPEN_NOW_TTL_S
+    places = []
+    for data, fetched_at in rows:
+        place = PlaceSuggestion.model_validate_json(data)
+        if fetched_at < open_cutoff:
+            # a place that closed since the fetch must not be ranked or shown as open
+            place.open_now = None
+        places.append(place)
+    return places
+
+
+def stats() -> dict[str, int]:
+    cutoff = time.time() - PLACE_INDEX_TTL_S
+    with _lock:
+        conn = _connect()
+        n_places = conn.execute("select count(*) from places").fetchone()[0]
+        n_tiles = conn.execute("select count(*) from tiles").fetchone()[0]
+        n_fresh = conn.execute("select count(*) from tiles where fetched_at >= ?", (cutoff,)).fetchone()[0]
+    return {"places": n_places, "tiles": n_tiles, "fresh_tiles": n_fresh}
+
+
+def close() -> None:
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
@@ -1,25 +1,16 @@
+import asyncio
 import os
-import math
 from typing import Iterable
 
-import httpx
-
 from backend.schemas.identify import PlaceSuggestion
-from backend.services.cache import get as cache_get, set as cache_set
+from backend.services.http_clients import get_client
+from backend.services import geohash, place_index, tile_cache
 
 PLACES_BASE_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
 
-
-def _haversine_meters(lat1: float, lng1: float, lat2: float, lng2: float) -> int:
-    # Returns distance in meters between two lat/lng points.
-    r = 6371000.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lng2 - lng1)
-    a = math.sin(dphi / 2.0) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2.0) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return int(r * c)
+# geohash precision of the Places tiles (6 ~ 1.2 km x 0.6 km at the equator)
+PLACES_TILE_PRECISION = int(os.getenv("PLACES_TILE_PRECISION", "6"))
+PLACES_TILE_TTL_S = 60 * 10
 
 
 def _score_place(place: PlaceSuggestion, radius_m: int) -> float:
@@ -43,6 +34,13 @@ def _dedupe_places(items: Iterable[PlaceSuggestion]) -> list[PlaceSuggestion]:
     return result
 
 
+def _fetch_radius_m(tile: str, radius_m: int) -> int:
+    # searches this wide from the centers of a tile and its 8 neighbors together
+    # cover the radius around any point in the tile: the center nearest to a
+    # target is never farther than max(radius, tile half-diagonal)
+    return max(radius_m, geohash.cell_radius_m(tile))
+
+
 async def _fetch_places(
     lat: float,
     lng: float,
@@ -54,22 +52,81 @@ async def _fetch_places(
     if not api_key:
         return []
 
-    cache_key = f"places:{place_type}:{round(lat,4)}:{round(lng,4)}:{radius_m}"
-    cached = cache_get(cache_key)
-    if cached:
-        return cached
+    tile = geohash.encode(lat, lng, PLACES_TILE_PRECISION)
+    tiles = [tile, *geohash.neighbors(tile)]
+    fetch_radius_m = _fetch_radius_m(tile, radius_m)
+    fresh = await asyncio.to_thread(place_index.fresh_tiles, place_type, tiles, fetch_radius_m)
+    for _ in fresh:
+        tile_cache.record("places", PLACES_TILE_PRECISION, "index")
+
+    # Each tile is searched at about the requested radius, so the 20-result cap
+    # of a search applies to a small area and dense neighbourhoods keep their
+    # close places. Cold tiles come from the shared tile cache (another worker
+    # fetched them) or one Places request each, all in flight at once.
+    cold = [t for t in tiles if t not in fresh]
+    fetched = await asyncio.gather(
+        *(_fetch_tile(api_key, place_type, t, fetch_radius_m) for t in cold),
+        return_exceptions=True,
+    )
+    for t, outcome in zip(cold, fetched):
+        if isinstance(outcome, BaseException):
+            if t == tile:
+                raise outcome
+            # a missing neighbor only costs recall near the tile's edge
+            print(f"Warning: Places fetch failed for neighbor tile {t}: {outcome}")
+            continue
+        fresh.add(t)
+
+    candidates = await asyncio.to_thread(place_index.places_in_tiles, place_type, sorted(fresh))
+
+    # re-measure and rank relative to the caller's exact position
+    places: list[PlaceSuggestion] = []
+    for place in _dedupe_places(candidates):
+        if place.lat is None or place.lng is None:
+            continue
+        distance_meters = geohash.distance_m(lat, lng, place.lat, place.lng)
+        if distance_meters > radius_m:
+            continue
+        places.append(place.model_copy(update={"distance_meters": distance_meters}))
+
+    return sorted(places, key=lambda p: _score_place(p, radius_m), reverse=True)[:max_results]
+
 
+async def _fetch_tile(api_key: str, place_type: str, tile: str, fetch_radius_m: int) -> None:
+    tile_places = await tile_cache.get_or_fetch(
+        "places",
+        PLACES_TILE_PRECISION,
+        tile,
+        f"{place_type}:{fetch_radius_m}",
+        lambda: _request_tile(api_key, place_type, tile, fetch_radius_m),
+        ttl_seconds=PLACES_TILE_TTL_S,
+    )
+    await asyncio.to_thread(place_index.store_tile, place_type, tile, fetch_radius_m, tile_places)
+
+
+async def _request_tile(
+    api_key: str,
+    place_type: str,
+    tile: str,
+    fetch_radius_m: int,
+) -> list[PlaceSuggestion]:
+    """Fetch one tile from Places, searching from the tile center."""
+    lat, lng = geohash.center(tile)
     params = {
         "key": api_key,
         "location": f"{lat},{lng}",
-        "radius": radius_m,
+        "radius": fetch_radius_m,
         "type": place_type,
     }
 
-    async with httpx.AsyncClient(timeout=8.0) as client:
-        resp = await client.get(PLACES_BASE_URL, params=params)
-        resp.raise_for_status()
-        data = resp.json()
+    resp = await get_client("places").get(PLACES_BASE_URL, params=params)
+    resp.raise_for_status()
+    data = resp.json()
+    # quota / key / request errors come back as HTTP 200 with no results; an
+    # empty tile must not be indexed or cached as fresh from one of those
+    status = data.get("status")
+    if status not in ("OK", "ZERO_RESULTS"):
+        raise RuntimeError(f"Places API returned {status}: {data.get('error_message', '')}")
 
     results = data.get("results", [])
     places: list[PlaceSuggestion] = []
@@ -80,7 +137,7 @@ async def _fetch_places(
         if place_lat is None or place_lng is None:
             distance_meters = None
         else:
-            distance_meters = _haversine_meters(lat, lng, place_lat, place_lng)
+            distance_meters = geohash.distance_m(lat, lng, place_lat, place_lng)
 
         place_id = item.get("place_id")
         places.append(
@@ -99,11 +156,24 @@ async def _fetch_places(
             )
         )
 
-    places = sorted(places, key=lambda p: _score_place(p, radius_m), reverse=True)[:max_results]
-    cache_set(cache_key, places, ttl_seconds=60 * 10)
+    # keep everything Places returned; callers filter and rank per request
     return places
 
 
+async def _fetch_place_types(
+    lat: float,
+    lng: float,
+    place_types: list[str],
+    radius_m: int,
+    max_results: int,
+) -> list[PlaceSuggestion]:
+    # one request per place type, all in flight at once
+    batches = await asyncio.gather(
+        *(_fetch_places(lat, lng, place_type, radius_m, max_results) for place_type in place_types)
+    )
+    return [place for batch in batches for place in batch]
+
+
 async def get_nearby_landmarks(
     lat: float,
     lng: float,
@@ -111,9 +181,7 @@ async def get_nearby_landmarks(
     max_results: int = 6,
 ) -> list[PlaceSuggestion]:
     place_types = ["tourist_attraction", "museum", "park"]
-    collected: list[PlaceSuggestion] = []
-    for place_type in place_types:
-        collected.extend(await _fetch_places(lat, lng, place_type, radius_m, max_results))
+    collected = await _fetch_place_types(lat, lng, place_types, radius_m, max_results)
     deduped = _dedupe_places(collected)
     ranked = sorted(deduped, key=lambda p: _score_place(p, radius_m), reverse=True)
     return ranked[:max_results]
@@ -126,9 +194,7 @@ async def get_nearby_food(
     max_results: int = 6,
 ) -> list[PlaceSuggestion]:
     place_types = ["restaurant", "cafe", "bakery"]
-    collected: list[PlaceSuggestion] = []
-    for place_type in place_types:
-        collected.extend(await _fetch_places(lat, lng, place_type, radius_m, max_results))
+    collected = await _fetch_place_types(lat, lng, place_types, radius_m, max_results)
     deduped = _dedupe_places(collected)
     ranked = sorted(deduped, key=lambda p: _score_place(p, radius_m), reverse=True)
     return ranked[:max_results]
@@ -0,0 +1,78 @@
+# services/profile_cache.py
+# Read-through cache for user profiles (age bracket + interests), shared by
+# /identify and /profile. Profiles change rarely, so entries live for
+# PROFILE_CACHE_TTL_S; users without a profile are cached too, for a shorter
+# time. Writes go through update_profile, or call invalidate() when the row
+# was changed elsewhere (e.g. by the app writing to Supabase directly).
+import os
+from typing import Any, Optional
+
+from backend.db import queries
+from backend.services import singleflight
+from backend.services.tiered_cache import get as cache_get, set as cache_set, delete as cache_delete
+
+PROFILE_CACHE_TTL_S = int(os.getenv("PROFILE_CACHE_TTL_S", "300"))
+PROFILE_NEGATIVE_TTL_S = int(os.getenv("PROFILE_NEGATIVE_TTL_S", "60"))
+
+# stored for users without a profile, since a cached None reads as a miss
+_MISSING = {"missing": True}
+
+_stats = {"hits": 0, "negative_hits": 0, "misses": 0, "errors": 0, "invalidations": 0}
+
+
+def _key(user_id: str) -> str:
+    return f"profile:{user_id}"
+
+
+async def _load(user_id: str) -> Optional[dict[str, Any]]:
+    profile = await queries.fetch_profile(user_id)
+    if profile is None:
+        await cache_set(_key(user_id), _MISSING, ttl_seconds=PROFILE_NEGATIVE_TTL_S)
+    else:
+        await cache_set(_key(user_id), profile, ttl_seconds=PROFILE_CACHE_TTL_S)
+    return profile
+
+
+async def get_profile(user_id: str) -> Optional[dict[str, Any]]:
+    """Profile dict as returned by queries.get_profile, or None if the user has none."""
+    cached = await cache_get(_key(user_id))
+    if cached is not None:
+        if cached == _MISSING:
+            _stats["negative_hits"] += 1
+            return None
+        _stats["hits"] += 1
+        return dict(cached)
+
+    _stats["misses"] += 1
+    try:
+        # concurrent first requests for one user share one query
+        profile = await singleflight.do(_key(user_id), lambda: _load(user_id))
+    except Exception as e:
+        # lookup failed: don't cache anything, the caller falls back to defaults
+        _stats["errors"] += 1
+        print(f"ERROR getting profile: {e}")
+        return None
+    return dict(profile) if profile is not None else None
+
+
+async def update_profile(user_id: str, fields: dict[str, Any]) -> Optional[dict[str, Any]]:
+    """Write profile fields to the database and the cache together."""
+    profile = await queries.update_profile(user_id, fields)
+    if profile is not None:
+        await cache_set(_key(user_id), profile, ttl_seconds=PROFILE_CACHE_TTL_S)
+    else:
+        await invalidate(user_id)
+    return profile
+
+
+async def invalidate(user_id: str) -> None:
+    _stats["invalidations"] += 1
+    await cache_delete(_key(user_id))
+
+
+def stats() -> dict[str, Any]:
+    lookups = _stats["hits"] + _stats["negative_hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round((_stats["hits"] + _stats["negative_hits"]) / lookups, 3) if lookups else None,
+    }
@@ -0,0 +1,311 @@
+# services/scan_jobs.py
+# Durable background pipeline for post-identify work: city lookup, scan insert,
+# image upload and image URL patch. Jobs are written to a local directory before
+# the identify response goes out, so they survive a restart and are retried
+# with exponential backoff.
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from backend.db import queries
+from backend.services.geocode_service import reverse_geocode
+from backend.services.wrapped_service import invalidate_wrapped
+
+SCAN_JOB_DIR = Path(os.getenv("SCAN_JOB_DIR", "data/scan_jobs"))
+SCAN_JOB_WORKERS = int(os.getenv("SCAN_JOB_WORKERS", "2"))
+SCAN_JOB_MAX_ATTEMPTS = int(os.getenv("SCAN_JOB_MAX_ATTEMPTS", "8"))
+BACKOFF_BASE_S = 2.0
+BACKOFF_MAX_S = 300.0
+POLL_INTERVAL_S = 1.0
+# a claimed job untouched this long is presumed orphaned by a dead process
+SCAN_JOB_CLAIM_TIMEOUT_S = int(os.getenv("SCAN_JOB_CLAIM_TIMEOUT_S", "600"))
+
+# steps run in order; each is recorded in the job file once it succeeds
+STEPS = ("city", "insert", "upload", "patch")
+
+# Every process shares SCAN_JOB_DIR. A worker claims a job by renaming its file
+# into claimed/, which is atomic, so exactly one worker in any process runs it.
+# The claimed file is rewritten after every step; one left untouched for
+# SCAN_JOB_CLAIM_TIMEOUT_S goes back to the queue.
+_workers: list[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+# job ids this process holds a claim on
+_held: set[str] = set()
+_stats = {"enqueued": 0, "completed": 0, "retries": 0, "failed": 0}
+
+
+def _job_path(job_id: str) -> Path:
+    return SCAN_JOB_DIR / f"{job_id}.json"
+
+
+def _claimed_path(job_id: str) -> Path:
+    return SCAN_JOB_DIR / "claimed" / f"{job_id}.json"
+
+
+def _image_path(job_id: str) -> Path:
+    return SCAN_JOB_DIR / f"{job_id}.img"
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _save_job(job: dict[str, Any]) -> None:
+    # progress of a job this worker holds; also refreshes the claim
+    _write_atomic(_claimed_path(job["job_id"]), json.dumps(job).encode())
+
+
+def _release_job(job: dict[str, Any]) -> None:
+    # back to the queue, e.g. to wait out a retry backoff
+    _save_job(job)
+    os.replace(_claimed_path(job["job_id"]), _job_path(job["job_id"]))
+
+
+def new_scan_id() -> str:
+    return str(uuid.uuid4())
+
+
+def enqueue_scan(
+    scan_id: str,
+    user_id: str,
+    landmark_name: str,
+    description: str,
+    lat: float,
+    lng: float,
+    tags: list[str],
+    timestamp: datetime,
+    image_bytes: Optional[bytes] = None,
+    mime_type: str = "image/jpeg",
+    city: Optional[str] = None,
+    inserted: bool = False,
+) -> None:
+    """
+    Persist a post-identify job to disk and wake a worker. Blocking file IO.
+    inserted=True means the scan row already exists (bulk insert), so only the
+    image upload and URL patch are left.
+    """
+    SCAN_JOB_DIR.mkdir(parents=True, exist_ok=True)
+    job_id = scan_id
+    if image_bytes:
+        _write_atomic(_image_path(job_id), image_bytes)
+
+    done = []
+    if city or inserted:
+        done.append("city")
+    if inserted:
+        done.append("insert")
+    if not image_bytes:
+        done.extend(["upload", "patch"])
+
+    _write_atomic(_job_path(job_id), json.dumps({
+        "job_id": job_id,
+        "scan_id": scan_id,
+        "user_id": user_id,
+        "landmark_name": landmark_name,
+        "description": description,
+        "lat": lat,
+        "lng": lng,
+        "tags": tags,
+        "timestamp": timestamp.isoformat(),
+        "city": city,
+        "mime_type": mime_type,
+        "image_url": None,
+        "done": done,
+        "attempts": 0,
+        "next_attempt_at": 0.0,
+        "last_error": None,
+    }).encode())
+    _stats["enqueued"] += 1
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def _run_step(step: str, job: dict[str, Any]) -> None:
+    if step == "city":
+        try:
+            job["city"] = await reverse_geocode(job["lat"], job["lng"])
+        except Exception as e:
+            # a scan without a city is still worth saving
+            print(f"Warning: reverse geocode failed for scan {job['scan_id']}: {e}")
+        return
+
+    if step == "insert":
+        record = await queries.save_scan(
+            user_id=job["user_id"],
+            landmark_name=job["landmark_name"],
+            description=job["description"],
+            lat=job["lat"],
+            lng=job["lng"],
+            tags=job["tags"],
+            timestamp=datetime.fromisoformat(job["timestamp"]),
+            image_url=None,
+            city=job["city"],
+            scan_id=job["scan_id"],
+        )
+        if not record:
+            raise RuntimeError("save_scan returned nothing")
+        await invalidate_wrapped(job["user_id"], datetime.fromisoformat(job["timestamp"]))
+        return
+
+    if step == "upload":
+        image_bytes = await asyncio.to_thread(_image_path(job["job_id"]).read_bytes)
+        url = await queries.upload_scan_image(
+            user_id=job["user_id"],
+            image_bytes=image_bytes,
+            mime_type=job["mime_type"],
+            scan_id=job["scan_id"],
+        )
+        if not url:
+            raise RuntimeError("upload_scan_image returned nothing")
+        job["image_url"] = url
+        return
+
+    if step == "patch":
+        ok = await queries.update_scan_image_url(job["scan_id"], job["image_url"], job["user_id"])
+        if not ok:
+            raise RuntimeError("update_scan_image_url updated nothing")
+        # recent scans in the snapshot should pick up the image
+        await invalidate_wrapped(job["user_id"], datetime.fromisoformat(job["timestamp"]))
+        return
+
+
+def _finish(job: dict[str, Any], failed: bool) -> None:
+    job_id = job["job_id"]
+    if failed:
+        # keep the job for inspection, out of the way of the workers
+        failed_dir = SCAN_JOB_DIR / "failed"
+        failed_dir.mkdir(exist_ok=True)
+        _write_atomic(failed_dir / f"{job_id}.json", json.dumps(job).encode())
+        if _image_path(job_id).exists():
+            os.replace(_image_path(job_id), failed_dir / f"{job_id}.img")
+    else:
+        _image_path(job_id).unlink(missing_ok=True)
+    _claimed_path(job_id).unlink(missing_ok=True)
+
+
+async def _process(job: dict[str, Any]) -> None:
+    for step in STEPS:
+        if step in job["done"]:
+            continue
+        try:
+            await _run_step(step, job)
+        except Exception as e:
+            job["attempts"] += 1
+            job["last_error"] = f"{step}: {e}"
+            if job["attempts"] >= SCAN_JOB_MAX_ATTEMPTS:
+                print(f"ERROR scan job {job['job_id']} gave up after {job['attempts']} attempts: {job['last_error']}")
+                _stats["failed"] += 1
+                _finish(job, failed=True)
+                return
+            delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** (job["attempts"] - 1)))
+            job["next_attempt_at"] = time.time() + delay
+            _stats["retries"] += 1
+            _release_job(job)
+            return
+        job["done"].append(step)
+        _save_job(job)
+
+    _stats["completed"] += 1
+    _finish(job, failed=False)
+
+
+def _requeue_stale_claims() -> None:
+    now = time.time()
+    for path in (SCAN_JOB_DIR / "claimed").glob("*.json"):
+        try:
+            # ctime moves on the claiming rename as well as on every rewrite
+            if now - path.stat().st_ctime > SCAN_JOB_CLAIM_TIMEOUT_S:
+                os.rename(path, _job_path(path.stem))
+                print(f"Warning: scan job {path.stem} was claimed by a worker that went away, requeued")
+        except FileNotFoundError:
+            # finished, or requeued by another process meanwhile
+            continue
+
+
+def _next_due_job() -> Optional[dict[str, Any]]:
+    _requeue_stale_claims()
+    now = time.time()
+    paths = []
+    for path in SCAN_JOB_DIR.glob("*.json"):
+        try:
+            paths.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            continue
+    for _, path in sorted(paths):
+        try:
+            job = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if job.get("next_attempt_at", 0) > now:
+            continue
+        try:
+            os.rename(path, _claimed_path(path.stem))
+        except FileNotFoundError:
+            # another worker claimed it first
+            continue
+        _held.add(job["job_id"])
+        return job
+    return None
+
+
+async def _worker() -> None:
+    assert _wakeup is not None
+    while True:
+        job = await asyncio.to_thread(_next_due_job)
+        if job is None:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=POLL_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        try:
+            await _process(job)
+        except Exception as e:
+            # the claim times out and the job is retried
+            print(f"ERROR scan job {job.get('job_id')} crashed: {e}")
+        # on cancellation the id stays held, so shutdown() requeues the job
+        _held.discard(job["job_id"])
+
+
+async def startup() -> None:
+    """Start workers; jobs left on disk by a previous process are picked up too."""
+    global _wakeup
+    (SCAN_JOB_DIR / "claimed").mkdir(parents=True, exist_ok=True)
+    _wakeup = asyncio.Event()
+    for _ in range(SCAN_JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+
+
+async def shutdown() -> None:
+    for task in _workers:
+        task.cancel()
+    for task in _workers:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _workers.clear()
+    # jobs interrupted mid-way go back to the queue with the steps done so far
+    for job_id in list(_held):
+        try:
+            os.replace(_claimed_path(job_id), _job_path(job_id))
+        except FileNotFoundError:
+            pass
+    _held.clear()
+
+
+def stats() -> dict[str, Any]:
+    pending = len(list(SCAN_JOB_DIR.glob("*.json"))) if SCAN_JOB_DIR.exists() else 0
+    claimed = len(list((SCAN_JOB_DIR / "claimed").glob("*.json"))) if SCAN_JOB_DIR.exists() else 0
+    return {"pending": pending, "claimed": claimed, **_stats}
@@ -0,0 +1,63 @@
+# services/singleflight.py
+# Request coalescing: concurrent calls with the same key share one execution.
+# Keys are the cache keys the identify, places and events services already build.
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+_IN_FLIGHT: dict[str, asyncio.Task] = {}
+
+# per-namespace counters (namespace = key prefix before the first ":")
+_STATS: dict[str, dict[str, int]] = {}
+
+
+def _bump(key: str, field: str) -> None:
+    ns = key.split(":", 1)[0]
+    counters = _STATS.setdefault(ns, {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0, "timeouts": 0})
+    counters[field] += 1
+
+
+def _finish(key: str, task: asyncio.Task) -> None:
+    if _IN_FLIGHT.get(key) is task:
+        _IN_FLIGHT.pop(key, None)
+    # mark the exception retrieved even if every waiter already gave up
+    if not task.cancelled():
+        task.exception()
+
+
+async def do(key: str, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+    """
+    Run fn() once for all concurrent callers with the same key.
+
+    The first caller starts the work; callers arriving while it is in flight
+    wait on the same task and get its result or exception. A caller that hits
+    `timeout` gets asyncio.TimeoutError, but the shared work keeps running for
+    the other waiters.
+    """
+    _bump(key, "calls")
+    task = _IN_FLIGHT.get(key)
+    if task is None:
+        _bump(key, "executions")
+        task = asyncio.create_task(fn())
+        _IN_FLIGHT[key] = task
+        task.add_done_callback(lambda t: _finish(key, t))
+    else:
+        _bump(key, "coalesced")
+
+    try:
+        # shield so one caller timing out or disconnecting doesn't cancel the others
+        return await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+    except asyncio.TimeoutError:
+        _bump(key, "timeouts")
+        raise
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        _bump(key, "errors")
+        raise
+
+
+def stats() -> dict[str, Any]:
+    return {
+        "in_flight": len(_IN_FLIGHT),
+        "namespaces": {ns: dict(counters) for ns, counters in _STATS.items()},
+    }
@@ -0,0 +1,289 @@
+# services/tiered_cache.py
+# Two-level cache: the in-process LRU (services/cache.py) as L1 in front of a
+# shared L2 backend (Redis in production) so several workers/instances reuse
+# each other's Gemini, Places and Events results.
+import asyncio
+import json
+import os
+import time
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Optional
+
+from pydantic import BaseModel
+
+from backend.schemas.identify import (
+    IdentifyResponse, PlaceSuggestion, EventSuggestion, LandmarkRecord, LandmarkPersonalization,
+)
+from backend.schemas.wrapped import WrappedResponse
+from backend.schemas.chat import ChatSession
+from backend.services import cache as l1
+
+REDIS_URL = os.getenv("REDIS_URL")
+KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "ll:")
+INVALIDATION_CHANNEL = f"{KEY_PREFIX}invalidate"
+
+# with an L2, L1 copies never outlive this, so a stale entry in another worker self-heals
+L1_MAX_TTL_S = int(os.getenv("CACHE_L1_MAX_TTL_S", "300"))
+
+# values above this size are zlib-compressed before going to L2
+COMPRESS_MIN_BYTES = 1024
+
+# models that can round-trip through L2
+_MODELS: dict[str, type[BaseModel]] = {
+    "IdentifyResponse": IdentifyResponse,
+    "PlaceSuggestion": PlaceSuggestion,
+    "EventSuggestion": EventSuggestion,
+    "LandmarkRecord": LandmarkRecord,
+    "LandmarkPersonalization": LandmarkPersonalization,
+    "WrappedResponse": WrappedResponse,
+    "ChatSession": ChatSession,
+}
+
+# identifies this worker so it ignores its own invalidation messages
+_WORKER_ID = uuid.uuid4().hex
+
+
+class CacheBackend(ABC):
+    """Interface for a shared L2 cache. Values are already-serialized bytes."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def publish_invalidation(self, message: str) -> None:
+        ...
+
+    @abstractmethod
+    def listen_invalidations(self) -> AsyncIterator[str]:
+        """Async iterator of invalidation messages published by any worker."""
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBackend(CacheBackend):
+    def __init__(self, url: str) -> None:
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(KEY_PREFIX + key)
+
+    async def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        await self._redis.set(KEY_PREFIX + key, value, ex=ttl_seconds)
+
+    async def delete(self, key: str) -> None:
+        await self._redis.delete(KEY_PREFIX + key)
+
+    async def publish_invalidation(self, message: str) -> None:
+        await self._redis.publish(INVALIDATION_CHANNEL, message)
+
+    async def listen_invalidations(self):
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(INVALIDATION_CHANNEL)
+        try:
+            async for msg in pubsub.listen():
+                if msg.get("type") != "message":
+                    continue
+                data = msg.get("data")
+                yield data.decode() if isinstance(data, bytes) else str(data)
+        finally:
+            await pubsub.aclose()
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class InMemoryBackend(CacheBackend):
+    """Process-local stand-in for Redis, for tests and single-worker dev runs."""
+
+    def __init__(self) -> None:
+        self._data: dict[str, tuple[float, bytes]] = {}
+        self._subscribers: list[asyncio.Queue] = []
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if not item:
+            return None
+        expires_at, value = item
+        if asyncio.get_running_loop().time() > expires_at:
+            self._data.pop(key, None)
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        self._data[key] = (asyncio.get_running_loop().time() + ttl_seconds, value)
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    async def publish_invalidation(self, message: str) -> None:
+        for q in self._subscribers:
+            q.put_nowait(message)
+
+    async def listen_invalidations(self):
+        q: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(q)
+        try:
+            while True:
+                yield await q.get()
+        finally:
+            self._subscribers.remove(q)
+
+
+_backend: Optional[CacheBackend] = None
+_listener: Optional[asyncio.Task] = None
+_stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "l2_errors": 0, "invalidations_received": 0}
+
+
+def serialize(value: Any, expires_at: Optional[float] = None) -> bytes:
+    """
+    Compact encoding for pydantic models and lists of them (plus plain JSON
+    values). expires_at (epoch seconds) travels with the value so a worker that
+    reads it from L2 doesn't keep it in L1 past its original TTL.
+    """
+    if isinstance(value, BaseModel):
+        payload = {"m": type(value).__name__, "v": value.model_dump(mode="json", exclude_none=True)}
+    elif isinstance(value, list) and value and all(isinstance(v, BaseModel) for v in value):
+        payload = {"m": type(value[0]).__name__, "l": [v.model_dump(mode="json", exclude_none=True) for v in value]}
+    else:
+        payload = {"j": value}
+    if expires_at is not None:
+        payload["x"] = round(expires_at, 1)
+
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        return b"z" + zlib.compress(raw)
+    return b"j" + raw
+
+
+def deserialize_entry(data: bytes) -> tuple[Any, Optional[float]]:
+    """(value, expires_at) from serialize; expires_at is None for entries written without one."""
+    raw = zlib.decompress(data[1:]) if data[:1] == b"z" else data[1:]
+    payload = json.loads(raw)
+    expires_at = payload.get("x")
+    if "j" in payload:
+        return payload["j"], expires_at
+    model = _MODELS[payload["m"]]
+    if "l" in payload:
+        return [model.model_validate(v) for v in payload["l"]], expires_at
+    return model.model_validate(payload["v"]), expires_at
+
+
+def deserialize(data: bytes) -> Any:
+    return deserialize_entry(data)[0]
+
+
+def configure(backend: Optional[CacheBackend]) -> None:
+    """Swap the L2 backend (None = L1 only). Used at startup and by tests."""
+    global _backend
+    _backend = backend
+
+
+async def get(key: str) -> Optional[Any]:
+    value = l1.get(key)
+    if value is not None:
+        _stats["l1_hits"] += 1
+        return value
+
+    if _backend is not None:
+        try:
+            data = await _backend.get(key)
+            if data is not None:
+                value, expires_at = deserialize_entry(data)
+                ttl = L1_MAX_TTL_S
+                if expires_at is not None:
+                    # never keep the L1 copy past the TTL it was written with
+                    ttl = min(ttl, max(0, int(expires_at - time.time())))
+                if ttl > 0:
+                    l1.set(key, value, ttl_seconds=ttl)
+                _stats["l2_hits"] += 1
+                return value
+        except Exception as e:
+            _stats["l2_errors"] += 1
+            print(f"Warning: L2 cache get failed for {key}: {e}")
+
+    _stats["misses"] += 1
+    return None
+
+
+async def set(key: str, value: Any, ttl_seconds: int = 3600) -> None:
+    if _backend is None:
+        # L1 is the only copy; there is no other worker's copy to go stale against
+        l1.set(key, value, ttl_seconds=ttl_seconds)
+        return
+    l1.set(key, value, ttl_seconds=min(ttl_seconds, L1_MAX_TTL_S))
+    try:
+        await _backend.set(key, serialize(value, expires_at=time.time() + ttl_seconds), ttl_seconds)
+        # other workers may hold an older L1 copy of this key
+        await _backend.publish_invalidation(f"{_WORKER_ID}|{key}")
+    except Exception as e:
+        _stats["l2_errors"] += 1
+        print(f"Warning: L2 cache set failed for {key}: {e}")
+
+
+async def delete(key: str) -> None:
+    l1.delete(key)
+    if _backend is None:
+        return
+    try:
+        await _backend.delete(key)
+        await _backend.publish_invalidation(f"{_WORKER_ID}|{key}")
+    except Exception as e:
+        _stats["l2_errors"] += 1
+        print(f"Warning: L2 cache delete failed for {key}: {e}")
+
+
+async def _listen_loop(backend: CacheBackend) -> None:
+    while True:
+        try:
+            async for message in backend.listen_invalidations():
+                origin, _, key = message.partition("|")
+                if origin == _WORKER_ID:
+                    continue
+                l1.delete(key)
+                _stats["invalidations_received"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Warning: cache invalidation listener failed, retrying: {e}")
+            await asyncio.sleep(1.0)
+
+
+async def startup(backend: Optional[CacheBackend] = None) -> None:
+    global _listener
+    if backend is None and REDIS_URL:
+        backend = RedisBackend(REDIS_URL)
+    configure(backend)
+    if _backend is not None:
+        _listener = asyncio.create_task(_listen_loop(_backend))
+
+
+async def shutdown() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        try:
+            await _listener
+        except asyncio.CancelledError:
+            pass
+        _listener = None
+    if _backend is not None:
+        await _backend.close()
+    configure(None)
+
+
+def stats() -> dict[str, Any]:
+    return {"backend": type(_backend).__name__ if _backend else None, **_stats}
@@ -0,0 +1,60 @@
+# services/tile_cache.py
+# Shared per-geohash-tile cache for nearby-search results (Places, Events).
+# A tile's results are fetched once, stored in the tiered cache, and every
+# caller inside the tile filters and ranks them from its own position.
+import os
+from typing import Any, Awaitable, Callable
+
+from backend.services import singleflight
+from backend.services.tiered_cache import get as cache_get, set as cache_set
+
+# an empty tile may be a transient upstream hiccup rather than a quiet area,
+# so it is only cached briefly
+TILE_EMPTY_TTL_S = int(os.getenv("TILE_EMPTY_TTL_S", "60"))
+
+# outcomes per "<namespace>:p<precision>": served from the local index, the
+# shared cache, or fetched from the upstream API
+_STATS: dict[str, dict[str, int]] = {}
+
+
+def record(namespace: str, precision: int, outcome: str) -> None:
+    counters = _STATS.setdefault(f"{namespace}:p{precision}", {"index": 0, "cache": 0, "api": 0})
+    counters[outcome] += 1
+
+
+async def get_or_fetch(
+    namespace: str,
+    precision: int,
+    tile: str,
+    variant: str,
+    fetch: Callable[[], Awaitable[list[Any]]],
+    ttl_seconds: int,
+) -> list[Any]:
+    """
+    A tile's results from the shared cache, or fetch() once for all concurrent
+    callers and cache them. `variant` separates fetches that differ by more
+    than the tile (place type, radius).
+    """
+    key = f"{namespace}:p{precision}:{tile}:{variant}"
+    cached = await cache_get(key)
+    if cached is not None:
+        record(namespace, precision, "cache")
+        return cached
+
+    async def fetch_and_store() -> list[Any]:
+        items = await fetch()
+        await cache_set(key, items, ttl_seconds=ttl_seconds if items else min(ttl_seconds, TILE_EMPTY_TTL_S))
+        record(namespace, precision, "api")
+        return items
+
+    return await singleflight.do(key, fetch_and_store)
+
+
+def stats() -> dict[str, Any]:
+    """Hit rate per namespace and tile precision, to tune tile size against API spend."""
+    result: dict[str, Any] = {}
+    for name, counters in _STATS.items():
+        total = sum(counters.values())
+        hits = counters["index"] + counters["cache"]
+        result[name] = {**counters, "hit_rate": round(hits / total, 3) if total else None}
+    return result
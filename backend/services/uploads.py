@@ -0,0 +1,152 @@
+# services/uploads.py
+# Streaming handling of photo uploads. Bodies over the limit are refused
+# before the multipart parser spools them (UploadLimitMiddleware). Each file is
+# then read in chunks: size is checked, SHA-256 is updated and the format is
+# sniffed from its magic bytes as the chunks arrive, without building a bytes
+# copy of the upload. Starlette already spools the file (in memory up to 1 MB,
+# on disk beyond), and that one buffer is handed to the image pipeline as is.
+import hashlib
+import io
+import json
+import os
+from typing import BinaryIO, Optional
+
+from fastapi import UploadFile
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+MAX_IMAGE_MB = int(os.getenv("UPLOAD_MAX_MB", "8"))
+MAX_IMAGE_BYTES = MAX_IMAGE_MB * 1024 * 1024
+# room for the other form fields and multipart boundaries around the files
+FORM_OVERHEAD_BYTES = 64 * 1024
+CHUNK_SIZE = 64 * 1024
+
+_MAGIC = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+)
+_SNIFF_BYTES = max(len(magic) for magic, _ in _MAGIC)
+
+
+class UploadError(ValueError):
+    """Upload is empty, too large or not a supported image."""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+def sniff_mime(head: bytes) -> Optional[str]:
+    """MIME type from the file's leading bytes, or None if it isn't a JPEG or PNG."""
+    for magic, mime_type in _MAGIC:
+        if head.startswith(magic):
+            return mime_type
+    return None
+
+
+async def read_upload(upload: UploadFile, max_bytes: int = MAX_IMAGE_BYTES) -> tuple[BinaryIO, str, int, str]:
+    """
+    Check an uploaded image chunk by chunk and rewind it.
+
+    Returns (file, sniffed MIME type, size in bytes, SHA-256 hex digest). The
+    file is the upload's own spooled buffer; it stays owned by the request
+    unless detach() is called. Raises UploadError as soon as the file turns
+    out to be over max_bytes or not a JPEG/PNG.
+    """
+    digest = hashlib.sha256()
+    head = b""
+    mime_type: Optional[str] = None
+    size = 0
+    while chunk := await upload.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadError(f"Files too large. {max_bytes // (1024 * 1024)} MB limit.", status_code=413)
+        if mime_type is None:
+            head += chunk[:_SNIFF_BYTES - len(head)]
+            if len(head) >= _SNIFF_BYTES:
+                mime_type = sniff_mime(head)
+                if mime_type is None:
+                    raise UploadError("Invalid image format. Only JPEG and PNG images are supported.")
+        digest.update(chunk)
+
+    if size == 0:
+        raise UploadError("Empty image.")
+    if mime_type is None:
+        # shorter than the longest magic number
+        mime_type = sniff_mime(head)
+        if mime_type is None:
+            raise UploadError("Invalid image format. Only JPEG and PNG images are supported.")
+    await upload.seek(0)
+    return upload.file, mime_type, size, digest.hexdigest()
+
+
+def detach(upload: UploadFile) -> BinaryIO:
+    """
+    Take ownership of the upload's buffer, so it outlives the request (the
+    form closes its files once the response is sent). The caller closes it.
+    """
+    file = upload.file
+    upload.file = io.BytesIO()
+    return file
+
+
+class UploadLimitMiddleware:
+    """
+    Refuses POST bodies over the limit for the given paths with a 413: up front
+    from Content-Length, or as soon as a chunked body crosses the limit, so an
+    oversized upload is never parsed or spooled in full.
+    """
+
+    def __init__(self, app: ASGIApp, limits: dict[str, int]):
+        self.app = app
+        # path (without trailing slash) -> max body bytes
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit = None
+        if scope["type"] == "http" and scope["method"] == "POST":
+            limit = self.limits.get(scope["path"].rstrip("/"))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        length = headers.get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            await _reject(send, limit)
+            return
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise UploadError("Request body too large.", status_code=413)
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            # once over the limit, the app's own error response is replaced by the 413
+            if not exceeded:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadError:
+            if not exceeded:
+                raise
+        if exceeded:
+            await _reject(send, limit)
+
+
+async def _reject(send: Send, limit: int) -> None:
+    body = json.dumps({"detail": f"Request body too large. {limit // (1024 * 1024)} MB limit."}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -1,43 +1,90 @@
-from backend.db.queries import get_scans_for_user, get_top_city_for_user
-from backend.schemas.wrapped import WrappedResponse, WrappedScanItem
+import asyncio
+from datetime import datetime, timezone
+from typing import Optional
 
+from backend.db import queries
+from backend.schemas.wrapped import (
+    WrappedResponse, WrappedCity, WrappedCount, WrappedMonth, WrappedRecentScan,
+)
+from backend.services.tiered_cache import get as cache_get, set as cache_set, delete as cache_delete
 
-def _norm_landmark(name: str | None) -> str:
-    """Normalize landmark name for uniqueness counting."""
-    if not name:
-        return ""
-    t = name.strip().lower()
-    if t in {"unknown", "uncertain"}:
-        return ""
-    return t
+PALETTE = ["#7ADBCF", "#F05B55", "#1F8A70", "#B8F3EA", "#F4B7B2", "#A7F3D0"]
 
+# snapshots hold this many recent scans; the route slices to its limit
+RECENT_SCANS_MAX = 100
 
-def build_wrapped(user_id: str, limit: int = 50) -> WrappedResponse:
-    scans = get_scans_for_user(user_id=user_id, limit=limit)
+# new scans invalidate explicitly, so the TTL only bounds staleness from missed invalidations
+CURRENT_YEAR_TTL_S = 60 * 60 * 24
+PAST_YEAR_TTL_S = 60 * 60 * 24 * 30
 
-    items: list[WrappedScanItem] = []
-    unique = set()
 
-    for s in scans:
-        name = s.get("landmark_name")
-        key = _norm_landmark(name)
-        if key:
-            unique.add(key)
+def _snapshot_key(user_id: str, year: int) -> str:
+    return f"wrapped:{user_id}:{year}"
 
-        items.append(
-            WrappedScanItem(
-                landmark_name=name or "Unknown",
-                tags=s.get("tags") if isinstance(s.get("tags"), list) else [],
-                timestamp=s.get("timestamp"),
-            )
-        )
+
+def _year_bounds(year: int) -> tuple[datetime, datetime]:
+    return (
+        datetime(year, 1, 1, tzinfo=timezone.utc),
+        datetime(year + 1, 1, 1, tzinfo=timezone.utc),
+    )
 
 
-    top_city = get_top_city_for_user(user_id)
+def _category(tags) -> str:
+    if isinstance(tags, list):
+        return ", ".join(str(t) for t in tags)
+    return tags or ""
+
+
+async def _build_snapshot(user_id: str, year: int) -> WrappedResponse:
+    start, end = _year_bounds(year)
+    # both reads are independent; run them side by side
+    aggregates, recent = await asyncio.gather(
+        queries.get_wrapped_aggregates(user_id, start, end),
+        queries.get_recent_scans_in_range(user_id, start, end, RECENT_SCANS_MAX),
+    )
+    if aggregates is None:
+        raise RuntimeError("Wrapped aggregation failed")
 
+    cities = [
+        WrappedCity(name=c["name"], count=c["count"], color_hex=PALETTE[i % len(PALETTE)])
+        for i, c in enumerate(aggregates.get("cities") or [])
+    ]
     return WrappedResponse(
-        total_scans=len(scans),
-        unique_landmarks=len(unique),
-        top_city=top_city,          
-        items=items,
+        year=year,
+        total_scans=aggregates.get("total_scans") or 0,
+        unique_landmarks=aggregates.get("unique_landmarks") or 0,
+        top_city=cities[0].name if cities else None,
+        cities=cities,
+        tags=[WrappedCount(**t) for t in aggregates.get("tags") or []],
+        months=[WrappedMonth(**m) for m in aggregates.get("months") or []],
+        landmarks=[WrappedCount(**l) for l in aggregates.get("landmarks") or []],
+        recent_scans=[
+            WrappedRecentScan(
+                id=s.get("id"),
+                landmark_name=s.get("landmark_name"),
+                timestamp=s.get("timestamp"),
+                image_url=s.get("image_url"),
+                category=_category(s.get("tags")),
+            )
+            for s in recent
+        ],
     )
+
+
+async def build_wrapped(user_id: str, year: Optional[int] = None) -> WrappedResponse:
+    """Full-year Wrapped summary, served from a cached per-user snapshot when possible."""
+    current_year = datetime.now(timezone.utc).year
+    year = year or current_year
+    key = _snapshot_key(user_id, year)
+
+    snapshot = await cache_get(key)
+    if snapshot is None:
+        snapshot = await _build_snapshot(user_id, year)
+        ttl = CURRENT_YEAR_TTL_S if year >= current_year else PAST_YEAR_TTL_S
+        await cache_set(key, snapshot, ttl_seconds=ttl)
+    return snapshot
+
+
+async def invalidate_wrapped(user_id: str, timestamp: datetime) -> None:
+    """Drop the snapshot for the period a newly saved scan falls into."""
+    await cache_delete(_snapshot_key(user_id, timestamp.year))
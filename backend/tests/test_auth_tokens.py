@@ -0,0 +1,114 @@
+import asyncio
+import json
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from backend.services import auth_tokens
+from backend.services.auth_tokens import AuthError
+
+SECRET = "test-secret-that-is-long-enough-for-hs256"
+URL = "https://project.supabase.co"
+RSA_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture(autouse=True)
+def clean_state(monkeypatch):
+    monkeypatch.setattr(auth_tokens, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(auth_tokens, "SUPABASE_URL", "")
+    monkeypatch.setattr(auth_tokens, "_keys", {})
+    monkeypatch.setattr(auth_tokens, "_keys_fetched_at", 0.0)
+    auth_tokens._claims.clear()
+    yield
+    auth_tokens._claims.clear()
+
+
+def _claims(**overrides):
+    claims = {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 3600}
+    claims.update(overrides)
+    return {k: v for k, v in claims.items() if v is not None}
+
+
+def _hs256(**overrides) -> str:
+    return jwt.encode(_claims(**overrides), SECRET, algorithm="HS256")
+
+
+def _rs256(kid: str = "key-1", **overrides) -> str:
+    return jwt.encode(_claims(**overrides), RSA_KEY, algorithm="RS256", headers={"kid": kid})
+
+
+def _jwk(kid: str = "key-1") -> jwt.PyJWK:
+    data = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(RSA_KEY.public_key()))
+    return jwt.PyJWK.from_dict({**data, "kid": kid, "alg": "RS256", "use": "sig"})
+
+
+def _verify(token: str) -> dict:
+    return asyncio.run(auth_tokens.verify(token))
+
+
+def test_valid_hs256_token_is_verified_then_cached():
+    token = _hs256()
+    verified = auth_tokens._stats["verified"]
+    hits = auth_tokens._stats["cache_hits"]
+
+    assert _verify(token)["sub"] == "user-1"
+    assert _verify(token)["sub"] == "user-1"
+    assert auth_tokens._stats["verified"] == verified + 1
+    assert auth_tokens._stats["cache_hits"] == hits + 1
+
+
+@pytest.mark.parametrize("token", [
+    "not-a-jwt",
+    jwt.encode(_claims(), "some-other-secret-of-enough-length", algorithm="HS256"),
+    _hs256(exp=int(time.time()) - 120),
+    _hs256(aud="anon"),
+    _hs256(sub=None),
+    _hs256(exp=None),
+])
+def test_invalid_tokens_are_rejected(token):
+    rejected = auth_tokens._stats["rejected"]
+    with pytest.raises(AuthError):
+        _verify(token)
+    assert auth_tokens._stats["rejected"] == rejected + 1
+
+
+def test_expiry_within_leeway_is_accepted():
+    assert _verify(_hs256(exp=int(time.time()) - 5))["sub"] == "user-1"
+
+
+def test_hs256_needs_the_secret(monkeypatch):
+    monkeypatch.setattr(auth_tokens, "SUPABASE_JWT_SECRET", None)
+    with pytest.raises(AuthError, match="SUPABASE_JWT_SECRET"):
+        _verify(_hs256())
+
+
+def test_asymmetric_token_is_checked_against_jwks_and_issuer(monkeypatch):
+    monkeypatch.setattr(auth_tokens, "SUPABASE_URL", URL)
+    monkeypatch.setattr(auth_tokens, "_keys", {"key-1": _jwk()})
+    monkeypatch.setattr(auth_tokens, "_keys_fetched_at", time.time())
+
+    assert _verify(_rs256(iss=f"{URL}/auth/v1"))["sub"] == "user-1"
+    with pytest.raises(AuthError):
+        _verify(_rs256(iss="https://elsewhere.example/auth/v1"))
+    with pytest.raises(AuthError):
+        _verify(_rs256())
+
+
+def test_unknown_kid_refreshes_keys_once(monkeypatch):
+    refreshes = []
+
+    async def fake_refresh():
+        refreshes.append(1)
+        auth_tokens._keys = {"rotated": _jwk("rotated")}
+        auth_tokens._keys_fetched_at = time.time()
+
+    monkeypatch.setattr(auth_tokens, "SUPABASE_URL", URL)
+    monkeypatch.setattr(auth_tokens, "refresh_keys", fake_refresh)
+
+    assert _verify(_rs256(kid="rotated", iss=f"{URL}/auth/v1"))["sub"] == "user-1"
+    # keys were just refreshed, so an unknown kid is refused without another fetch
+    with pytest.raises(AuthError, match="unknown key"):
+        _verify(_rs256(kid="missing", iss=f"{URL}/auth/v1"))
+    assert len(refreshes) == 1
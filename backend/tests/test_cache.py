@@ -0,0 +1,34 @@
+import pytest
+
+from backend.services import cache
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def test_feature_prefixes_have_their_own_namespace():
+    for prefix in ("landmark", "persona", "profile", "chatctx", "chatpre", "chat", "identify"):
+        assert cache._namespace_name(f"{prefix}:key") == prefix
+    assert cache._namespace_name("something:key") == "default"
+
+
+def test_eviction_stays_inside_a_namespace(monkeypatch):
+    monkeypatch.setitem(cache.NAMESPACE_BUDGETS, "chatpre", 4096)
+    cache.set("landmark:eiffel tower", {"name": "Eiffel Tower"}, ttl_seconds=60)
+
+    for i in range(100):
+        cache.set(f"chatpre:l:{i}", {"answer": "x" * 200}, ttl_seconds=60)
+
+    assert cache.get("landmark:eiffel tower") == {"name": "Eiffel Tower"}
+    assert cache.get("chatpre:l:0") is None
+    assert cache.get("chatpre:l:99") is not None
+    assert cache._namespace("chatpre:x").used_bytes <= 4096
+
+
+def test_expired_entries_are_not_served():
+    cache.set("profile:u", {"age_bracket": "adult"}, ttl_seconds=-1)
+    assert cache.get("profile:u") is None
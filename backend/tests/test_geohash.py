@@ -0,0 +1,58 @@
+import pytest
+
+from backend.services import geohash
+
+
+def test_encode_known_cells():
+    assert geohash.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash.encode(48.8584, 2.2945, 6) == "u09tun"
+
+
+def test_bbox_contains_the_encoded_point():
+    lat, lng = 48.8584, 2.2945
+    lat_lo, lat_hi, lng_lo, lng_hi = geohash.bbox(geohash.encode(lat, lng, 6))
+    assert lat_lo <= lat < lat_hi and lng_lo <= lng < lng_hi
+    c_lat, c_lng = geohash.center("u09tun")
+    assert geohash.encode(c_lat, c_lng, 6) == "u09tun"
+
+
+def test_neighbors_surround_the_tile():
+    tile = "u09tun"
+    cells = geohash.neighbors(tile)
+    assert len(cells) == 8 and len(set(cells)) == 8 and tile not in cells
+
+    lat_lo, lat_hi, lng_lo, lng_hi = geohash.bbox(tile)
+    d_lat, d_lng = lat_hi - lat_lo, lng_hi - lng_lo
+    c_lat, c_lng = geohash.center(tile)
+    expected = {
+        geohash.encode(c_lat + dy * d_lat, c_lng + dx * d_lng, 6)
+        for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dx or dy
+    }
+    assert set(cells) == expected
+
+
+def test_neighbors_wrap_the_antimeridian_and_stop_at_the_poles():
+    east = geohash.encode(0.0, 179.999, 5)
+    assert any(geohash.center(cell)[1] < 0 for cell in geohash.neighbors(east))
+
+    north = geohash.encode(89.99, 0.0, 3)
+    assert 0 < len(geohash.neighbors(north)) < 8
+
+
+def test_distance_m():
+    assert geohash.distance_m(48.8584, 2.2945, 48.8584, 2.2945) == 0
+    # Eiffel Tower to the Louvre, about 3.2 km
+    assert 3100 < geohash.distance_m(48.8584, 2.2945, 48.8606, 2.3376) < 3300
+    assert geohash.distance_m(0, 0, 0, 1) == pytest.approx(111195, abs=1)
+
+
+def test_cell_radius_covers_every_corner():
+    for tile in ("u09tun", "9q8yy", "r3gx2f"):
+        lat_lo, lat_hi, lng_lo, lng_hi = geohash.bbox(tile)
+        c_lat, c_lng = geohash.center(tile)
+        radius = geohash.cell_radius_m(tile)
+        for lat in (lat_lo, lat_hi):
+            for lng in (lng_lo, lng_hi):
+                assert geohash.distance_m(c_lat, c_lng, lat, lng) <= radius
+    # precision 6 cells are about 1.2 x 0.6 km
+    assert 500 < geohash.cell_radius_m("u09tun") < 800
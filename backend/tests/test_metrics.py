@@ -0,0 +1,38 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routes import metrics
+from backend.services import http_clients
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.include_router(metrics.router)
+    return TestClient(app)
+
+
+def test_metrics_are_disabled_without_a_token(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", None)
+    assert _client().get("/metrics/singleflight").status_code == 404
+
+
+def test_metrics_require_the_operator_token(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "s3cret")
+    client = _client()
+
+    assert client.get("/metrics/singleflight").status_code == 401
+    assert client.get("/metrics/singleflight", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics/singleflight", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def test_pool_stats_survive_httpcore_changes():
+    class Pool:
+        connections = [object()]
+
+    class Transport:
+        _pool = Pool()
+
+    class Client:
+        _transport = Transport()
+
+    assert http_clients._pool_stats(Client()) is None
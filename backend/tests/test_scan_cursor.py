@@ -0,0 +1,38 @@
+import base64
+import json
+
+import pytest
+
+from backend.db import queries
+
+SCAN_ID = "3f2b8c1e-5a4d-4e6f-9b7a-1c2d3e4f5a6b"
+
+
+def _raw_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trips_in_canonical_form():
+    cursor = queries.encode_scan_cursor({"timestamp": "2026-03-01T12:30:00Z", "id": SCAN_ID.upper()})
+    assert "=" not in cursor
+    assert queries.decode_scan_cursor(cursor) == ("2026-03-01T12:30:00+00:00", SCAN_ID)
+
+
+def test_cursor_keeps_microseconds_and_offsets():
+    cursor = queries.encode_scan_cursor({"timestamp": "2026-03-01T12:30:00.123456+02:00", "id": SCAN_ID})
+    assert queries.decode_scan_cursor(cursor) == ("2026-03-01T12:30:00.123456+02:00", SCAN_ID)
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64 at all!",
+    _raw_cursor({"timestamp": "2026-03-01T12:30:00Z", "id": SCAN_ID}),
+    _raw_cursor(["2026-03-01T12:30:00Z"]),
+    _raw_cursor(["yesterday", SCAN_ID]),
+    _raw_cursor(["2026-03-01T12:30:00Z", "1,id.neq.0"]),
+    _raw_cursor(["2026-03-01T12:30:00Z),id.gt.(0", SCAN_ID]),
+    _raw_cursor([None, None]),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        queries.decode_scan_cursor(cursor)
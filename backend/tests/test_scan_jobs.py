@@ -0,0 +1,92 @@
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from backend.services import scan_jobs
+
+
+@pytest.fixture(autouse=True)
+def job_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(scan_jobs, "SCAN_JOB_DIR", tmp_path)
+    (tmp_path / "claimed").mkdir()
+    scan_jobs._held.clear()
+    yield tmp_path
+    scan_jobs._held.clear()
+
+
+def _enqueue(scan_id: str, **kwargs) -> None:
+    scan_jobs.enqueue_scan(
+        scan_id, "user-1", "Louvre", "Museum.", 48.86, 2.34, ["museum"],
+        datetime(2026, 3, 1, tzinfo=timezone.utc), **kwargs,
+    )
+
+
+def _set_mtime(path, mtime: float) -> None:
+    os.utime(path, (mtime, mtime))
+
+
+def test_enqueue_records_steps_already_done(job_dir):
+    _enqueue("a", image_bytes=b"\xff\xd8\xff", city="Paris")
+    _enqueue("b", inserted=True)
+
+    a = json.loads((job_dir / "a.json").read_text())
+    b = json.loads((job_dir / "b.json").read_text())
+    assert a["done"] == ["city"] and (job_dir / "a.img").read_bytes() == b"\xff\xd8\xff"
+    assert b["done"] == ["city", "insert", "upload", "patch"]
+
+
+def test_jobs_are_claimed_oldest_first_and_only_once(job_dir):
+    _enqueue("new")
+    _enqueue("old")
+    _set_mtime(job_dir / "old.json", time.time() - 60)
+
+    first = scan_jobs._next_due_job()
+    second = scan_jobs._next_due_job()
+    assert (first["job_id"], second["job_id"]) == ("old", "new")
+    assert scan_jobs._next_due_job() is None
+    assert sorted(p.name for p in (job_dir / "claimed").iterdir()) == ["new.json", "old.json"]
+    assert scan_jobs._held == {"old", "new"}
+
+
+def test_jobs_in_backoff_are_skipped(job_dir):
+    _enqueue("a")
+    job = scan_jobs._next_due_job()
+    job["next_attempt_at"] = time.time() + 60
+    scan_jobs._release_job(job)
+
+    assert (job_dir / "a.json").exists() and not (job_dir / "claimed" / "a.json").exists()
+    assert scan_jobs._next_due_job() is None
+
+    job["next_attempt_at"] = 0.0
+    scan_jobs._write_atomic(job_dir / "a.json", json.dumps(job).encode())
+    assert scan_jobs._next_due_job()["job_id"] == "a"
+
+
+def test_stale_claims_are_requeued(job_dir, monkeypatch):
+    _enqueue("a")
+    _enqueue("b")
+    scan_jobs._next_due_job()
+    scan_jobs._next_due_job()
+
+    # nothing is stale yet
+    scan_jobs._requeue_stale_claims()
+    assert not list(job_dir.glob("*.json"))
+
+    monkeypatch.setattr(scan_jobs, "SCAN_JOB_CLAIM_TIMEOUT_S", -1)
+    scan_jobs._requeue_stale_claims()
+    assert sorted(p.name for p in job_dir.glob("*.json")) == ["a.json", "b.json"]
+    assert not list((job_dir / "claimed").iterdir())
+
+
+def test_finished_job_cleans_up(job_dir):
+    _enqueue("a", image_bytes=b"\x89PNG")
+    scan_jobs._finish(scan_jobs._next_due_job(), failed=False)
+    assert not list(job_dir.rglob("a.*"))
+
+    _enqueue("b", image_bytes=b"\x89PNG")
+    scan_jobs._finish(scan_jobs._next_due_job(), failed=True)
+    assert sorted(p.name for p in (job_dir / "failed").iterdir()) == ["b.img", "b.json"]
+    assert not (job_dir / "claimed" / "b.json").exists()
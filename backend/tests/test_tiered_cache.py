@@ -0,0 +1,164 @@
+import asyncio
+import time
+from typing import AsyncIterator, Optional
+
+import pytest
+
+from backend.schemas.identify import LandmarkRecord
+from backend.services import cache as l1
+from backend.services import tiered_cache
+from backend.services.tiered_cache import CacheBackend, InMemoryBackend
+
+
+class FakeBackend(CacheBackend):
+    """Dict-backed L2 that records invalidations and can be told to fail."""
+
+    def __init__(self, fail: bool = False) -> None:
+        self.data: dict[str, bytes] = {}
+        self.ttls: dict[str, int] = {}
+        self.published: list[str] = []
+        self.fail = fail
+
+    def _check(self) -> None:
+        if self.fail:
+            raise ConnectionError("L2 down")
+
+    async def get(self, key: str) -> Optional[bytes]:
+        self._check()
+        return self.data.get(key)
+
+    async def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        self._check()
+        self.data[key] = value
+        self.ttls[key] = ttl_seconds
+
+    async def delete(self, key: str) -> None:
+        self._check()
+        self.data.pop(key, None)
+
+    async def publish_invalidation(self, message: str) -> None:
+        self._check()
+        self.published.append(message)
+
+    async def listen_invalidations(self) -> AsyncIterator[str]:
+        await asyncio.Event().wait()
+        yield ""
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    l1.clear()
+    tiered_cache.configure(None)
+    yield
+    l1.clear()
+    tiered_cache.configure(None)
+
+
+def _record(name: str = "Eiffel Tower") -> LandmarkRecord:
+    return LandmarkRecord(landmark_name=name, location="Paris", description="Iron lattice tower. " * 80)
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend()
+
+    class Partial(CacheBackend):
+        async def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_serialize_round_trips_models_and_compresses_large_values():
+    record = _record()
+    data = tiered_cache.serialize(record)
+    assert data[:1] == b"z"
+    assert tiered_cache.deserialize(data) == record
+    assert tiered_cache.deserialize(tiered_cache.serialize([record, record])) == [record, record]
+    assert tiered_cache.deserialize(tiered_cache.serialize({"a": 1})) == {"a": 1}
+
+
+def test_set_writes_both_levels_and_publishes_invalidation():
+    backend = FakeBackend()
+    tiered_cache.configure(backend)
+
+    asyncio.run(tiered_cache.set("landmark:test", _record(), ttl_seconds=3600))
+
+    assert backend.ttls["landmark:test"] == 3600
+    assert backend.published == [f"{tiered_cache._WORKER_ID}|landmark:test"]
+    assert l1.get("landmark:test") == _record()
+
+
+def test_get_falls_back_to_l2_and_refills_l1():
+    backend = FakeBackend()
+    tiered_cache.configure(backend)
+    asyncio.run(tiered_cache.set("landmark:test", _record(), ttl_seconds=3600))
+    l1.clear()
+
+    hits = tiered_cache._stats["l2_hits"]
+    assert asyncio.run(tiered_cache.get("landmark:test")) == _record()
+    assert tiered_cache._stats["l2_hits"] == hits + 1
+    assert l1.get("landmark:test") == _record()
+
+
+def test_l2_refill_keeps_the_original_ttl():
+    backend = FakeBackend()
+    tiered_cache.configure(backend)
+    asyncio.run(tiered_cache.set("identify:partial", {"partial": True}, ttl_seconds=60))
+    l1.clear()
+
+    assert asyncio.run(tiered_cache.get("identify:partial")) == {"partial": True}
+    assert l1._namespace("identify:partial").entries["identify:partial"][0] - time.time() <= 60
+
+    # written without an expiry (older entries): falls back to the L1 cap
+    backend.data["identify:old"] = tiered_cache.serialize({"v": 1})
+    assert asyncio.run(tiered_cache.get("identify:old")) == {"v": 1}
+    assert l1._namespace("identify:old").entries["identify:old"][0] - time.time() <= tiered_cache.L1_MAX_TTL_S
+
+
+def test_l2_errors_are_not_raised():
+    tiered_cache.configure(FakeBackend(fail=True))
+    errors = tiered_cache._stats["l2_errors"]
+
+    asyncio.run(tiered_cache.set("landmark:test", _record()))
+    l1.clear()
+    assert asyncio.run(tiered_cache.get("landmark:test")) is None
+    asyncio.run(tiered_cache.delete("landmark:test"))
+
+    assert tiered_cache._stats["l2_errors"] == errors + 3
+
+
+def test_l1_copy_is_capped_only_with_an_l2():
+    tiered_cache.configure(FakeBackend())
+    asyncio.run(tiered_cache.set("identify:a", {"v": 1}, ttl_seconds=7200))
+    assert l1._namespace("identify:a").entries["identify:a"][0] - time.time() <= tiered_cache.L1_MAX_TTL_S
+
+
+def test_without_l2_values_keep_their_full_ttl():
+    asyncio.run(tiered_cache.set("landmark:a", _record(), ttl_seconds=7 * 24 * 3600))
+    asyncio.run(tiered_cache.set("identify:a", {"v": 1}, ttl_seconds=60))
+
+    assert l1._namespace("landmark:a").entries["landmark:a"][0] - time.time() > 7 * 24 * 3600 - 10
+    assert l1._namespace("identify:a").entries["identify:a"][0] - time.time() <= 60
+    assert asyncio.run(tiered_cache.get("landmark:a")) == _record()
+    assert asyncio.run(tiered_cache.get("missing:a")) is None
+
+
+def test_invalidation_from_another_worker_drops_l1_copy():
+    async def scenario():
+        backend = InMemoryBackend()
+        await tiered_cache.startup(backend)
+        try:
+            # let the listener subscribe
+            await asyncio.sleep(0)
+            l1.set("places:a", [1], ttl_seconds=60)
+            l1.set("places:b", [2], ttl_seconds=60)
+            await backend.publish_invalidation("other-worker|places:a")
+            await backend.publish_invalidation(f"{tiered_cache._WORKER_ID}|places:b")
+            await asyncio.sleep(0.01)
+            return l1.get("places:a"), l1.get("places:b")
+        finally:
+            await tiered_cache.shutdown()
+
+    assert asyncio.run(scenario()) == (None, [2])
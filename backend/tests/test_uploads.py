@@ -0,0 +1,50 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from starlette.datastructures import UploadFile
+
+from backend.services import uploads
+
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 100
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+
+def _read(data: bytes, max_bytes: int = uploads.MAX_IMAGE_BYTES):
+    return asyncio.run(uploads.read_upload(UploadFile(io.BytesIO(data), filename="photo"), max_bytes=max_bytes))
+
+
+def test_sniff_mime():
+    assert uploads.sniff_mime(JPEG) == "image/jpeg"
+    assert uploads.sniff_mime(PNG) == "image/png"
+    assert uploads.sniff_mime(b"GIF89a" + b"\x00" * 10) is None
+    assert uploads.sniff_mime(b"\x89PNG") is None
+    assert uploads.sniff_mime(b"") is None
+
+
+def test_read_upload_returns_rewound_file_type_size_and_digest():
+    file, mime_type, size, digest = _read(PNG)
+    assert (mime_type, size, digest) == ("image/png", len(PNG), hashlib.sha256(PNG).hexdigest())
+    assert file.read() == PNG
+
+
+def test_read_upload_across_chunk_boundaries():
+    data = JPEG + b"\x01" * (uploads.CHUNK_SIZE * 2 + 5)
+    _, mime_type, size, digest = _read(data)
+    assert (mime_type, size, digest) == ("image/jpeg", len(data), hashlib.sha256(data).hexdigest())
+
+
+def test_file_over_the_limit_is_refused_with_413():
+    with pytest.raises(uploads.UploadError) as exc:
+        _read(JPEG + b"\x00" * 1024, max_bytes=1024)
+    assert exc.value.status_code == 413
+    # exactly at the limit is fine
+    assert _read(JPEG[:1024].ljust(1024, b"\x00"), max_bytes=1024)[2] == 1024
+
+
+@pytest.mark.parametrize("data", [b"", b"GIF89a" + b"\x00" * 100, b"\xff\xd8", b"<svg></svg>"])
+def test_empty_or_unsupported_files_are_refused_with_400(data):
+    with pytest.raises(uploads.UploadError) as exc:
+        _read(data)
+    assert exc.value.status_code == 400
@@ -0,0 +1,58 @@
+import copy
+from datetime import datetime, timedelta, timezone
+
+from backend.db import user_stats
+
+
+def _ago(**kwargs) -> str:
+    return (datetime.now(timezone.utc) - timedelta(**kwargs)).isoformat()
+
+
+def test_applying_a_scan_twice_is_a_no_op():
+    record = user_stats.empty_record()
+    user_stats.apply_scan(record, "scan-1", "Eiffel Tower", _ago(hours=1))
+    once = copy.deepcopy(record)
+
+    user_stats.apply_scan(record, "scan-1", "Eiffel Tower", _ago(hours=1))
+    assert record == once
+    assert user_stats.compute_stats(record)["scans_this_week"] == 1
+
+
+def test_build_record_matches_folding_scans_one_by_one():
+    scans = [
+        {"id": "a", "landmark_name": "Louvre", "timestamp": _ago(days=2)},
+        {"id": "b", "landmark_name": "Eiffel Tower", "timestamp": _ago(hours=3)},
+        {"id": "c", "landmark_name": "Louvre", "timestamp": _ago(days=20)},
+    ]
+    folded = user_stats.empty_record()
+    for scan in reversed(scans):
+        user_stats.apply_scan(folded, scan["id"], scan["landmark_name"], scan["timestamp"])
+
+    record = user_stats.build_record(scans)
+    assert record == folded
+    # a retried save folds the same rows in again
+    assert user_stats.build_record(scans + scans) == record
+
+
+def test_compute_stats():
+    record = user_stats.build_record([
+        {"id": "a", "landmark_name": "Louvre", "timestamp": _ago(hours=1)},
+        {"id": "b", "landmark_name": "Eiffel Tower", "timestamp": _ago(days=4)},
+        {"id": "c", "landmark_name": "Louvre", "timestamp": _ago(days=10)},
+    ])
+    # days 0 and 4 are in consecutive 3-day windows; day 10 is past a gap
+    assert user_stats.compute_stats(record) == {"places_visited": 2, "scans_this_week": 2, "streak_days": 2}
+    assert user_stats.compute_stats(user_stats.empty_record()) == {
+        "places_visited": 0, "scans_this_week": 0, "streak_days": 0,
+    }
+
+
+def test_scans_without_a_usable_timestamp_only_count_as_places():
+    record = user_stats.build_record([{"id": "a", "landmark_name": "Louvre", "timestamp": "not a date"}, "junk"])
+    assert user_stats.compute_stats(record) == {"places_visited": 1, "scans_this_week": 0, "streak_days": 0}
+
+
+def test_is_current_flags_old_layouts():
+    assert user_stats.is_current(user_stats.empty_record())
+    assert not user_stats.is_current({"places": ["Louvre"], "recent": {}, "days_anchor": None, "days_bitmap": "0"})
+    assert not user_stats.is_current({"places": {}, "recent": [3, 1]})
@@ -1,5 +1,7 @@
 import 'package:flutter/material.dart';
+import 'package:http/http.dart' as http;
 import 'package:supabase_flutter/supabase_flutter.dart';
+import '../../constants/api.dart';
 
 class OnboardingScreen extends StatefulWidget {
   const OnboardingScreen({super.key});
@@ -72,6 +74,19 @@ class _OnboardingScreenState extends State<OnboardingScreen> {
         'onboarding_done': true,
       });
 
+      // the backend caches profiles; drop its copy so the next scan sees the new answers
+      final accessToken = _sb.auth.currentSession?.accessToken;
+      if (accessToken != null) {
+        try {
+          await http.post(
+            Uri.parse('${ApiConstants.baseUrl}${ApiConstants.profileEndpoint}/${user.id}/invalidate'),
+            headers: {'Authorization': 'Bearer $accessToken'},
+          );
+        } catch (_) {
+          // best effort: the cached profile expires on its own shortly
+        }
+      }
+
       if (!mounted) return;
       Navigator.pushReplacementNamed(context, '/nav_bar');
     } catch (e) {
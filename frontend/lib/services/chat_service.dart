@@ -28,6 +28,9 @@ class ChatResponse {
 }
 
 class ChatService {
+  // Server-side session for this chat; once set, only new messages are sent.
+  String? _sessionId;
+
   Future<ChatResponse> sendMessage({
     required String landmarkName,
     required String landmarkInfo,
@@ -37,21 +40,35 @@ class ChatService {
   }) async {
     try {
       final uri = Uri.parse('${ApiConstants.baseUrl}${ApiConstants.chatEndpoint}');
-      
-      final response = await http.post(
-        uri,
-        headers: {'Content-Type': 'application/json'},
-        body: json.encode({
-          'landmark_name': landmarkName,
-          'landmark_info': landmarkInfo,
-          'conversation_history': conversationHistory.map((m) => m.toJson()).toList(),
-          'user_message': userMessage,
-          'user_id': userId,
-        }),
-      );
+
+      Future<http.Response> post() => http.post(
+            uri,
+            headers: {'Content-Type': 'application/json'},
+            body: json.encode(_sessionId != null
+                ? {
+                    'session_id': _sessionId,
+                    'user_message': userMessage,
+                    'user_id': userId,
+                  }
+                : {
+                    'landmark_name': landmarkName,
+                    'landmark_info': landmarkInfo,
+                    'conversation_history': conversationHistory.map((m) => m.toJson()).toList(),
+                    'user_message': userMessage,
+                    'user_id': userId,
+                  }),
+          );
+
+      var response = await post();
+      if (response.statusCode == 404 && _sessionId != null) {
+        // session expired on the server; start a new one from the local history
+        _sessionId = null;
+        response = await post();
+      }
 
       if (response.statusCode == 200) {
         final data = json.decode(response.body);
+        _sessionId = data['session_id'] as String? ?? _sessionId;
         return ChatResponse(
           response: data['response'] as String,
           suggestedQuestions: List<String>.from(data['suggested_questions'] ?? []),